@@ -4,15 +4,64 @@ try:
     import pandas as pd  # type: ignore
 except Exception:  # optional dependency
     pd = None
+from salesactivator.db import queries
 from salesactivator.db.store import DB
 from salesactivator.emailer.sender import EmailSender
 from salesactivator.utils.config import Settings
 
 st.set_page_config(page_title="SalesActivator – MICE US", layout="wide")
 settings = Settings()
-db = DB(settings.DB_PATH)
+
+
+@st.cache_resource
+def get_db() -> DB:
+    # one DB object (and its per-thread connections) for every rerun and session
+    return DB(settings.DB_PATH)
+
+
+db = get_db()
 sender = EmailSender(settings)
 
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_df(sql: str, params: tuple, version: int):
+    # `version` is DB.data_version(): any commit to the database changes it and misses the cache
+    return db.df(sql, params)
+
+
+def load(sql: str, params: tuple = ()):
+    return cached_df(sql, params, db.data_version())
+
+
+def rows_of(data):
+    if pd is not None and isinstance(data, pd.DataFrame):
+        return data.to_dict("records")
+    return data
+
+
+def status_counts(table: str):
+    return {r["status"]: r["n"] for r in rows_of(load(queries.STATUS_COUNTS.format(table=table)))}
+
+
+def keyset_table(key: str, sql: str, order_cols: tuple, page_size: int):
+    # Keyset pagination: each page starts after the last (created_at, id) of the previous page,
+    # so deep pages cost the same as the first. The cursor stack lives in session_state.
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    cursor = cursors[-1]
+    data = load(queries.keyset_page(sql, order_cols, after=bool(cursor)), (*(cursor or ()), page_size))
+    records = rows_of(data)
+    st.dataframe(data, use_container_width=True)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    if prev_col.button("◀ Prev", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    page_col.caption(f"Page {len(cursors)}")
+    if next_col.button("Next ▶", key=f"{key}_next", disabled=len(records) < page_size):
+        last = records[-1]
+        cursors.append(tuple(last[c.split(".")[-1]] for c in order_cols))
+        st.rerun()
+
+
 st.title("SalesActivator – MICE (US Direct Segment)")
 
 with st.sidebar:
@@ -25,39 +74,43 @@ with st.sidebar:
     if st.button("Send Due Now"):
         count = sender.send_due(db)
         st.success(f"Sent {count} emails")
+    page_size = st.selectbox("Rows per page", [50, 100, 250, 1000], index=1)
+
+# KPI tiles: one GROUP BY per table
+lead_counts = status_counts("leads")
+queue_counts = status_counts("email_queue")
+# emails moved out of the queue by `compact` still count
+archived_counts = {r["status"]: r["n"] for r in rows_of(load(queries.ARCHIVED_COUNTS))}
+tiles = st.columns(6)
+tiles[0].metric("Leads", sum(lead_counts.values()))
+tiles[1].metric("Enriched", lead_counts.get("enriched", 0))
+tiles[2].metric("Scheduled", queue_counts.get("scheduled", 0))
+tiles[3].metric("Sending", queue_counts.get("sending", 0))
+tiles[4].metric("Sent", queue_counts.get("sent", 0) + archived_counts.get("sent", 0))
+tiles[5].metric("Failed", queue_counts.get("failed", 0) + archived_counts.get("failed", 0))
+
+sends_per_day = load(queries.SENDS_PER_DAY)
+if len(rows_of(sends_per_day)):
+    st.subheader("Sends per Day (last 30 days)")
+    st.bar_chart(sends_per_day, x="day", y="sent")
 
 # Leads overview
 st.subheader("Leads Overview")
-leads_df = db.df("""
-SELECT leads.id, companies.name as company, contacts.full_name as contact,
-       contacts.email, leads.status, leads.created_at
-FROM leads
-LEFT JOIN companies ON leads.company_id = companies.id
-LEFT JOIN contacts ON leads.contact_id = contacts.id
-ORDER BY leads.created_at DESC
-LIMIT 1000
-""")
-st.dataframe(leads_df, use_container_width=True)
+keyset_table("leads", queries.LEADS, queries.LEADS_ORDER, page_size)
 
 # Email queue
 st.subheader("Email Queue (Next 100)")
-queue_df = db.df("""
-SELECT email_queue.id, email_queue.lead_id, email_queue.step, email_queue.status,
-       email_queue.scheduled_at, email_queue.last_attempt_at
-FROM email_queue
-ORDER BY email_queue.scheduled_at ASC
-LIMIT 100
-""")
+queue_df = load(queries.QUEUE_HEAD)
 st.dataframe(queue_df, use_container_width=True)
 
-# Companies
-with st.expander("Companies (first 200)"):
-    companies_df = db.df("SELECT id, name, website, city, state, country, source, created_at FROM companies ORDER BY created_at DESC LIMIT 200")
-    st.dataframe(companies_df, use_container_width=True)
+# Companies and contacts are only queried once their toggle is switched on
+with st.expander("Companies"):
+    if st.toggle("Load companies", key="load_companies"):
+        keyset_table("companies", queries.COMPANIES, queries.COMPANIES_ORDER, page_size)
 
-# Contacts
-with st.expander("Contacts (first 200)"):
-    contacts_df = db.df("SELECT id, company_id, full_name, role, email, phone FROM contacts ORDER BY id DESC LIMIT 200")
-    st.dataframe(contacts_df, use_container_width=True)
+with st.expander("Contacts"):
+    if st.toggle("Load contacts", key="load_contacts"):
+        contacts_df = load(queries.CONTACTS, (page_size,))
+        st.dataframe(contacts_df, use_container_width=True)
 
 st.caption("All components run locally and use only free libraries and public web data. Use responsibly.")
@@ -0,0 +1,86 @@
+"""Compare the fast and soup HTML extractors on a corpus of saved pages.
+
+Pages come from a directory of .html files and/or the HTTP response cache:
+
+    python -m benchmarks.extractors --dir saved_pages/
+    python -m benchmarks.extractors --cache data/http_cache.db --json
+
+Exits non-zero if the two extractors disagree on any page.
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from salesactivator.enrich.website import WebsiteEnricher
+
+
+def load_corpus(dirs, cache_path, limit):
+    docs = []
+    for d in dirs or []:
+        for path in sorted(glob.glob(os.path.join(d, "**", "*.htm*"), recursive=True)):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                docs.append((path, f.read()))
+    if cache_path:
+        con = sqlite3.connect(cache_path)
+        for url, body in con.execute("SELECT url, body FROM http_cache WHERE status=200"):
+            docs.append((url, (body or b"").decode("utf-8", errors="replace")))
+        con.close()
+    return docs[:limit] if limit else docs
+
+
+def normalized(info):
+    return sorted(info["emails"]), sorted(info["phones"]), info["title"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", action="append", help="directory of saved .html pages (repeatable)")
+    ap.add_argument("--cache", help="HTTP cache database to read pages from")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = ap.parse_args()
+
+    docs = load_corpus(args.dir, args.cache, args.limit)
+    if not docs:
+        ap.error("empty corpus: pass --dir and/or --cache")
+    fast = WebsiteEnricher(None, extractor="fast")
+    soup = WebsiteEnricher(None, extractor="soup")
+
+    mismatches = [name for name, html in docs if normalized(fast.extract_company_info(html)) != normalized(soup.extract_company_info(html))]
+
+    timings = {}
+    for label, enricher in (("soup", soup), ("fast", fast)):
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            for _, html in docs:
+                enricher.extract_company_info(html)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label] = best
+
+    result = {
+        "pages": len(docs),
+        "bytes": sum(len(html) for _, html in docs),
+        "mismatches": len(mismatches),
+        "soup_pages_per_sec": len(docs) / timings["soup"],
+        "fast_pages_per_sec": len(docs) / timings["fast"],
+        "speedup": timings["soup"] / timings["fast"],
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for name in mismatches[:20]:
+            print("MISMATCH", name)
+        for k, v in result.items():
+            print(f"{k:>20}: {v:.2f}" if isinstance(v, float) else f"{k:>20}: {v}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""End-to-end throughput benchmark against local web and SMTP stand-ins.
+
+Runs scrape --use-seeds, enrich, sequence and send on N synthetic companies and
+reports per-stage throughput, peak RSS and database size:
+
+    python -m benchmarks.run --companies 1000
+    python -m benchmarks.run --companies 10000 --concurrency 32 --workers 4 --out bench.json
+
+The stand-in servers run in a child process so they do not share the GIL or the
+RSS figure with the code under test. Sites are served on 127.1.x.y loopback
+addresses, one per company.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.servers import CompanySites, SmtpSink, company_host
+
+
+def _serve(conn, filler_kb: int, smtp_limit: float):
+    sites = CompanySites(filler_kb)
+    sink = SmtpSink(smtp_limit)
+    conn.send((sites.start(), sink.start()))
+    while conn.recv() == "stats":
+        conn.send({"requests": sites.requests, "bytes": sites.bytes, "smtp_connections": sink.connections, "messages": sink.messages,
+                   "throttled": sink.throttled})
+    sites.stop()
+    sink.stop()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def db_size_mb(path: str) -> float:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / (1024 * 1024)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--companies", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=16, help="enrich --concurrency")
+    ap.add_argument("--pipeline", action="store_true", help="enrich --pipeline")
+    ap.add_argument("--parsers", type=int, default=0, help="enrich --parsers (with --pipeline)")
+    ap.add_argument("--workers", type=int, default=1, help="send --workers")
+    ap.add_argument("--send-batch", type=int, default=500, help="send --limit per run")
+    ap.add_argument("--delay", type=float, default=0.0, help="REQUEST_DELAY_SEC per host")
+    ap.add_argument("--smtp-limit", type=float, default=0.0, help="messages per second the SMTP sink accepts before answering 421 (0 = no limit)")
+    ap.add_argument("--filler-kb", type=int, default=20, help="approximate size of each synthetic page")
+    ap.add_argument("--workdir", help="keep the database and cache here instead of a temp dir")
+    ap.add_argument("--out", help="write JSON results to this file")
+    ap.add_argument("--json", action="store_true", help="print JSON results instead of a table")
+    args = ap.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="salesactivator-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    parent, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(target=_serve, args=(child, args.filler_kb, args.smtp_limit), daemon=True)
+    proc.start()
+    http_port, smtp_port = parent.recv()
+
+    def stats():
+        parent.send("stats")
+        return parent.recv()
+
+    db_path = os.path.join(workdir, "bench.db")
+    seeds_path = os.path.join(workdir, "seeds.csv")
+    # Settings reads the environment at import time
+    os.environ.update({
+        "DB_PATH": db_path,
+        "SEEDS_PATH": seeds_path,
+        "HTTP_CACHE_PATH": os.path.join(workdir, "http_cache.db"),
+        "REQUEST_DELAY_SEC": str(args.delay),
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "0",
+        "SMTP_USERNAME": "",
+        "FROM_EMAIL": "bench@salesactivator.local",
+        "FROM_NAME": "Benchmark",
+        "SEND_RETRY_BASE_SEC": "1",  # throttled sends come back within seconds, not minutes
+    })
+    from salesactivator import __version__, cli
+    from salesactivator.db.store import DB
+
+    with open(seeds_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["name", "website", "city", "state", "country"])
+        for i in range(args.companies):
+            w.writerow([f"Company {i} Events", f"http://{company_host(i)}:{http_port}", "Chicago", "IL", "United States"])
+
+    results = {
+        "version": __version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "json", "workdir")},
+        "stages": {},
+    }
+
+    def run(name, argv):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            cli.main(["--no-summary"] + argv)
+            return time.perf_counter() - t0
+
+    try:
+        run("init-db", ["init-db"])
+        db = DB(db_path)
+
+        secs = run("scrape", ["scrape", "--use-seeds"])
+        results["stages"]["scrape"] = {"seconds": secs, "companies_per_sec": args.companies / secs}
+
+        before = stats()
+        enrich_argv = ["enrich", "--limit", str(args.companies), "--concurrency", str(args.concurrency)]
+        if args.pipeline:
+            enrich_argv += ["--pipeline", "--parsers", str(args.parsers)]
+        secs = run("enrich", enrich_argv)
+        after = stats()
+        pages = after["requests"] - before["requests"]
+        results["stages"]["enrich"] = {
+            "seconds": secs,
+            "companies_per_sec": args.companies / secs,
+            "pages_per_sec": pages / secs,
+            "requests": pages,
+            "mb_downloaded": (after["bytes"] - before["bytes"]) / (1024 * 1024),
+            "contacts": db.query("SELECT COUNT(*) AS n FROM contacts")[0]["n"],
+            "requests_per_contact": pages / max(1, db.query("SELECT COUNT(*) AS n FROM contacts WHERE email LIKE 'sales@%'")[0]["n"]),
+        }
+
+        secs = run("sequence", ["sequence", "--limit", str(args.companies)])
+        scheduled = db.query("SELECT COUNT(*) AS n FROM email_queue")[0]["n"]
+        results["stages"]["sequence"] = {"seconds": secs, "emails_scheduled": scheduled, "emails_per_sec": scheduled / secs}
+
+        # make every step due now so the send stage drains the whole queue
+        db.execute("UPDATE email_queue SET scheduled_at=datetime('now', '-1 minute')")
+        before = stats()
+        t0 = time.perf_counter()
+        while db.query("SELECT COUNT(*) AS n FROM email_queue WHERE status='scheduled'")[0]["n"]:
+            if db.query("SELECT COUNT(*) AS n FROM email_queue WHERE status='scheduled' AND scheduled_at <= CURRENT_TIMESTAMP")[0]["n"]:
+                run("send", ["send", "--limit", str(args.send_batch), "--workers", str(args.workers)])
+            else:
+                time.sleep(0.2)  # only retries left, none due yet
+        secs = time.perf_counter() - t0
+        after = stats()
+        sent = after["messages"] - before["messages"]
+        results["stages"]["send"] = {
+            "seconds": secs,
+            "emails": sent,
+            "emails_per_sec": sent / secs if secs else 0.0,
+            "smtp_connections": after["smtp_connections"] - before["smtp_connections"],
+            "throttled": after["throttled"] - before["throttled"],
+            "failed": db.query("SELECT COUNT(*) AS n FROM email_queue WHERE status='failed'")[0]["n"],
+        }
+
+        results["peak_rss_mb"] = peak_rss_mb()
+        results["db_size_mb"] = db_size_mb(db_path)
+    finally:
+        parent.send("stop")
+        proc.join(5)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for stage, values in results["stages"].items():
+            print(stage)
+            for k, v in values.items():
+                print(f"  {k:>18}: {v:.2f}" if isinstance(v, float) else f"  {k:>18}: {v}")
+        print(f"peak_rss_mb: {results['peak_rss_mb']:.1f}")
+        print(f"db_size_mb: {results['db_size_mb']:.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Local stand-ins for the outside world: a synthetic company web and an SMTP sink."""
+import ipaddress
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# company i lives at its own loopback address so per-host rate limits behave like real domains
+FIRST_HOST = int(ipaddress.IPv4Address("127.1.0.1"))
+FILLER = (
+    "<p>We design incentive travel, corporate meetings and award-winning events across the United States. "
+    "Our team handles venue sourcing, logistics, registration and on-site production.</p>\n"
+)
+
+
+def company_host(i: int) -> str:
+    return str(ipaddress.IPv4Address(FIRST_HOST + i))
+
+
+def company_index(host: str) -> int:
+    return int(ipaddress.IPv4Address(host)) - FIRST_HOST
+
+
+def company_domain(i: int) -> str:
+    return f"company{i}-events.com"
+
+
+# contact pages live at different paths, as on real sites; only the homepage nav links to them
+CONTACT_PATHS = ("/contact", "/get-in-touch", "/en/kontakt")
+ROBOTS_TXT = "User-agent: *\nDisallow: /private\n"
+
+
+class CompanySites:
+    # serves "/", "/robots.txt", "/about", "/blog", "/privacy" and one contact page per company
+    # (CONTACT_PATHS[i % 3]); other paths are 404
+    def __init__(self, filler_kb: int = 20):
+        self.filler = FILLER * max(1, filler_kb * 1024 // len(FILLER))
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def page(self, i: int, path: str):
+        name = f"Company {i} Events"
+        contact = CONTACT_PATHS[i % len(CONTACT_PATHS)]
+        if path == "/robots.txt":
+            return ROBOTS_TXT.encode(), "text/plain"
+        nav = f"<nav><a href='/about'>About us</a> <a href='/blog'>Blog</a> <a href='/privacy'>Privacy</a> <a href='{contact}'>Contact</a></nav>"
+        if path in ("/", ""):
+            body = f"<h1>{name}</h1>{nav}{self.filler}"
+        elif path == contact:
+            body = f"<h1>Contact</h1>{nav}<p>Email sales@{company_domain(i)} or call +1 (312) 555-{i % 10000:04d}.</p>{self.filler}"
+        elif path in ("/about", "/blog", "/privacy"):
+            body = f"<h1>{path[1:].title()} {name}</h1>{nav}{self.filler}"
+        else:
+            return None
+        return f"<html><head><title>{name}</title><style>p{{margin:0}}</style></head><body>{body}<script>var x=1;</script></body></html>".encode(), "text/html; charset=utf-8"
+
+    def start(self, port: int = 0) -> int:
+        sites = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                host = self.headers.get("Host", "").split(":")[0]
+                try:
+                    body, ctype = sites.page(company_index(host), self.path.rstrip("/") or "/") or (None, None)
+                except ValueError:
+                    body = None
+                with sites._lock:
+                    sites.requests += 1
+                    sites.bytes += len(body or b"")
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        # bound to all interfaces: a socket bound to 127.0.0.1 does not accept 127.1.x.y
+        self._server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class SmtpSink:
+    # accepts any message without TLS or AUTH and only counts it; with limit_per_sec it behaves like
+    # a throttling relay and answers MAIL over the limit with 421 and a dropped connection
+    def __init__(self, limit_per_sec: float = 0.0):
+        self.connections = 0
+        self.messages = 0
+        self.throttled = 0
+        self.limit = limit_per_sec
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _admit(self) -> bool:
+        if not self.limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(1.0, self._tokens + (now - self._updated) * self.limit)
+            self._updated = now
+            if self._tokens < 1.0:
+                self.throttled += 1
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def start(self, port: int = 0) -> int:
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write((line + "\r\n").encode())
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 benchmark sink")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    cmd = line.decode("utf-8", "replace").strip().upper()
+                    if cmd.startswith(("EHLO", "HELO")):
+                        self.reply("250 benchmark sink")
+                    elif cmd.startswith("MAIL") and not sink._admit():
+                        self.reply("421 4.7.0 Try again later, closing connection")
+                        return
+                    elif cmd.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                        self.reply("250 OK")
+                    elif cmd == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline() not in (b".\r\n", b""):
+                            pass
+                        with sink._lock:
+                            sink.messages += 1
+                        self.reply("250 OK queued")
+                    elif cmd == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
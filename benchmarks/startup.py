@@ -0,0 +1,117 @@
+"""CLI cold-start check: wall time and imported modules per command.
+
+Runs each command in a fresh interpreter under `python -X importtime` against an
+empty database, reports the median wall time and the slowest imports, and exits 1
+when a command goes over the budget or imports a module it should not need:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 400 --cmd "send --dry-run" --cmd init-db --json
+
+The module check is the stable half of the gate; wall time depends on the machine,
+so pick a budget with headroom for CI.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+DEFAULT_COMMANDS = ("send --dry-run", "init-db", "db-doctor --no-migrate")
+# the scraping, enrichment and export stacks and the SMTP client; none of these is needed to start
+# the CLI or to dry-run the send queue
+FORBIDDEN = (
+    "requests", "lxml", "bs4", "duckduckgo_search", "phonenumbers", "email_validator", "pandas", "pyarrow", "trafilatura",
+    "smtplib",
+)
+# the sender itself is only for the commands that send
+SENDER_MODULES = ("salesactivator.emailer.sender",)
+SENDING_COMMANDS = ("send", "run")
+DEFAULT_BUDGET_MS = 500
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    # "import time: self [us] | cumulative | <indent>package" -> (module, cumulative us, depth)
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        out.append((name.strip(), int(cumulative), depth))
+    return out
+
+
+def forbidden_imports(cmd: str, modules: List[Tuple[str, int, int]]) -> List[str]:
+    banned = FORBIDDEN if cmd.split()[0] in SENDING_COMMANDS else FORBIDDEN + SENDER_MODULES
+    return sorted({b for m, _, _ in modules for b in banned if m == b or m.startswith(b + ".")})
+
+
+def run_once(cmd: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    argv = [sys.executable, "-X", "importtime", "-m", "salesactivator.cli", "--no-summary"] + cmd.split()
+    t0 = time.perf_counter()
+    proc = subprocess.run(argv, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(f"`{cmd}` failed:\n{proc.stderr[-2000:]}")
+    return elapsed, parse_importtime(proc.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cmd", action="append", default=None,
+                    help=f"CLI command to time (repeatable, default {list(DEFAULT_COMMANDS)}); the module check assumes it scrapes nothing")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="median wall time allowed per command")
+    ap.add_argument("--top", type=int, default=8, help="slowest top-level imports to list")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="salesactivator-startup-")
+    env = dict(os.environ, DB_PATH=os.path.join(workdir, "startup.db"), METRICS_PATH="", DAEMON_STATUS_PATH="")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (os.getcwd(), env.get("PYTHONPATH")) if p)
+
+    results: List[Dict] = []
+    try:
+        subprocess.run([sys.executable, "-m", "salesactivator.cli", "--no-summary", "init-db"], env=env, check=True, capture_output=True)
+        for cmd in args.cmd or DEFAULT_COMMANDS:
+            run_once(cmd, env)  # warm the OS file cache; "cold" here means a fresh interpreter
+            times, modules = [], []
+            for _ in range(args.runs):
+                elapsed, modules = run_once(cmd, env)
+                times.append(elapsed)
+            median_ms = 1000 * statistics.median(times)
+            top_level = {m: us for m, us, depth in modules if depth == 0}
+            forbidden = forbidden_imports(cmd, modules)
+            results.append({
+                "cmd": cmd,
+                "median_ms": round(median_ms, 1),
+                "min_ms": round(1000 * min(times), 1),
+                # the CLI runs as __main__, so its own imports show up as top-level salesactivator.* entries
+                "package_import_ms": round(sum(us for m, us in top_level.items() if m.startswith("salesactivator")) / 1000, 1),
+                "modules": len(modules),
+                "slowest_imports_ms": {m: round(us / 1000, 1) for m, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:args.top]},
+                "forbidden_imports": forbidden,
+                "ok": median_ms <= args.budget_ms and not forbidden,
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({"budget_ms": args.budget_ms, "results": results}, indent=2))
+    else:
+        for r in results:
+            print(f"{r['cmd']}: median {r['median_ms']:.0f} ms (min {r['min_ms']:.0f}), "
+                  f"salesactivator imports {r['package_import_ms']:.0f} ms, {r['modules']} modules -> {'ok' if r['ok'] else 'FAIL'}")
+            print("  slowest: " + ", ".join(f"{m} {ms:.0f}ms" for m, ms in r["slowest_imports_ms"].items()))
+            if r["forbidden_imports"]:
+                print("  imports it should not need: " + ", ".join(r["forbidden_imports"]))
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
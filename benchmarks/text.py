@@ -0,0 +1,87 @@
+"""Micro-benchmarks for utils.text contact extraction and email validation.
+
+    python -m benchmarks.text
+    python -m benchmarks.text --pages 2000 --json
+
+The "two_pass" figure re-implements the original extract_emails + extract_phones
+(two regex scans, stoplist checked with any(endswith)) as a reference point.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from salesactivator.utils import text
+from salesactivator.utils.text import DOMAINS_STOPLIST, EMAIL_REGEX, PHONE_REGEX
+
+WORDS = "events incentive travel venue logistics meeting agenda sponsor keynote summit expo hotel".split()
+
+
+def make_page(i: int, words: int) -> str:
+    rnd = random.Random(i)
+    out = []
+    for n in range(words):
+        out.append(rnd.choice(WORDS))
+        if n % 150 == 0:
+            out.append(f"sales{n}@company{i % 50}-events.com")
+        if n % 200 == 0:
+            out.append(rnd.choice([f"(312) 555-{n % 10000:04d}", f"+1 312.555.{n % 10000:04d}", f"312-555-{n % 10000:04d}"]))
+        if n % 500 == 0:
+            out.append(f"someone{n}@gmail.com")
+    return " ".join(out)
+
+
+def two_pass(page: str):
+    emails = set(EMAIL_REGEX.findall(page))
+    emails = [e for e in emails if not any(e.lower().endswith("@" + d) for d in DOMAINS_STOPLIST)]
+    return emails, list(set(PHONE_REGEX.findall(page)))
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=500)
+    ap.add_argument("--words", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    pages = [make_page(i, args.words) for i in range(args.pages)]
+    emails = [e for p in pages for e in text.extract_emails(p)]
+
+    def cold_validate():
+        text.is_email_valid.cache_clear()
+        for e in emails:
+            text.is_email_valid(e)
+
+    t_two = best_of(lambda: [two_pass(p) for p in pages], args.repeat)
+    t_one = best_of(lambda: [text.extract_contacts(p) for p in pages], args.repeat)
+    t_cold = best_of(cold_validate, args.repeat)
+    t_warm = best_of(lambda: text.validate_many(emails), args.repeat)
+    result = {
+        "pages": len(pages),
+        "emails_checked": len(emails),
+        "two_pass_pages_per_sec": len(pages) / t_two,
+        "single_pass_pages_per_sec": len(pages) / t_one,
+        "validate_cold_per_sec": len(emails) / t_cold,
+        "validate_many_cached_per_sec": len(emails) / t_warm,
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for k, v in result.items():
+            print(f"{k:>30}: {v:.1f}" if isinstance(v, float) else f"{k:>30}: {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,141 @@
 import argparse
-from datetime import datetime
-from urllib.parse import urlparse
+import sys
+import time
+from datetime import datetime, timezone
 import csv
 import os
+from typing import TYPE_CHECKING, List, Tuple
 
 from salesactivator.utils.config import Settings
 from salesactivator.db.store import DB
-from salesactivator.utils.http import Http
-from salesactivator.scrapers.search import search_mice_companies
-from salesactivator.enrich.website import WebsiteEnricher
-from salesactivator.utils.text import is_email_valid, guess_corporate_email_patterns
-from salesactivator.emailer.sender import EmailSender
+from salesactivator.db import migrations, queries, transfer
+from salesactivator.utils.metrics import METRICS
+from salesactivator.utils.profiling import PROFILE_EXTENSIONS, PROFILE_MODES, profiled
+
+# The scraping stack (requests, lxml, bs4, duckduckgo_search, phonenumbers, email_validator), the
+# SMTP sender and db-doctor's query registry are imported inside the commands that use them, so
+# init-db, send and cron jobs do not pay for all of it at startup; benchmarks/startup.py and
+# tests/test_startup.py hold that to a budget.
+if TYPE_CHECKING:
+    from salesactivator.utils.http import Http
+
+
+def make_http(s: Settings) -> "Http":
+    from salesactivator.utils.cache import ResponseCache
+    from salesactivator.utils.http import Http
+
+    cache = None
+    if s.HTTP_CACHE_PATH:
+        cache = ResponseCache(s.HTTP_CACHE_PATH, ttl=s.HTTP_CACHE_TTL_SEC, negative_ttl=s.HTTP_CACHE_NEGATIVE_TTL_SEC, max_bytes=s.HTTP_CACHE_MAX_MB * 1024 * 1024)
+    return Http(s.USER_AGENT, s.REQUEST_DELAY_SEC, max_requests_per_domain=s.MAX_REQUESTS_PER_DOMAIN, max_bytes=s.MAX_PAGE_BYTES, pool_size=s.HTTP_POOL_SIZE, cache=cache, offline=s.HTTP_OFFLINE)
 
 
 def cmd_init_db(args):
     s = Settings()
     db = DB(s.DB_PATH)
-    db.init()
+    for version, name in db.init():
+        print(f"Applied migration {version}: {name}")
     print("DB initialized at", s.DB_PATH)
 
 
+def cmd_db_doctor(args):
+    from salesactivator.db import doctor
+
+    s = Settings()
+    db = DB(s.DB_PATH)
+    con = db.connect()
+    print(f"Schema version {migrations.schema_version(con)} (latest {migrations.SCHEMA_VERSION})")
+    if args.no_migrate:
+        for version, name in migrations.pending(con):
+            print(f"  pending migration {version}: {name}")
+    else:
+        for version, name in db.init():
+            print(f"  applied migration {version}: {name}")
+        con.execute("PRAGMA optimize")  # refresh planner statistics for new indexes
+    issues = 0
+    for r in doctor.diagnose(con):
+        issues += len(r["problems"])
+        if r["problems"] or args.verbose:
+            print(f"{'FLAG' if r['problems'] else 'ok  '} {r['name']}")
+            for line in r["plan"]:
+                print("       " + line)
+            for p in r["problems"]:
+                print("     ! " + p)
+            for p in r["accepted"]:
+                print("     ~ " + p)
+    print(f"{len(doctor.QUERIES)} queries checked, {issues} issue(s)")
+    if issues and args.strict:
+        raise SystemExit(1)
+
+
+SOCIAL_DOMAINS = {"linkedin.com", "facebook.com", "instagram.com", "x.com", "twitter.com"}
+
+
 def cmd_scrape(args):
+    from salesactivator.scrapers.search import build_queries, iter_mice_companies
+    from salesactivator.utils.domains import domain_key, site_url
+
     s = Settings()
     db = DB(s.DB_PATH)
-    http = Http(s.USER_AGENT, s.REQUEST_DELAY_SEC)
-    enricher = WebsiteEnricher(http)
-
-    results = [] if args.use_seeds else search_mice_companies(limit=args.limit)
-    inserted = 0
-    for r in results:
-        href = r.get("href") or ""
-        # try to keep only company domains (not linkedin profiles)
-        parsed = urlparse(href)
-        domain = parsed.netloc
-        if not domain or any(x in domain for x in ["linkedin.com", "facebook.com", "instagram.com", "x.com", "twitter.com"]):
-            continue
-        cid = db.upsert_company(name=r.get("title") or domain, website=f"https://{domain}", country="United States", source="duckduckgo")
-        if cid:
-            inserted += 1
+    if args.use_seeds:
+        results = iter(())
+    else:
+        queries = build_queries(s.INDUSTRY_KEYWORDS, s.COUNTRY) if args.from_keywords else None
+        if args.restart and s.SEARCH_CHECKPOINT_PATH and os.path.exists(s.SEARCH_CHECKPOINT_PATH):
+            os.remove(s.SEARCH_CHECKPOINT_PATH)
+        results = iter_mice_companies(limit=args.limit, queries=queries, workers=args.workers, delay=s.SEARCH_DELAY_SEC, checkpoint_path=s.SEARCH_CHECKPOINT_PATH or None)
+
+    # search results repeat the same sites across queries (www/non-www, deep links); the known
+    # keys set drops them before they cost a DB round trip
+    known = db.domain_keys()
+    skipped = 0
+
+    def company_rows():
+        nonlocal skipped
+        for r in results:
+            website = site_url(r.get("href") or "")
+            key = domain_key(website)
+            # keep only company domains (not linkedin profiles)
+            if not key or key in SOCIAL_DOMAINS:
+                continue
+            if key in known:
+                skipped += 1
+                continue
+            known.add(key)
+            yield {"name": r.get("title") or key, "website": website, "country": "United States", "source": "duckduckgo"}
+
+    # small chunks so results reach the DB while later queries are still running
+    inserted = len(db.upsert_companies(company_rows(), chunk_size=10))
     # fallback to seeds if nothing found or explicit flag
     if inserted == 0 or args.use_seeds:
-        seeds_path = os.path.join(os.path.dirname(__file__), "..", "data", "seeds_companies.csv")
+        seeds_path = args.seeds or s.SEEDS_PATH or os.path.join(os.path.dirname(__file__), "..", "data", "seeds_companies.csv")
         seeds_path = os.path.abspath(seeds_path)
         if os.path.exists(seeds_path):
             with open(seeds_path, newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
-                for row in reader:
-                    cid = db.upsert_company(
-                        name=row.get("name") or "",
-                        website=row.get("website") or "",
-                        city=row.get("city"),
-                        state=row.get("state"),
-                        country=row.get("country"),
-                        source="seeds",
-                    )
-                    if cid:
-                        inserted += 1
-    print(f"Scrape done. Upserted companies: {inserted}")
+                inserted += len(db.upsert_companies(
+                    {"name": row.get("name") or "", "website": row.get("website") or "", "city": row.get("city"), "state": row.get("state"), "country": row.get("country"), "source": "seeds"}
+                    for row in reader
+                ))
+    print(f"Scrape done. Upserted companies: {inserted}, duplicate sites skipped: {skipped}")
 
 
-def cmd_enrich(args):
-    s = Settings()
-    db = DB(s.DB_PATH)
-    http = Http(s.USER_AGENT, s.REQUEST_DELAY_SEC)
-    enricher = WebsiteEnricher(http)
-
-    companies = db.query("SELECT id, name, website FROM companies ORDER BY id DESC LIMIT ?", (args.limit,))
-    created_leads = 0
-    for c in companies:
-        info = enricher.enrich(c["website"])
-        # Save generic emails as contacts if present
+ENRICH_FLUSH_SIZE = 50
+
+
+def _save_enrichments(db: DB, items: List[Tuple[dict, dict]]) -> int:
+    from salesactivator.utils.text import is_email_valid
+
+    # Companies whose homepage could not be fetched are not enriched: they are only marked failed
+    # and retried soon. Those whose pages did not change since the last run only get their
+    # enriched_at bumped.
+    failed = [c["id"] for c, info in items if not info.get("pages")]
+    items = [(c, info) for c, info in items if info.get("pages")]
+    changed = [(c, info) for c, info in items if not (c.get("has_lead") and info.get("content_hash") == c.get("content_hash"))]
+    # Save generic emails as contacts if present, then one lead per company
+    contact_rows = []
+    has_contact = []
+    for company, info in changed:
         emails = info.get("emails", [])
         phones = info.get("phones", [])
         main_email = None
@@ -77,53 +143,190 @@ def cmd_enrich(args):
             if is_email_valid(e):
                 main_email = e
                 break
-        contact_id = None
+        has_contact.append(bool(main_email))
         if main_email:
-            contact_id = db.add_contact(c["id"], full_name="General Contact", role="Info", email=main_email, phone=phones[0] if phones else None)
-        lead_id = db.add_lead(c["id"], contact_id=contact_id, status="enriched")
-        created_leads += 1
-    print(f"Enrichment done. Leads created: {created_leads}")
+            contact_rows.append({"company_id": company["id"], "full_name": "General Contact", "role": "Info", "email": main_email, "phone": phones[0] if phones else None})
+    with db.transaction():
+        contact_ids = iter(db.add_contacts(contact_rows))
+        db.upsert_leads(
+            {"company_id": company["id"], "contact_id": next(contact_ids) if found else None, "status": "enriched"}
+            for (company, _), found in zip(changed, has_contact)
+        )
+        db.mark_enriched({"company_id": c["id"], "content_hash": info.get("content_hash"), "pages": info.get("pages")} for c, info in items)
+        db.mark_fetch_failed(failed)
+    return len(changed)
+
+
+def cmd_enrich(args):
+    from salesactivator.enrich.pipeline import EnrichPipeline
+    from salesactivator.enrich.website import WebsiteEnricher
+
+    s = Settings()
+    db = DB(s.DB_PATH)
+    http = make_http(s)
+    enricher = WebsiteEnricher(http, extractor=args.extractor or s.HTML_EXTRACTOR, max_pages=s.CRAWL_MAX_PAGES, respect_robots=s.CRAWL_RESPECT_ROBOTS)
+
+    if args.all:
+        companies = db.query(queries.ENRICH_ALL, (args.limit,))
+    else:
+        ttl_days = args.ttl_days if args.ttl_days is not None else s.ENRICH_TTL_DAYS
+        retry = f"-{s.ENRICH_RETRY_HOURS} hours"
+        companies = db.query(queries.ENRICH_PENDING, (retry, args.limit, f"-{ttl_days} days", retry, args.limit, args.limit))
+    updated = 0
+    requests = 0
+    found = 0
+    pending: List[Tuple[dict, dict]] = []
+
+    def flush():
+        nonlocal updated
+        updated += _save_enrichments(db, pending)
+        pending.clear()
+
+    def on_result(i, info):
+        nonlocal requests, found
+        requests += info.get("requests", 0)
+        found += bool(info.get("contact_found"))
+        pending.append((companies[i], info))
+        if len(pending) >= ENRICH_FLUSH_SIZE:
+            flush()
+
+    try:
+        if args.pipeline:
+            pipeline = EnrichPipeline(enricher, fetchers=args.concurrency, parsers=args.parsers or os.cpu_count() or 1, queue_size=args.queue_size)
+            pipeline.run([c["website"] for c in companies], on_result=on_result)
+        elif args.concurrency > 1:
+            enricher.enrich_many([c["website"] for c in companies], concurrency=args.concurrency, on_result=on_result)
+        else:
+            for i, c in enumerate(companies):
+                on_result(i, enricher.enrich(c["website"]))
+    finally:
+        flush()  # sites finished before a failure are kept
+    print(f"Enrichment done. Companies checked: {len(companies)}, leads created/updated: {updated}, unchanged: {len(companies) - updated}")
+    print(f"Requests: {requests}, sites with a contact: {found}, requests per contact: {requests / found if found else 0:.2f}")
 
 
 def cmd_sequence(args):
+    from salesactivator.emailer.sender import EmailSender
+
     s = Settings()
     db = DB(s.DB_PATH)
     sender = EmailSender(s)
-    leads = db.query("""
-        SELECT leads.id as lead_id, companies.name as company, contacts.full_name as contact
-        FROM leads
-        LEFT JOIN companies ON leads.company_id = companies.id
-        LEFT JOIN contacts ON leads.contact_id = contacts.id
-        WHERE leads.id NOT IN (SELECT DISTINCT lead_id FROM email_queue)
-        ORDER BY leads.id DESC LIMIT ?
-    """, (args.limit,))
-    for r in leads:
-        sender.create_sequence(db, r["lead_id"], r.get("contact"), r.get("company") or "", datetime.now())
+    leads = db.query(queries.SEQUENCE_LEADS, (args.limit,))
+    sender.create_sequences(db, leads, datetime.now(timezone.utc))
     print(f"Sequence scheduled for {len(leads)} leads")
 
 
 def cmd_send(args):
+    from salesactivator.emailer.sender import EmailSender
+
     s = Settings()
     db = DB(s.DB_PATH)
     sender = EmailSender(s)
-    cnt = sender.send_due(db, dry_run=args.dry_run)
+    cnt = sender.send_due(db, dry_run=args.dry_run, workers=args.workers, limit=args.limit)
     print(f"Emails sent: {cnt}")
 
 
-def main():
+def cmd_run(args):
+    from salesactivator.emailer.daemon import SendDaemon
+    from salesactivator.emailer.sender import EmailSender
+
+    s = Settings()
+    db = DB(s.DB_PATH)
+    daemon = SendDaemon(
+        db, EmailSender(s),
+        batch=args.batch or s.SEND_BATCH,
+        workers=args.workers,
+        rate_per_min=args.rate_per_min if args.rate_per_min is not None else s.SEND_RATE_PER_MIN,
+        poll=args.poll or s.DAEMON_POLL_SEC,
+        horizon=s.DAEMON_HORIZON_SEC,
+        status_path=(args.status_file if args.status_file is not None else s.DAEMON_STATUS_PATH) or None,
+        dry_run=args.dry_run,
+        smtp_idle=s.SMTP_IDLE_TIMEOUT_SEC,
+    )
+    daemon.install_signal_handlers()
+    print(f"Send daemon {daemon.sender.worker_id} running (SIGTERM or Ctrl+C to stop)")
+    daemon.run()
+    print(f"Send daemon stopped. Emails sent: {daemon.sent}")
+
+
+def cmd_import(args):
+    s = Settings()
+    db = DB(s.DB_PATH)
+    db.init()  # importing into a new database is a normal first step
+    fmt = transfer.detect_format(args.path, args.format)
+    rows = transfer.map_columns(transfer.read_rows(args.path, fmt, args.chunk_size), transfer.parse_mapping(args.map))
+    t0 = time.perf_counter()
+    loaded, skipped = transfer.import_rows(db, args.what, rows, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - t0
+    print(f"Imported {loaded} {args.what} rows from {args.path} in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):.0f}/s), skipped without website: {skipped}")
+
+
+def cmd_export(args):
+    s = Settings()
+    db = DB(s.DB_PATH)
+    fmt = transfer.detect_format(args.path, args.format)
+    t0 = time.perf_counter()
+    n = transfer.export_rows(db, args.what, args.path, fmt, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - t0
+    # stderr, so `export ... -` can be piped
+    print(f"Exported {n} {args.what} rows to {args.path} in {elapsed:.1f}s ({n / max(elapsed, 1e-9):.0f}/s)", file=sys.stderr)
+
+
+def cmd_compact(args):
+    from salesactivator.db.retention import compact_queue
+
+    s = Settings()
+    db = DB(s.DB_PATH)
+    archive = args.archive or s.QUEUE_ARCHIVE_PATH
+    t0 = time.perf_counter()
+    r = compact_queue(
+        db, archive,
+        retention_days=args.older_than_days if args.older_than_days is not None else s.QUEUE_RETENTION_DAYS,
+        batch_size=args.batch_size, vacuum=args.vacuum,
+    )
+    months = ", ".join(f"{month}: {n}" for month, n in r["by_month"].items())
+    print(f"Archived {r['archived']} finished emails to {archive} in {time.perf_counter() - t0:.1f}s" + (f" ({months})" if months else ""))
+    print(f"Pruned {r['usage_rows_pruned']} old sender usage rows; database shrank {r['freed_mb']:.1f} MB, {r['free_mb']:.1f} MB free pages left")
+    if r["vacuum_note"]:
+        print(r["vacuum_note"])
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(prog="salesactivator")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="Run the command under cProfile (cpu, main thread only) or tracemalloc (mem) and save the result")
+    parser.add_argument("--profile-out", default=None, help="Profile output path (default data/profile-<cmd>-<time>.<ext>)")
+    parser.add_argument("--metrics-out", default=None, help="Write metrics to this file: .json for JSON, anything else Prometheus text (default METRICS_PATH)")
+    parser.add_argument("--no-summary", action="store_true", help="Do not print the metrics summary to stderr")
     sub = parser.add_subparsers(dest="cmd")
 
     p1 = sub.add_parser("init-db")
     p1.set_defaults(func=cmd_init_db)
 
+    p_doc = sub.add_parser("db-doctor", help="Apply schema migrations and check every query plan for full scans and temp B-trees")
+    p_doc.add_argument("--no-migrate", action="store_true", help="Only list pending migrations")
+    p_doc.add_argument("--verbose", "-v", action="store_true", help="Print every plan, not only flagged ones")
+    p_doc.add_argument("--strict", action="store_true", help="Exit 1 when any query is flagged")
+    p_doc.set_defaults(func=cmd_db_doctor)
+
     p2 = sub.add_parser("scrape")
-    p2.add_argument("--limit", type=int, default=30)
+    p2.add_argument("--limit", type=int, default=30, help="Stop after this many search results; a run that reaches it removes the search checkpoint")
     p2.add_argument("--use-seeds", action="store_true", help="Load seed companies CSV instead of web search (or as fallback)")
+    p2.add_argument("--workers", type=int, default=2, help="Search queries run in parallel (sharing one rate limit)")
+    p2.add_argument("--from-keywords", action="store_true", help="Build queries from INDUSTRY_KEYWORDS and COUNTRY instead of the built-in list")
+    p2.add_argument("--restart", action="store_true", help="Ignore the search checkpoint left by an interrupted or rate-limited run")
+    p2.add_argument("--seeds", default=None, help="Seed CSV path (default SEEDS_PATH or data/seeds_companies.csv)")
     p2.set_defaults(func=cmd_scrape)
 
     p3 = sub.add_parser("enrich")
     p3.add_argument("--limit", type=int, default=50)
+    p3.add_argument("--ttl-days", type=float, default=None, help="Re-check companies enriched longer ago than this (default ENRICH_TTL_DAYS)")
+    p3.add_argument("--all", action="store_true", help="Ignore the TTL and re-check the newest --limit companies")
+    p3.add_argument("--extractor", choices=["fast", "soup"], default=None, help="HTML extractor (default HTML_EXTRACTOR)")
+    p3.add_argument("--concurrency", type=int, default=1, help="Enrich this many companies at once (async mode when > 1)")
+    p3.add_argument("--pipeline", action="store_true", help="Fetch with --concurrency threads, parse in a process pool, write from one thread")
+    p3.add_argument("--parsers", type=int, default=0, help="Parser processes in --pipeline mode (default: CPU count)")
+    p3.add_argument("--queue-size", type=int, default=64, help="Bound on each --pipeline stage queue")
     p3.set_defaults(func=cmd_enrich)
 
     p4 = sub.add_parser("sequence")
@@ -132,13 +335,62 @@ def main():
 
     p5 = sub.add_parser("send")
     p5.add_argument("--dry-run", action="store_true")
+    p5.add_argument("--limit", type=int, default=100, help="Max due emails to claim in this run")
+    p5.add_argument("--workers", type=int, default=None, help="Concurrent SMTP sessions (default SMTP_WORKERS)")
     p5.set_defaults(func=cmd_send)
 
-    args = parser.parse_args()
-    if hasattr(args, "func"):
-        args.func(args)
-    else:
+    p6 = sub.add_parser("run", help="Send due emails continuously, waking when the next one is due")
+    p6.add_argument("--dry-run", action="store_true")
+    p6.add_argument("--batch", type=int, default=None, help="Max emails claimed per batch (default SEND_BATCH)")
+    p6.add_argument("--workers", type=int, default=None, help="Concurrent SMTP sessions (default SMTP_WORKERS)")
+    p6.add_argument("--rate-per-min", type=float, default=None, help="Average send rate cap (default SEND_RATE_PER_MIN, 0 = none)")
+    p6.add_argument("--poll", type=float, default=None, help="Seconds between checks for new queue rows (default DAEMON_POLL_SEC)")
+    p6.add_argument("--status-file", default=None, help="JSON status file with queue depth and lag (default DAEMON_STATUS_PATH)")
+    p6.set_defaults(func=cmd_run)
+
+    p7 = sub.add_parser("import", help="Load companies, contacts or leads from CSV, NDJSON or Parquet in chunks")
+    p7.add_argument("what", choices=transfer.IMPORTS)
+    p7.add_argument("path", help="Input file, or - for stdin (CSV/NDJSON)")
+    p7.add_argument("--format", choices=transfer.FORMATS, default=None, help="Default: from the file extension")
+    p7.add_argument("--map", action="append", default=[], metavar="SOURCE=TARGET",
+                    help="Rename an input column, e.g. --map 'Company Name=name' (repeatable). Known columns: "
+                         + ", ".join(transfer.COMPANY_FIELDS + transfer.CONTACT_FIELDS) + ", status")
+    p7.add_argument("--chunk-size", type=int, default=transfer.TRANSFER_CHUNK_SIZE, help="Rows per transaction")
+    p7.set_defaults(func=cmd_import)
+
+    p8 = sub.add_parser("export", help="Write companies, contacts, leads or queue rows to CSV, NDJSON or Parquet in chunks")
+    p8.add_argument("what", choices=list(transfer.EXPORTS))
+    p8.add_argument("path", help="Output file, or - for stdout (CSV/NDJSON)")
+    p8.add_argument("--format", choices=transfer.FORMATS, default=None, help="Default: from the file extension")
+    p8.add_argument("--chunk-size", type=int, default=transfer.TRANSFER_CHUNK_SIZE, help="Rows read per query")
+    p8.set_defaults(func=cmd_export)
+
+    p9 = sub.add_parser("compact", help="Move finished emails out of the queue into a monthly archive database")
+    p9.add_argument("--older-than-days", type=float, default=None, help="Archive emails last attempted before this (default QUEUE_RETENTION_DAYS)")
+    p9.add_argument("--archive", default=None, help="Archive database path (default QUEUE_ARCHIVE_PATH)")
+    p9.add_argument("--batch-size", type=int, default=5000, help="Rows moved per transaction")
+    p9.add_argument("--vacuum", choices=["incremental", "full"], default=None,
+                    help="Return freed pages to the OS: incremental is quick but needs one full run first; full rewrites the database")
+    p9.set_defaults(func=cmd_compact)
+
+    args = parser.parse_args(argv)
+    if not hasattr(args, "func"):
         parser.print_help()
+        return
+    METRICS.reset()
+    try:
+        if args.profile:
+            path = args.profile_out or f"data/profile-{args.cmd}-{time.strftime('%Y%m%d-%H%M%S')}.{PROFILE_EXTENSIONS[args.profile]}"
+            with profiled(args.profile, path):
+                args.func(args)
+        else:
+            args.func(args)
+    finally:
+        if not args.no_summary and (METRICS.counters or METRICS.histograms):
+            print("\n".join(METRICS.summary()), file=sys.stderr)
+        metrics_out = args.metrics_out or Settings().METRICS_PATH
+        if metrics_out:
+            METRICS.write(metrics_out)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+import re
+import sqlite3
+from typing import Any, Dict, List, Tuple
+
+from salesactivator.db import queries, retention, store
+from salesactivator.db.transfer import EXPORTS
+
+# Every statement the package and dashboard run against the main database, with sample
+# parameters for EXPLAIN QUERY PLAN. The SQL comes from the constants the callers run; IN lists
+# get two values.
+_M2 = store._marks(2)
+QUERIES: Dict[str, Tuple[str, Tuple[Any, ...]]] = {
+    # DB convenience and bulk methods (db/store.py)
+    "upsert_company.lookup": (store.COMPANY_BY_KEY, ("example.com",)),
+    "upsert_company.lookup_website": (store.COMPANY_BY_WEBSITE, ("https://example.com",)),
+    "upsert_companies.keys": (store.COMPANIES_BY_KEY.format(marks=_M2), ("a.com", "b.com")),
+    "domain_keys": (store.DOMAIN_KEYS, ()),
+    "add_contact.lookup": (store.CONTACT_BY_EMAIL, (1, "a@example.com")),
+    "upsert_companies.ids": (store.COMPANIES_BY_WEBSITE.format(marks=_M2), ("https://a.com", "https://b.com")),
+    "add_contacts.no_email": (store.CONTACTS_WITHOUT_EMAIL.format(marks=_M2), (1, 2)),
+    "add_contacts.ids": (store.CONTACTS_BY_EMAIL.format(marks=_M2), ("a@a.com", "b@b.com")),
+    "upsert_leads.existing": (store.LEADS_BY_COMPANY.format(marks=_M2), (1, 2)),
+    "upsert_leads.update": (store.UPDATE_LEAD, (1, "enriched", 1)),
+    "mark_enriched.company": (store.MARK_ENRICHED, ("h", 1)),
+    "mark_fetch_failed": (store.MARK_FETCH_FAILED, (1,)),
+    "claim_due_emails.claim": (store.CLAIM_DUE, ("w", "+300 seconds", 100, 100)),
+    "claim_due_emails.rows": (store.CLAIMED_ROWS, ("w",)),
+    "claim_due_emails.expired_accounts": (store.EXPIRED_LEASES, (100,)),
+    "claim_due_emails.candidates": (store.CLAIM_CANDIDATES.format(marks=store._marks(1)), ("a1",)),
+    "claim_due_emails.assign": (store.CLAIM_FOR_ACCOUNT, ("w", "+300 seconds", "a1", 1)),
+    "claim_due_emails.stick": (store.STICK_ACCOUNT, ("a1", 1)),
+    "sender_usage": (store.SENDER_USAGE, ()),
+    "in_flight_by_account": (store.IN_FLIGHT, ()),
+    "record_sends": (store.RECORD_SENDS, ("a1", 1)),
+    "finish_emails": (store.FINISH_EMAILS, ("sent", 1, None, 1, "w")),
+    "retry_emails": (store.RETRY_EMAILS, (1, "421 try again later", "+60 seconds", "+60 seconds", 1, 1, 1, "w")),
+    # send daemon (emailer/daemon.py)
+    "daemon.first_load": (queries.DAEMON_FIRST_LOAD, ("2030-01-01 00:00:00",)),
+    "daemon.max_id": (queries.DAEMON_MAX_ID, ()),
+    "daemon.new_rows": (queries.DAEMON_NEW_ROWS, (1000, 2000, "2030-01-01 00:00:00")),
+    "daemon.window": (queries.DAEMON_WINDOW, ("2030-01-01 00:00:00", "2030-01-01 01:00:00")),
+    "daemon.leases": (queries.DAEMON_LEASES, ()),
+    "daemon.rearm": (queries.DAEMON_REARM.format(marks=_M2), (1, 2)),
+    "daemon.depth": (queries.DAEMON_DEPTH, ()),
+    # commands (cli.py)
+    "enrich.companies": (queries.ENRICH_PENDING, ("-6 hours", 50, "-30 days", "-6 hours", 50, 50)),
+    "enrich.companies_all": (queries.ENRICH_ALL, (50,)),
+    "sequence.leads": (queries.SEQUENCE_LEADS, (50,)),
+    # dashboard (app.py)
+    "dashboard.lead_counts": (queries.STATUS_COUNTS.format(table="leads"), ()),
+    "dashboard.queue_counts": (queries.STATUS_COUNTS.format(table="email_queue"), ()),
+    "dashboard.archived_counts": (queries.ARCHIVED_COUNTS, ()),
+    "dashboard.sends_per_day": (queries.SENDS_PER_DAY, ()),
+    "dashboard.leads_page": (queries.keyset_page(queries.LEADS, queries.LEADS_ORDER, after=True), ("2030-01-01", 1, 100)),
+    "dashboard.queue": (queries.QUEUE_HEAD, ()),
+    "dashboard.companies_page": (queries.keyset_page(queries.COMPANIES, queries.COMPANIES_ORDER, after=True), ("2030-01-01", 1, 100)),
+    "dashboard.contacts": (queries.CONTACTS, (100,)),
+}
+# queue retention (db/retention.py); the archive database is attached only while compacting
+QUERIES.update({
+    "compact.candidates": (retention.CANDIDATES, (0, 10 ** 6, "2030-01-01 00:00:00", 5000)),
+    "compact.history": (retention.RECORD_HISTORY, (0, 5000, "2030-01-01 00:00:00")),
+    "compact.count_archived": (retention.COUNT_ARCHIVED, (1, 1)),
+    "compact.delete": (retention.DELETE_BATCH, (0, 5000, "2030-01-01 00:00:00")),
+    "compact.prune_usage": (retention.PRUNE_USAGE, ()),
+})
+# import/export (db/transfer.py), one keyset page each
+QUERIES.update({f"export.{name}": (sql, (0, 5000)) for name, (sql, _) in EXPORTS.items()})
+
+# Findings that are expected: the scan walks the rowid backwards and stops at LIMIT, or the
+# temp B-tree only ever holds a bounded number of rows.
+ACCEPTED: Dict[Tuple[str, str], str] = {
+    ("enrich.companies_all", "full scan of companies"): "rowid order, stops at --limit",
+    ("sequence.leads", "full scan of leads"): "rowid order, stops at --limit unqueued leads",
+    ("dashboard.contacts", "full scan of contacts"): "rowid order, stops at one page",
+    ("dashboard.sends_per_day", "use temp b-tree for group by"): "at most 30 groups",
+    ("dashboard.archived_counts", "full scan of queue_history"): "one row per day and status",
+    ("dashboard.archived_counts", "use temp b-tree for group by"): "one group per status",
+    ("compact.history", "use temp b-tree for group by"): "one batch of archived rows",
+    ("sender_usage", "use temp b-tree for group by"): "one group per account over at most 24 hour buckets",
+    ("in_flight_by_account", "use temp b-tree for group by"): "only rows being sent right now",
+}
+
+# "SCAN companies" reads the whole table; "SCAN t USING [COVERING] INDEX" walks an index in order
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def explain(con: sqlite3.Connection, sql: str, params: Tuple[Any, ...]) -> List[Tuple[int, int, str]]:
+    # (id, parent, detail) rows of the plan tree
+    return [(r[0], r[1], r[3]) for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def problems(plan: List[Tuple[int, int, str]]) -> List[str]:
+    found = []
+    for _, _, detail in plan:
+        m = FULL_SCAN.match(detail)
+        if m:
+            found.append(f"full scan of {m.group(1)}")
+        elif "USE TEMP B-TREE" in detail:
+            found.append(detail.lower())
+    return found
+
+
+def format_plan(plan: List[Tuple[int, int, str]]) -> List[str]:
+    depth = {0: -1}
+    lines = []
+    for node, parent, detail in plan:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def diagnose(con: sqlite3.Connection) -> List[Dict[str, Any]]:
+    report = []
+    for name, (sql, params) in QUERIES.items():
+        try:
+            plan = explain(con, sql, params)
+        except sqlite3.OperationalError as e:  # schema behind the code: missing table or column
+            report.append({"name": name, "plan": [], "problems": [f"error: {e}"], "accepted": []})
+            continue
+        found = problems(plan)
+        report.append({
+            "name": name,
+            "plan": format_plan(plan),
+            "problems": [p for p in found if (name, p) not in ACCEPTED],
+            "accepted": [f"{p} ({ACCEPTED[name, p]})" for p in found if (name, p) in ACCEPTED],
+        })
+    return report
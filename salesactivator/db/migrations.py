@@ -0,0 +1,195 @@
+import sqlite3
+from typing import Callable, List, Tuple, Union
+
+from salesactivator.utils.domains import domain_key
+
+# A step is a SQL statement, an (table, column, declaration) column to add if missing, or a
+# function of the connection for data backfills.
+Step = Union[str, Tuple[str, str, str], Callable[[sqlite3.Connection], None]]
+
+
+def _backfill_domain_keys(con: sqlite3.Connection):
+    rows = con.execute("SELECT id, website FROM companies WHERE domain_key IS NULL").fetchall()
+    con.executemany("UPDATE companies SET domain_key=? WHERE id=?", [(domain_key(w or "") or None, i) for i, w in rows])
+
+
+def _recompute_domain_keys(con: sqlite3.Connection):
+    # keys computed before sites on hosting platforms got their own
+    rows = con.execute("SELECT id, website, domain_key FROM companies WHERE domain_key IS NOT NULL").fetchall()
+    con.executemany(
+        "UPDATE companies SET domain_key=? WHERE id=?",
+        [(key, i) for i, w, old in rows for key in [domain_key(w or "") or None] if key != old],
+    )
+
+
+# Versioned schema changes, applied in order and recorded in PRAGMA user_version. Never edit a
+# released migration; append a new one. Every step is idempotent so databases created before
+# versioning (user_version 0) can replay the whole list.
+MIGRATIONS: List[Tuple[int, str, Tuple[Step, ...]]] = [
+    (1, "base schema", (
+        """CREATE TABLE IF NOT EXISTS companies (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            website TEXT,
+            city TEXT,
+            state TEXT,
+            country TEXT,
+            source TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_website ON companies(website)",
+        """CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY,
+            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+            full_name TEXT,
+            role TEXT,
+            email TEXT,
+            phone TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts(email)",
+        """CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY,
+            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+            contact_id INTEGER REFERENCES contacts(id) ON DELETE SET NULL,
+            status TEXT DEFAULT 'new', -- new, enriched, active, won, lost
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_leads_company ON leads(company_id)",
+        """CREATE TABLE IF NOT EXISTS email_queue (
+            id INTEGER PRIMARY KEY,
+            lead_id INTEGER REFERENCES leads(id) ON DELETE CASCADE,
+            step INTEGER,
+            subject TEXT, -- rendered text, only for rows queued before template references
+            body TEXT,
+            status TEXT DEFAULT 'scheduled', -- scheduled, sending, sent, failed, skipped
+            scheduled_at TIMESTAMP,
+            last_attempt_at TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_queue_scheduled ON email_queue(status, scheduled_at)",
+    )),
+    (2, "send claims", (
+        ("email_queue", "claimed_by", "TEXT"),
+        ("email_queue", "claimed_until", "TIMESTAMP"),
+    )),
+    (3, "one contact per company email", (
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_company_email ON contacts(company_id, email)",
+    )),
+    (4, "incremental enrichment", (
+        ("companies", "enriched_at", "TIMESTAMP"),
+        ("companies", "content_hash", "TEXT"),
+        "CREATE INDEX IF NOT EXISTS idx_companies_enriched ON companies(enriched_at)",
+        """CREATE TABLE IF NOT EXISTS company_pages (
+            company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+            url TEXT,
+            content_hash TEXT,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (company_id, url)
+        )""",
+    )),
+    (5, "template references", (
+        ("email_queue", "template_id", "TEXT"),
+        ("email_queue", "template_version", "INTEGER"),
+        ("email_queue", "params", "TEXT"),  # JSON template parameters
+    )),
+    (6, "indexes flagged by db-doctor", (
+        # sequence's "not queued yet" probe and the ON DELETE CASCADE from leads
+        "CREATE INDEX IF NOT EXISTS idx_queue_lead ON email_queue(lead_id)",
+        # rows a sender holds, and the dashboard's queue view and sends-per-day chart
+        "CREATE INDEX IF NOT EXISTS idx_queue_claimed ON email_queue(claimed_by)",
+        "CREATE INDEX IF NOT EXISTS idx_queue_scheduled_at ON email_queue(scheduled_at)",
+        "CREATE INDEX IF NOT EXISTS idx_queue_attempt ON email_queue(status, last_attempt_at)",
+        # dashboard keyset pages and KPI counts
+        "CREATE INDEX IF NOT EXISTS idx_leads_created ON leads(created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status)",
+        "CREATE INDEX IF NOT EXISTS idx_companies_created ON companies(created_at, id)",
+        # the ON DELETE SET NULL from contacts
+        "CREATE INDEX IF NOT EXISTS idx_leads_contact ON leads(contact_id)",
+    )),
+    (7, "canonical domain key", (
+        # not UNIQUE: databases from before the key may hold www/non-www duplicates; new rows are
+        # deduplicated by upsert_companies and the oldest row of a key is the one enriched
+        ("companies", "domain_key", "TEXT"),
+        _backfill_domain_keys,
+        "CREATE INDEX IF NOT EXISTS idx_companies_domain_key ON companies(domain_key)",
+    )),
+    (8, "sender accounts", (
+        ("leads", "sender_account", "TEXT"),  # every step of a lead goes out from the same account
+        ("email_queue", "account_id", "TEXT"),  # account a claimed or sent row was assigned to
+        # sends per account per UTC hour: hourly quotas read one bucket, daily ones the last 24
+        """CREATE TABLE IF NOT EXISTS sender_usage (
+            hour TEXT,
+            account_id TEXT,
+            sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (hour, account_id)
+        ) WITHOUT ROWID""",
+    )),
+    (9, "queue retention", (
+        # queue rows moved to the archive database by `compact`; sequence skips these leads too
+        ("leads", "archived_emails", "INTEGER NOT NULL DEFAULT 0"),
+        # archived rows per day and final status, so reports still cover them
+        """CREATE TABLE IF NOT EXISTS queue_history (
+            day TEXT,
+            status TEXT,
+            emails INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status)
+        ) WITHOUT ROWID""",
+    )),
+    (10, "send retries", (
+        ("email_queue", "attempts", "INTEGER NOT NULL DEFAULT 0"),  # delivery attempts so far
+        ("email_queue", "next_attempt_at", "TIMESTAMP"),  # set when a temporary failure was rescheduled
+        ("email_queue", "last_error", "TEXT"),  # SMTP reply of the last attempt if it failed
+    )),
+    (11, "retry age", (
+        ("email_queue", "retrying_since", "TIMESTAMP"),  # first failed attempt; retries stop SEND_RETRY_MAX_AGE_SEC later
+    )),
+    (12, "hosting platform domain keys", (
+        _recompute_domain_keys,
+    )),
+    (13, "enrich fetch failures", (
+        ("companies", "fetch_failed_at", "TIMESTAMP"),  # last enrich that could not fetch the homepage
+    )),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(con: sqlite3.Connection) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending(con: sqlite3.Connection) -> List[Tuple[int, str]]:
+    current = schema_version(con)
+    return [(version, name) for version, name, _ in MIGRATIONS if version > current]
+
+
+def _apply(con: sqlite3.Connection, step: Step):
+    if isinstance(step, str):
+        con.execute(step)
+        return
+    if callable(step):
+        step(con)
+        return
+    table, column, decl = step
+    if column not in {r[1] for r in con.execute(f"PRAGMA table_info({table})")}:
+        con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def migrate(con: sqlite3.Connection) -> List[Tuple[int, str]]:
+    # con must be in autocommit mode; each migration commits together with its version bump
+    applied = []
+    for version, name, steps in MIGRATIONS:
+        if version <= schema_version(con):
+            continue
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if version > schema_version(con):  # another process may have got here first
+                for step in steps:
+                    _apply(con, step)
+                con.execute(f"PRAGMA user_version = {version}")
+                applied.append((version, name))
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+    return applied
@@ -0,0 +1,86 @@
+from typing import Sequence
+
+# Statements run by the commands (cli.py), the send daemon and the dashboard (app.py), here so
+# db-doctor checks the exact SQL that runs without importing the SMTP sender. Statements of the DB
+# methods and retention live next to their code.
+
+# skips rows that duplicate an older company's domain (possible in databases from before the key)
+FIRST_OF_DOMAIN = """NOT EXISTS(SELECT 1 FROM companies dup
+               WHERE dup.domain_key = companies.domain_key AND dup.id < companies.id)"""
+# sites whose last fetch failed wait ENRICH_RETRY_HOURS instead of the full TTL
+NOT_FAILING = "(companies.fetch_failed_at IS NULL OR companies.fetch_failed_at < datetime('now', ?))"
+ENRICH_COLUMNS = """companies.id, companies.name, companies.website, companies.content_hash,
+               EXISTS(SELECT 1 FROM leads WHERE leads.company_id = companies.id) AS has_lead"""
+ENRICH_ALL = f"SELECT {ENRICH_COLUMNS} FROM companies WHERE {FIRST_OF_DOMAIN} ORDER BY companies.id DESC LIMIT ?"
+# new companies first (newest first), then the ones whose last enrichment is older than the TTL
+# (oldest first); each branch reads idx_companies_enriched in order instead of sorting the table
+ENRICH_PENDING = f"""
+SELECT * FROM (SELECT {ENRICH_COLUMNS} FROM companies WHERE companies.enriched_at IS NULL AND {NOT_FAILING} AND {FIRST_OF_DOMAIN}
+    ORDER BY companies.id DESC LIMIT ?)
+UNION ALL
+SELECT * FROM (SELECT {ENRICH_COLUMNS} FROM companies WHERE companies.enriched_at < datetime('now', ?) AND {NOT_FAILING} AND {FIRST_OF_DOMAIN}
+    ORDER BY companies.enriched_at ASC LIMIT ?)
+LIMIT ?
+"""
+SEQUENCE_LEADS = """
+SELECT leads.id as lead_id, companies.name as company, contacts.full_name as contact
+FROM leads
+LEFT JOIN companies ON leads.company_id = companies.id
+LEFT JOIN contacts ON leads.contact_id = contacts.id
+WHERE leads.archived_emails = 0 AND NOT EXISTS (SELECT 1 FROM email_queue WHERE email_queue.lead_id = leads.id)
+ORDER BY leads.id DESC LIMIT ?
+"""
+
+# send daemon (emailer/daemon.py)
+DAEMON_MAX_ID = "SELECT COALESCE(MAX(id), 0) AS n FROM email_queue"
+# first load: everything overdue or due within the horizon
+DAEMON_FIRST_LOAD = "SELECT id, scheduled_at FROM email_queue WHERE status='scheduled' AND scheduled_at <= ?"
+# rows queued since the last refresh that fall inside the loaded window; the unary + keeps SQLite
+# on the rowid range instead of idx_queue_scheduled
+DAEMON_NEW_ROWS = "SELECT id, scheduled_at FROM email_queue WHERE id > ? AND id <= ? AND +status='scheduled' AND +scheduled_at <= ?"
+# rows the window now reaches
+DAEMON_WINDOW = "SELECT id, scheduled_at FROM email_queue WHERE status='scheduled' AND scheduled_at > ? AND scheduled_at <= ?"
+DAEMON_LEASES = "SELECT id, claimed_until FROM email_queue WHERE status='sending'"
+# unary + keeps SQLite on the rowid lookups instead of walking every scheduled row
+DAEMON_REARM = "SELECT id, scheduled_at FROM email_queue WHERE id IN ({marks}) AND +status='scheduled'"
+DAEMON_DEPTH = "SELECT COUNT(*) AS n FROM email_queue WHERE status='scheduled'"
+
+# dashboard
+STATUS_COUNTS = "SELECT status, COUNT(*) AS n FROM {table} GROUP BY status"
+ARCHIVED_COUNTS = "SELECT status, SUM(emails) AS n FROM queue_history GROUP BY status"
+SENDS_PER_DAY = """
+SELECT day, SUM(sent) AS sent FROM (
+    SELECT date(last_attempt_at) AS day, COUNT(*) AS sent
+    FROM email_queue
+    WHERE status='sent' AND last_attempt_at >= date('now', '-30 days')
+    GROUP BY day
+    UNION ALL
+    SELECT day, emails FROM queue_history WHERE status='sent' AND day >= date('now', '-30 days')
+) GROUP BY day ORDER BY day
+"""
+LEADS = """
+SELECT leads.id, companies.name as company, contacts.full_name as contact,
+       contacts.email, leads.status, leads.created_at
+FROM leads
+LEFT JOIN companies ON leads.company_id = companies.id
+LEFT JOIN contacts ON leads.contact_id = contacts.id
+"""
+LEADS_ORDER = ("leads.created_at", "leads.id")
+QUEUE_HEAD = """
+SELECT email_queue.id, email_queue.lead_id, email_queue.step, email_queue.status,
+       email_queue.scheduled_at, email_queue.last_attempt_at, email_queue.attempts, email_queue.last_error
+FROM email_queue
+ORDER BY email_queue.scheduled_at ASC
+LIMIT 100
+"""
+COMPANIES = "SELECT id, name, website, city, state, country, source, created_at FROM companies"
+COMPANIES_ORDER = ("created_at", "id")
+CONTACTS = "SELECT id, company_id, full_name, role, email, phone FROM contacts ORDER BY id DESC LIMIT ?"
+
+
+def keyset_page(sql: str, order_cols: Sequence[str], after: bool) -> str:
+    # one page in descending order_cols order; with `after` it starts past the cursor, which takes
+    # one parameter per column before the LIMIT
+    where = f"WHERE ({', '.join(order_cols)}) < ({', '.join('?' * len(order_cols))})" if after else ""
+    order = ", ".join(f"{c} DESC" for c in order_cols)
+    return f"{sql} {where} ORDER BY {order} LIMIT ?"
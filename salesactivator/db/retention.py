@@ -0,0 +1,144 @@
+import os
+import sqlite3
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from salesactivator.db.store import DB
+from salesactivator.utils.metrics import METRICS
+
+ARCHIVE = "archive"  # schema name of the attached archive database
+HISTORY_VIEW = "email_queue_history"  # every archived row, across the monthly tables
+COMPACT_BATCH_SIZE = 5000
+VACUUM_MODES = ("incremental", "full")
+
+# Finished rows are walked in rowid order, so each batch resumes where the last one stopped and
+# a pass reads the queue once. The newest row always stays: without AUTOINCREMENT SQLite would
+# hand its id out again, and the send daemon and the archive both rely on ids only growing.
+CANDIDATES = """
+    SELECT id, lead_id, strftime('%Y_%m', last_attempt_at) AS month FROM email_queue
+    WHERE id > ? AND id < ? AND +status IN ('sent', 'failed', 'skipped') AND +last_attempt_at < ?
+    ORDER BY id LIMIT ?
+"""
+# the rows of one batch again, by its id range
+IN_BATCH = "id > ? AND id <= ? AND +status IN ('sent', 'failed', 'skipped') AND +last_attempt_at < ?"
+RECORD_HISTORY = f"""
+    INSERT INTO queue_history(day, status, emails)
+    SELECT date(last_attempt_at), status, COUNT(*) FROM email_queue WHERE {IN_BATCH} GROUP BY 1, 2
+    ON CONFLICT(day, status) DO UPDATE SET emails = emails + excluded.emails
+"""
+COUNT_ARCHIVED = "UPDATE leads SET archived_emails = archived_emails + ? WHERE id=?"
+DELETE_BATCH = f"DELETE FROM email_queue WHERE {IN_BATCH}"
+# quotas read the last 24 hours of sender_usage; older buckets are only kept a day longer
+PRUNE_USAGE = "DELETE FROM sender_usage WHERE hour < strftime('%Y-%m-%d %H', 'now', '-48 hours')"
+
+
+def _columns(con: sqlite3.Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    return [(r[1], r[2]) for r in con.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _partition(con: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]):
+    # one archive table per month, created on first use; columns added to the queue since are
+    # added here too, so every partition has the queue's current shape
+    existing = {name for name, _ in _columns(con, ARCHIVE, table)}
+    if not existing:
+        decls = ", ".join("id INTEGER PRIMARY KEY" if name == "id" else f"{name} {decl}" for name, decl in columns)
+        con.execute(f"CREATE TABLE {ARCHIVE}.{table} ({decls})")
+        con.execute(f"CREATE INDEX {ARCHIVE}.idx_{table}_lead ON {table}(lead_id)")
+        return
+    for name, decl in columns:
+        if name not in existing:
+            con.execute(f"ALTER TABLE {ARCHIVE}.{table} ADD COLUMN {name} {decl}")
+
+
+def _rebuild_view(con: sqlite3.Connection, columns: List[Tuple[str, str]]):
+    tables = [r[0] for r in con.execute(
+        f"SELECT name FROM {ARCHIVE}.sqlite_master WHERE type='table' AND name GLOB 'email_queue_[0-9]*' ORDER BY name"
+    )]
+    names = ", ".join(name for name, _ in columns)
+    for table in tables:
+        _partition(con, table, columns)
+    con.execute(f"DROP VIEW IF EXISTS {ARCHIVE}.{HISTORY_VIEW}")
+    if tables:
+        con.execute(f"CREATE VIEW {ARCHIVE}.{HISTORY_VIEW} AS " + " UNION ALL ".join(f"SELECT {names} FROM {t}" for t in tables))
+
+
+def _move_finished(db: DB, con: sqlite3.Connection, retention_days: float, batch_size: int) -> Counter:
+    cutoff = con.execute("SELECT datetime('now', ?)", (f"-{retention_days} days",)).fetchone()[0]
+    newest = con.execute("SELECT COALESCE(MAX(id), 0) FROM email_queue").fetchone()[0]
+    columns = _columns(con, "main", "email_queue")
+    names = ", ".join(name for name, _ in columns)
+    by_month: Counter = Counter()
+    last_id = 0
+    while True:
+        rows = db.query(CANDIDATES, (last_id, newest, cutoff, batch_size))
+        if not rows:
+            break
+        batch = (last_id, rows[-1]["id"], cutoff)
+        last_id = rows[-1]["id"]
+        months = Counter(r["month"] for r in rows)
+        # Copied and committed before the rows are deleted: in WAL mode a transaction across
+        # attached databases is only atomic per database, so a crash in between leaves a row in
+        # both, never in neither. Copies are keyed by id, so the next run skips them.
+        with db.transaction():
+            for month in months:
+                table = f"email_queue_{month}"
+                _partition(con, table, columns)
+                con.execute(
+                    f"INSERT OR IGNORE INTO {ARCHIVE}.{table} ({names}) SELECT {names} FROM main.email_queue "
+                    f"WHERE {IN_BATCH} AND strftime('%Y_%m', last_attempt_at) = ?",
+                    (*batch, month),
+                )
+        with db.transaction():
+            con.execute(RECORD_HISTORY, batch)
+            per_lead = Counter(r["lead_id"] for r in rows if r["lead_id"] is not None)
+            con.executemany(COUNT_ARCHIVED, [(n, lead_id) for lead_id, n in per_lead.items()])
+            deleted = con.execute(DELETE_BATCH, batch).rowcount
+        METRICS.inc("queue_archived_total", deleted)
+        by_month.update(months)
+    with db.transaction():
+        _rebuild_view(con, columns)
+    return by_month
+
+
+def _vacuum(con: sqlite3.Connection, mode: str) -> Optional[str]:
+    if mode == "full":
+        # the auto_vacuum switch only takes effect on VACUUM; afterwards --vacuum incremental works
+        con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("VACUUM main")
+    elif con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        con.executescript("PRAGMA incremental_vacuum;")  # frees one page per step; execute() would stop after one
+    else:
+        return "incremental vacuum is off for this database; run --vacuum full once to turn it on"
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # VACUUM writes through the WAL
+    return None
+
+
+def compact_queue(db: DB, archive_path: str, retention_days: float, batch_size: int = COMPACT_BATCH_SIZE,
+                  vacuum: Optional[str] = None) -> Dict[str, Any]:
+    # Moves sent, failed and skipped emails last attempted more than retention_days ago into
+    # monthly tables of the archive database (email_queue_YYYY_MM, all readable through the
+    # email_queue_history view) and counts them in queue_history. Returns a summary.
+    if vacuum is not None and vacuum not in VACUUM_MODES:
+        raise ValueError(f"unknown vacuum mode {vacuum!r}, expected one of {VACUUM_MODES}")
+    os.makedirs(os.path.dirname(archive_path) or ".", exist_ok=True)
+    con = db.connect()
+    con.execute(f"ATTACH DATABASE ? AS {ARCHIVE}", (archive_path,))
+    try:
+        con.execute(f"PRAGMA {ARCHIVE}.journal_mode=WAL")
+        by_month = _move_finished(db, con, retention_days, batch_size)
+    finally:
+        con.execute(f"DETACH DATABASE {ARCHIVE}")
+    with db.transaction():
+        pruned = con.execute(PRUNE_USAGE).rowcount
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    pages = con.execute("PRAGMA page_count").fetchone()[0]
+    note = _vacuum(con, vacuum) if vacuum else None
+    con.execute("PRAGMA optimize")
+    return {
+        "archived": sum(by_month.values()),
+        "by_month": {month.replace("_", "-"): n for month, n in sorted(by_month.items())},
+        "usage_rows_pruned": pruned,
+        "freed_mb": max(0, pages - con.execute("PRAGMA page_count").fetchone()[0]) * page_size / 1e6,
+        "free_mb": con.execute("PRAGMA freelist_count").fetchone()[0] * page_size / 1e6,
+        "vacuum_note": note,
+    }
@@ -1,129 +1,455 @@
 import sqlite3
-from typing import Any, Iterable, Optional, Tuple, Mapping
-try:
-    import pandas as pd  # type: ignore
-except Exception:
-    pd = None  # optional
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Mapping
 import os
 
-SCHEMA_SQL = """
-PRAGMA foreign_keys = ON;
-
-CREATE TABLE IF NOT EXISTS companies (
-    id INTEGER PRIMARY KEY,
-    name TEXT,
-    website TEXT,
-    city TEXT,
-    state TEXT,
-    country TEXT,
-    source TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_website ON companies(website);
-
-CREATE TABLE IF NOT EXISTS contacts (
-    id INTEGER PRIMARY KEY,
-    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
-    full_name TEXT,
-    role TEXT,
-    email TEXT,
-    phone TEXT
-);
-
-CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id);
-CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts(email);
-
-CREATE TABLE IF NOT EXISTS leads (
-    id INTEGER PRIMARY KEY,
-    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
-    contact_id INTEGER REFERENCES contacts(id) ON DELETE SET NULL,
-    status TEXT DEFAULT 'new', -- new, enriched, active, won, lost
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_leads_company ON leads(company_id);
-
-CREATE TABLE IF NOT EXISTS email_queue (
-    id INTEGER PRIMARY KEY,
-    lead_id INTEGER REFERENCES leads(id) ON DELETE CASCADE,
-    step INTEGER,
-    subject TEXT,
-    body TEXT,
-    status TEXT DEFAULT 'scheduled', -- scheduled, sent, failed, skipped
-    scheduled_at TIMESTAMP,
-    last_attempt_at TIMESTAMP
-);
-
-CREATE INDEX IF NOT EXISTS idx_queue_scheduled ON email_queue(status, scheduled_at);
+from salesactivator.db.migrations import migrate
+from salesactivator.utils.domains import canonical_url, domain_key
+from salesactivator.utils.metrics import METRICS, stmt_label
+
+# applied once to every connection; WAL lets the dashboard read while the sender writes
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # ~20 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB
+)
+
+BULK_CHUNK_SIZE = 500
+
+# Statements run by the methods below, here so db-doctor checks the exact SQL that runs.
+# "{marks}" is filled with one "?" per value of an IN list, see _marks().
+COMPANY_BY_KEY = "SELECT MIN(id) AS id FROM companies WHERE domain_key = ?"
+COMPANY_BY_WEBSITE = "SELECT id FROM companies WHERE website = ?"
+DOMAIN_KEYS = "SELECT domain_key FROM companies WHERE domain_key IS NOT NULL"
+CONTACT_BY_EMAIL = "SELECT id FROM contacts WHERE company_id=? AND email=?"
+COMPANIES_BY_WEBSITE = "SELECT website, id FROM companies WHERE website IN ({marks})"
+COMPANIES_BY_KEY = "SELECT domain_key, MIN(id) FROM companies WHERE domain_key IN ({marks}) GROUP BY domain_key"
+CONTACTS_WITHOUT_EMAIL = "SELECT id, company_id, full_name FROM contacts WHERE company_id IN ({marks}) AND email IS NULL"
+CONTACTS_BY_EMAIL = "SELECT id, company_id, email FROM contacts WHERE email IN ({marks})"
+INSERT_CONTACT = "INSERT INTO contacts(company_id, full_name, role, email, phone) VALUES(?,?,?,?,?)"
+INSERT_LEAD = "INSERT INTO leads(company_id, contact_id, status) VALUES(?,?,?)"
+LEADS_BY_COMPANY = "SELECT company_id, MIN(id) FROM leads WHERE company_id IN ({marks}) GROUP BY company_id"
+UPDATE_LEAD = (
+    "UPDATE leads SET contact_id=COALESCE(?, contact_id), "
+    "status=CASE WHEN status IN ('new', 'enriched') THEN COALESCE(?, status) ELSE status END WHERE id=?"
+)
+MARK_ENRICHED = "UPDATE companies SET enriched_at=CURRENT_TIMESTAMP, content_hash=?, fetch_failed_at=NULL WHERE id=?"
+MARK_FETCH_FAILED = "UPDATE companies SET fetch_failed_at=CURRENT_TIMESTAMP WHERE id=?"
+CLAIM_DUE = """
+UPDATE email_queue SET status='sending', claimed_by=?, claimed_until=datetime('now', ?)
+WHERE id IN (
+    -- expired leases first, then due rows in scheduled_at order straight off
+    -- idx_queue_scheduled (an OR of the two would sort every due row)
+    SELECT id FROM (
+        SELECT id FROM email_queue WHERE status='sending' AND claimed_until < CURRENT_TIMESTAMP
+        UNION ALL
+        SELECT id FROM (
+            SELECT id FROM email_queue WHERE status='scheduled' AND scheduled_at <= CURRENT_TIMESTAMP
+            ORDER BY scheduled_at ASC LIMIT ?
+        )
+    ) LIMIT ?
+)
+"""
+CLAIMED_ROWS = """
+SELECT email_queue.id, email_queue.lead_id, email_queue.step, email_queue.subject, email_queue.body,
+       email_queue.template_id, email_queue.params, email_queue.account_id, email_queue.attempts,
+       strftime('%s', 'now') - strftime('%s', email_queue.retrying_since) AS retrying_sec,
+       contacts.email AS to_email, contacts.full_name AS contact
+FROM email_queue
+LEFT JOIN leads ON leads.id = email_queue.lead_id
+LEFT JOIN contacts ON contacts.id = leads.contact_id
+WHERE email_queue.status='sending' AND email_queue.claimed_by=?
+ORDER BY email_queue.scheduled_at ASC
 """
+EXPIRED_LEASES = "SELECT account_id, id FROM email_queue WHERE status='sending' AND claimed_until < CURRENT_TIMESTAMP LIMIT ?"
+CLAIM_CANDIDATES = """
+SELECT email_queue.id, email_queue.lead_id, leads.sender_account FROM email_queue
+LEFT JOIN leads ON leads.id = email_queue.lead_id
+WHERE email_queue.status='scheduled' AND email_queue.scheduled_at <= CURRENT_TIMESTAMP
+  AND (leads.sender_account IS NULL OR leads.sender_account NOT IN ({marks}))
+ORDER BY email_queue.scheduled_at ASC
+"""
+CLAIM_FOR_ACCOUNT = "UPDATE email_queue SET status='sending', claimed_by=?, claimed_until=datetime('now', ?), account_id=? WHERE id=?"
+STICK_ACCOUNT = "UPDATE leads SET sender_account=? WHERE id=?"
+SENDER_USAGE = """
+SELECT account_id, SUM(sent), SUM(CASE WHEN hour = strftime('%Y-%m-%d %H', 'now') THEN sent ELSE 0 END)
+FROM sender_usage WHERE hour > strftime('%Y-%m-%d %H', 'now', '-24 hours') GROUP BY account_id
+"""
+IN_FLIGHT = "SELECT account_id, COUNT(*) FROM email_queue WHERE status='sending' AND account_id IS NOT NULL GROUP BY account_id"
+RECORD_SENDS = (
+    "INSERT INTO sender_usage(hour, account_id, sent) VALUES(strftime('%Y-%m-%d %H', 'now'), ?, ?) "
+    "ON CONFLICT(hour, account_id) DO UPDATE SET sent = sent + excluded.sent"
+)
+FINISH_EMAILS = (
+    "UPDATE email_queue SET status=?, attempts=attempts + ?, last_error=?, last_attempt_at=CURRENT_TIMESTAMP, "
+    "claimed_by=NULL, claimed_until=NULL WHERE id=? AND claimed_by=?"
+)
+RETRY_EMAILS = """
+UPDATE email_queue SET status='scheduled', attempts=attempts + ?, last_error=COALESCE(?, last_error),
+    next_attempt_at=datetime('now', ?), scheduled_at=datetime('now', ?),
+    last_attempt_at=CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE last_attempt_at END,
+    retrying_since=CASE WHEN ? THEN COALESCE(retrying_since, CURRENT_TIMESTAMP) ELSE retrying_since END,
+    claimed_by=NULL, claimed_until=NULL
+WHERE id=? AND claimed_by=?
+"""
+
+
+def _marks(n: int) -> str:
+    return ",".join("?" * n)
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class DB:
-    def __init__(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    def __init__(self, path: str, timeout: float = 30.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._watch: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        # one long-lived connection per thread, in autocommit mode unless inside transaction()
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            for pragma in PRAGMAS:
+                con.execute(pragma)
+            self._local.con = con
+            self._local.depth = 0
+        return con
+
+    def data_version(self) -> int:
+        # Changes whenever another connection commits. The watch connection never writes, so this
+        # also covers writes made through this DB's own per-thread connections.
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            return self._watch.execute("PRAGMA data_version").fetchone()[0]
 
-    def connect(self):
-        return sqlite3.connect(self.path)
+    def close(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
 
-    def init(self):
-        with self.connect() as con:
-            con.executescript(SCHEMA_SQL)
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        # groups every write in the block into a single commit; nested blocks join the outer one
+        con = self.connect()
+        if self._local.depth == 0:
+            con.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield con
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                con.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            try:
+                with METRICS.timer("db_commit_seconds"):
+                    con.execute("COMMIT")
+            except BaseException:
+                # a failed COMMIT (SQLITE_BUSY, deferred constraints) leaves the transaction open
+                # on this thread's connection, and every later BEGIN on it would fail
+                try:
+                    con.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                raise
+
+    def init(self) -> List[Tuple[int, str]]:
+        # applies pending schema migrations and returns them as (version, name)
+        return migrate(self.connect())
 
     def execute(self, sql: str, params: Any = ()):  # for INSERT/UPDATE/DELETE
-        with self.connect() as con:
-            cur = con.execute(sql, params)
-            con.commit()
-            return cur.lastrowid
+        with METRICS.timer("db_seconds", stmt=stmt_label(sql)):
+            cur = self.connect().execute(sql, params)
+        return cur.lastrowid
 
     def query(self, sql: str, params: Any = ()):  # for SELECT
-        with self.connect() as con:
-            cur = con.execute(sql, params)
+        with METRICS.timer("db_seconds", stmt=stmt_label(sql)):
+            cur = self.connect().execute(sql, params)
             rows = cur.fetchall()
-            cols = [d[0] for d in cur.description]
-            return [dict(zip(cols, r)) for r in rows]
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in rows]
 
     def df(self, sql: str, params: Any = ()):  # DataFrame
-        with self.connect() as con:
-            cur = con.execute(sql, params)
-            rows = cur.fetchall()
+        with METRICS.timer("db_seconds", stmt=stmt_label(sql)):
+            cur = self.connect().execute(sql, params)
             cols = [d[0] for d in cur.description]
-            data = [dict(zip(cols, r)) for r in rows]
-            if pd is None:
-                return data  # Streamlit can render list-of-dicts
-            return pd.DataFrame(data)
+            try:
+                import pandas as pd  # type: ignore  # optional; imported here, it costs ~0.5s of CLI startup
+            except Exception:
+                return [dict(zip(cols, r)) for r in cur]  # Streamlit can render list-of-dicts
+            return pd.DataFrame.from_records(cur.fetchall(), columns=cols)
 
     # Convenience methods
     def upsert_company(self, name: str, website: str, city: Optional[str] = None, state: Optional[str] = None, country: Optional[str] = None, source: Optional[str] = None):
-        # normalize website
-        website_n = (website or '').strip().rstrip('/')
-        existing = self.query("SELECT id FROM companies WHERE website = ?", (website_n,))
-        if existing:
+        # one company per registrable domain: www/non-www, http/https and deep links all match
+        website_n = canonical_url(website)
+        key = domain_key(website_n)
+        if key:
+            existing = self.query(COMPANY_BY_KEY, (key,))
+        else:
+            existing = self.query(COMPANY_BY_WEBSITE, (website_n,))
+        if existing and existing[0]['id'] is not None:
             return existing[0]['id']
         return self.execute(
-            "INSERT INTO companies(name, website, city, state, country, source) VALUES(?,?,?,?,?,?)",
-            (name, website_n, city, state, country, source),
+            "INSERT INTO companies(name, website, city, state, country, source, domain_key) VALUES(?,?,?,?,?,?,?)",
+            (name, website_n, city, state, country, source, key or None),
         )
 
+    def domain_keys(self) -> Set[str]:
+        # every known domain key, for in-memory dedupe while scraping (tens of bytes per company)
+        with METRICS.timer("db_seconds", stmt="SELECT domain_key FROM companies"):
+            return {r[0] for r in self.connect().execute(DOMAIN_KEYS)}
+
     def add_contact(self, company_id: int, full_name: str, role: Optional[str] = None, email: Optional[str] = None, phone: Optional[str] = None):
         # avoid duplicate exact email per company
         if email:
-            found = self.query("SELECT id FROM contacts WHERE company_id=? AND email=?", (company_id, email))
+            found = self.query(CONTACT_BY_EMAIL, (company_id, email))
             if found:
                 return found[0]['id']
-        return self.execute(
-            "INSERT INTO contacts(company_id, full_name, role, email, phone) VALUES(?,?,?,?,?)",
-            (company_id, full_name, role, email, phone),
-        )
+        return self.execute(INSERT_CONTACT, (company_id, full_name, role, email, phone))
 
     def add_lead(self, company_id: int, contact_id: Optional[int] = None, status: str = 'new'):
-        return self.execute(
-            "INSERT INTO leads(company_id, contact_id, status) VALUES(?,?,?)",
-            (company_id, contact_id, status),
-        )
+        return self.execute(INSERT_LEAD, (company_id, contact_id, status))
 
     def schedule_email(self, lead_id: int, step: int, subject: str, body: str, scheduled_at: str):
         return self.execute(
             "INSERT INTO email_queue(lead_id, step, subject, body, scheduled_at) VALUES(?,?,?,?,?)",
             (lead_id, step, subject, body, scheduled_at),
         )
+
+    @METRICS.timed("db_op_seconds", op="schedule_emails")
+    def schedule_emails(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE):
+        # rows: lead_id, step, template_id, template_version, params (JSON text), scheduled_at
+        for chunk in _chunks(rows, chunk_size):
+            with self.transaction() as con:
+                con.executemany(
+                    "INSERT INTO email_queue(lead_id, step, template_id, template_version, params, scheduled_at) VALUES(?,?,?,?,?,?)",
+                    [(r["lead_id"], r["step"], r["template_id"], r["template_version"], r["params"], r["scheduled_at"]) for r in chunk],
+                )
+
+    # Send queue: claim() atomically moves due rows (and rows whose lease expired) to 'sending'
+    # under worker_id, so several senders can drain the queue without double sends.
+    # With `budgets` (account id -> emails it may still take, see emailer/accounts.py) each claimed
+    # row is also assigned a sender account: the lead's own if it has one, otherwise the account
+    # with the most budget left, which then sticks to the lead.
+    @METRICS.timed("db_op_seconds", op="claim_due_emails")
+    def claim_due_emails(self, worker_id: str, limit: int = 100, lease_sec: int = 300, budgets: Optional[Mapping[str, int]] = None) -> List[dict]:
+        with self.transaction() as con:
+            if budgets is not None:
+                self._claim_for_accounts(con, worker_id, limit, lease_sec, dict(budgets))
+            else:
+                con.execute(CLAIM_DUE, (worker_id, f"+{int(lease_sec)} seconds", limit, limit))
+            return self.query(CLAIMED_ROWS, (worker_id,))
+
+    def _claim_for_accounts(self, con: sqlite3.Connection, worker_id: str, limit: int, lease_sec: int, budgets: Dict[str, int]):
+        # expired leases keep their account: their claim is still counted as in flight
+        claims = con.execute(EXPIRED_LEASES, (limit,)).fetchall()
+        assigned: Dict[int, str] = {}  # lead -> account, new in this claim
+        if len(claims) < limit and any(n > 0 for n in budgets.values()):
+            # leads stuck on an exhausted account are filtered in SQL, so a large backlog for one
+            # account does not get walked on every claim
+            exhausted = [a for a, n in budgets.items() if n <= 0]
+            cur = con.execute(CLAIM_CANDIDATES.format(marks=_marks(len(exhausted))), exhausted)
+            for qid, lead_id, account in cur:
+                account = assigned.get(lead_id, account)
+                if account not in budgets:  # new lead, or its account left the pool
+                    account = max(budgets, key=budgets.__getitem__)
+                    if budgets[account] <= 0:
+                        break
+                    assigned[lead_id] = account
+                elif budgets[account] <= 0:
+                    continue
+                budgets[account] -= 1
+                claims.append((account, qid))
+                if len(claims) >= limit:
+                    break
+            cur.close()
+        con.executemany(
+            CLAIM_FOR_ACCOUNT,
+            [(worker_id, f"+{int(lease_sec)} seconds", account, qid) for account, qid in claims],
+        )
+        con.executemany(STICK_ACCOUNT, [(account, lead_id) for lead_id, account in assigned.items()])
+
+    def sender_usage(self) -> Dict[str, Tuple[int, int]]:
+        # account -> (sent in the last 24 hours, sent this hour), from the UTC hour buckets
+        rows = self.connect().execute(SENDER_USAGE).fetchall()
+        return {account: (day, hour) for account, day, hour in rows}
+
+    def in_flight_by_account(self) -> Dict[str, int]:
+        return dict(self.connect().execute(IN_FLIGHT).fetchall())
+
+    def record_sends(self, counts: Mapping[str, int]):
+        # counts: account -> emails sent, added to the current UTC hour bucket
+        with self.transaction() as con:
+            con.executemany(
+                RECORD_SENDS,
+                [(account, n) for account, n in counts.items() if n],
+            )
+
+    @METRICS.timed("db_op_seconds", op="finish_emails")
+    def finish_emails(self, worker_id: str, results: Iterable[Tuple[int, str, Optional[str]]]):
+        # results: (queue_id, final status, error); rows whose lease was taken over are left alone.
+        # Skipped rows were never attempted.
+        with self.transaction() as con:
+            con.executemany(
+                FINISH_EMAILS,
+                [(status, int(status != "skipped"), error, qid, worker_id) for qid, status, error in results],
+            )
+
+    @METRICS.timed("db_op_seconds", op="retry_emails")
+    def retry_emails(self, worker_id: str, retries: Iterable[Tuple[int, float, bool, Optional[str]]]):
+        # retries: (queue_id, delay in seconds, attempted, error). The row goes back to 'scheduled'
+        # with scheduled_at moved to the retry time, so the claim and the send daemon pick it up
+        # like any other due row. Rows deferred before an attempt keep their attempt count.
+        with self.transaction() as con:
+            con.executemany(
+                RETRY_EMAILS,
+                [
+                    (int(attempted), error, f"+{int(delay)} seconds", f"+{int(delay)} seconds", int(attempted), int(attempted), qid, worker_id)
+                    for qid, delay, attempted, error in retries
+                ],
+            )
+
+    # Bulk methods: rows are mappings with the same keys as the single-row methods above.
+    # Input is consumed lazily in chunks, one transaction per chunk; ids come back in input order.
+    @METRICS.timed("db_op_seconds", op="upsert_companies")
+    def upsert_companies(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        # deduplicated by domain key like upsert_company; rows without one (no website) by website
+        ids: List[int] = []
+        for chunk in _chunks(rows, chunk_size):
+            params = []
+            for r in chunk:
+                website = canonical_url(r.get("website") or '')
+                params.append((r.get("name"), website, r.get("city"), r.get("state"), r.get("country"), r.get("source"), domain_key(website) or None))
+            keys = list({p[6] for p in params if p[6]})
+            with self.transaction() as con:
+                by_key = self._ids_by_key(con, keys)
+                new_rows, seen = [], set()
+                for p in params:
+                    ident = p[6] or p[1]
+                    if ident not in by_key and ident not in seen:
+                        seen.add(ident)
+                        new_rows.append(p)
+                con.executemany(
+                    "INSERT INTO companies(name, website, city, state, country, source, domain_key) VALUES(?,?,?,?,?,?,?) ON CONFLICT(website) DO NOTHING",
+                    new_rows,
+                )
+                by_key = self._ids_by_key(con, keys)
+                # rows the insert skipped belong to the company that already has their website. That
+                # company can carry another domain key or none at all: keyed under older rules, or
+                # with/without tldextract.
+                missing = {p[6] or p[1]: p[1] for p in new_rows if (p[6] or p[1]) not in by_key}
+                if missing:
+                    sites = list(set(missing.values()))
+                    by_site = dict(con.execute(COMPANIES_BY_WEBSITE.format(marks=_marks(len(sites))), sites).fetchall())
+                    by_key.update((ident, by_site[site]) for ident, site in missing.items())
+            ids.extend(by_key[p[6] or p[1]] for p in params)
+        return ids
+
+    @staticmethod
+    def _ids_by_key(con: sqlite3.Connection, keys: List[str]) -> Dict[str, int]:
+        # oldest company per key; databases from before the key may hold duplicates
+        if not keys:
+            return {}
+        return dict(con.execute(COMPANIES_BY_KEY.format(marks=_marks(len(keys))), keys).fetchall())
+
+    @METRICS.timed("db_op_seconds", op="add_contacts")
+    def add_contacts(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        ids: List[int] = []
+        for chunk in _chunks(rows, chunk_size):
+            params = [(r["company_id"], r.get("full_name"), r.get("role"), r.get("email"), r.get("phone")) for r in chunk]
+            with self.transaction() as con:
+                # rows without email are matched by (company, name); new ones are inserted one by one
+                # so each gets its own rowid back
+                by_name: Dict[Tuple[int, Optional[str]], int] = {}
+                companies = list({p[0] for p in params if not p[3]})
+                if companies:
+                    for cid, company_id, full_name in con.execute(CONTACTS_WITHOUT_EMAIL.format(marks=_marks(len(companies))), companies):
+                        by_name.setdefault((company_id, full_name), cid)
+                no_email = list({(p[0], p[1]): p for p in params if not p[3] and (p[0], p[1]) not in by_name}.values())
+                for p in no_email:
+                    by_name[(p[0], p[1])] = con.execute(INSERT_CONTACT, p).lastrowid
+                with_email = [p for p in params if p[3]]
+                con.executemany(
+                    INSERT_CONTACT + " ON CONFLICT(company_id, email) DO NOTHING",
+                    with_email,
+                )
+                found: Dict[Tuple[int, str], int] = {}
+                emails = list({p[3] for p in with_email})
+                if emails:
+                    for cid, company_id, email in con.execute(CONTACTS_BY_EMAIL.format(marks=_marks(len(emails))), emails):
+                        found[(company_id, email)] = cid
+            ids.extend(found[(p[0], p[3])] if p[3] else by_name[(p[0], p[1])] for p in params)
+        return ids
+
+    @METRICS.timed("db_op_seconds", op="add_leads")
+    def add_leads(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        ids: List[int] = []
+        for chunk in _chunks(rows, chunk_size):
+            params = [(r["company_id"], r.get("contact_id"), r.get("status") or 'new') for r in chunk]
+            with self.transaction() as con:
+                ids.extend(con.execute(INSERT_LEAD, p).lastrowid for p in params)
+        return ids
+
+    @METRICS.timed("db_op_seconds", op="upsert_leads")
+    def upsert_leads(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> List[int]:
+        # one lead per company: an existing lead gets the new contact and status (if any) but keeps a
+        # status that has moved past 'enriched'; companies without a lead get a new one
+        ids: List[int] = []
+        for chunk in _chunks(rows, chunk_size):
+            company_ids = list({r["company_id"] for r in chunk})
+            with self.transaction() as con:
+                existing = dict(con.execute(LEADS_BY_COMPANY.format(marks=_marks(len(company_ids))), company_ids).fetchall())
+                con.executemany(
+                    UPDATE_LEAD,
+                    [(r.get("contact_id"), r.get("status") or None, existing[r["company_id"]]) for r in chunk if r["company_id"] in existing],
+                )
+                new_rows = {}
+                for r in chunk:
+                    if r["company_id"] not in existing:
+                        new_rows.setdefault(r["company_id"], r)
+                created = self.add_leads(new_rows.values())
+                existing.update(zip(new_rows, created))
+            ids.extend(existing[r["company_id"]] for r in chunk)
+        return ids
+
+    @METRICS.timed("db_op_seconds", op="mark_enriched")
+    def mark_enriched(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = BULK_CHUNK_SIZE):
+        # rows: {"company_id", "content_hash", "pages": {url: page hash}}
+        for chunk in _chunks(rows, chunk_size):
+            with self.transaction() as con:
+                con.executemany(
+                    MARK_ENRICHED,
+                    [(r.get("content_hash"), r["company_id"]) for r in chunk],
+                )
+                con.executemany(
+                    "INSERT INTO company_pages(company_id, url, content_hash) VALUES(?,?,?) "
+                    "ON CONFLICT(company_id, url) DO UPDATE SET content_hash=excluded.content_hash, fetched_at=CURRENT_TIMESTAMP",
+                    [(r["company_id"], url, h) for r in chunk for url, h in (r.get("pages") or {}).items()],
+                )
+
+    def mark_fetch_failed(self, company_ids: Iterable[int]):
+        # enriched_at stays as it was, so the company is picked up again once ENRICH_RETRY_HOURS pass
+        with self.transaction() as con:
+            con.executemany(MARK_FETCH_FAILED, [(i,) for i in company_ids])
@@ -0,0 +1,227 @@
+import csv
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from salesactivator.db.store import DB, _chunks
+from salesactivator.utils.metrics import METRICS
+
+FORMATS = ("csv", "ndjson", "parquet")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".parquet": "parquet", ".pq": "parquet"}
+TRANSFER_CHUNK_SIZE = 5000
+
+# Export queries page through one table by rowid (keyset), so memory stays at one chunk
+# whatever the table size. Columns named here are written in this order.
+EXPORTS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "companies": (
+        """SELECT id, name, website, city, state, country, source, domain_key, enriched_at, created_at
+        FROM companies WHERE id > ? ORDER BY id LIMIT ?""",
+        ("id", "name", "website", "city", "state", "country", "source", "domain_key", "enriched_at", "created_at"),
+    ),
+    "contacts": (
+        """SELECT contacts.id, contacts.company_id, companies.website, contacts.full_name, contacts.role, contacts.email, contacts.phone
+        FROM contacts LEFT JOIN companies ON companies.id = contacts.company_id
+        WHERE contacts.id > ? ORDER BY contacts.id LIMIT ?""",
+        ("id", "company_id", "website", "full_name", "role", "email", "phone"),
+    ),
+    # one flat row per lead, the same shape `import leads` reads
+    "leads": (
+        """SELECT leads.id, leads.status, leads.created_at, companies.name, companies.website, companies.city, companies.state,
+               companies.country, companies.source, contacts.full_name, contacts.role, contacts.email, contacts.phone
+        FROM leads
+        LEFT JOIN companies ON companies.id = leads.company_id
+        LEFT JOIN contacts ON contacts.id = leads.contact_id
+        WHERE leads.id > ? ORDER BY leads.id LIMIT ?""",
+        ("id", "status", "created_at", "name", "website", "city", "state", "country", "source", "full_name", "role", "email", "phone"),
+    ),
+    "queue": (
+        """SELECT id, lead_id, step, template_id, template_version, params, subject, body, status, scheduled_at, last_attempt_at, account_id,
+               attempts, next_attempt_at, last_error
+        FROM email_queue WHERE id > ? ORDER BY id LIMIT ?""",
+        ("id", "lead_id", "step", "template_id", "template_version", "params", "subject", "body", "status", "scheduled_at", "last_attempt_at", "account_id",
+         "attempts", "next_attempt_at", "last_error"),
+    ),
+}
+IMPORTS = ("companies", "contacts", "leads")
+INT_COLUMNS = {"id", "company_id", "lead_id", "step", "template_version", "attempts"}
+COMPANY_FIELDS = ("name", "website", "city", "state", "country", "source")
+CONTACT_FIELDS = ("full_name", "role", "email", "phone")
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    found = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if not found:
+        raise ValueError(f"cannot tell the format of {path!r}; pass --format ({', '.join(FORMATS)})")
+    return found
+
+
+def _pyarrow():
+    # optional, Parquet only; imported on first use since it is slow to load
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+    except Exception:
+        raise RuntimeError("Parquet needs pyarrow: pip install pyarrow")
+    return pa, pq
+
+
+# Reading: every format yields plain dicts one at a time.
+
+def read_rows(path: str, fmt: str, chunk_size: int = TRANSFER_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    if fmt == "parquet":
+        _, pq = _pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield from batch.to_pylist()
+        return
+    f = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def map_columns(rows: Iterable[Mapping[str, Any]], mapping: Mapping[str, str]) -> Iterator[Dict[str, Any]]:
+    # rename source columns (mapping: source -> target; unmapped columns keep their name), strip
+    # strings and treat empty cells as missing so CSV and NDJSON load the same
+    for row in rows:
+        out: Dict[str, Any] = {}
+        for k, v in row.items():
+            if isinstance(v, str):
+                v = v.strip() or None
+            out[mapping.get(k, k)] = v
+        yield out
+
+
+# Writing: writers take chunks of dicts with the export's columns.
+
+class _CsvWriter:
+    def __init__(self, f, columns: Sequence[str]):
+        self.w = csv.writer(f)
+        self.w.writerow(columns)
+        self.columns = columns
+
+    def write(self, chunk: List[Dict[str, Any]]):
+        self.w.writerows([["" if r[c] is None else r[c] for c in self.columns] for r in chunk])
+
+
+class _NdjsonWriter:
+    def __init__(self, f, columns: Sequence[str]):
+        self.f = f
+
+    def write(self, chunk: List[Dict[str, Any]]):
+        self.f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in chunk))
+
+
+class _ParquetWriter:
+    # one row group per chunk; the schema is fixed up front so an all-NULL first chunk is fine
+    def __init__(self, path: str, columns: Sequence[str]):
+        pa, pq = _pyarrow()
+        self.pa = pa
+        self.schema = pa.schema([(c, pa.int64() if c in INT_COLUMNS else pa.string()) for c in columns])
+        self.w = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, chunk: List[Dict[str, Any]]):
+        self.w.write_table(self.pa.Table.from_pylist(chunk, schema=self.schema))
+
+    def close(self):
+        self.w.close()
+
+
+def _close(writer, f):
+    if isinstance(writer, _ParquetWriter):
+        writer.close()
+    elif f is not None and f is not sys.stdout:
+        f.close()
+    else:
+        sys.stdout.flush()
+
+
+def export_rows(db: DB, what: str, path: str, fmt: str, chunk_size: int = TRANSFER_CHUNK_SIZE) -> int:
+    sql, columns = EXPORTS[what]
+    if fmt == "parquet" and path == "-":
+        raise ValueError("Parquet cannot be written to stdout")
+    if path != "-":
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # written to a temp file and renamed, so a failed export never leaves a truncated file behind
+    tmp = path if path == "-" else path + ".tmp"
+    f = None
+    if fmt == "parquet":
+        writer: Any = _ParquetWriter(tmp, columns)
+    else:
+        f = sys.stdout if path == "-" else open(tmp, "w", newline="", encoding="utf-8")
+        writer = (_CsvWriter if fmt == "csv" else _NdjsonWriter)(f, columns)
+    total, last_id = 0, 0
+    try:
+        while True:
+            chunk = db.query(sql, (last_id, chunk_size))
+            if not chunk:
+                break
+            writer.write(chunk)
+            METRICS.inc("export_rows_total", len(chunk), table=what)
+            total += len(chunk)
+            last_id = chunk[-1]["id"]
+    except BaseException:
+        if tmp != path:
+            _close(writer, f)
+            os.remove(tmp)
+        raise
+    _close(writer, f)
+    if tmp != path:
+        os.replace(tmp, path)
+    return total
+
+
+def _company_rows(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: r.get(k) for k in COMPANY_FIELDS} for r in chunk]
+
+
+def import_rows(db: DB, what: str, rows: Iterable[Dict[str, Any]], chunk_size: int = TRANSFER_CHUNK_SIZE) -> Tuple[int, int]:
+    # companies: upserted by domain key. contacts: their company (by website) is upserted first.
+    # leads: as contacts, plus one lead per company (upsert_leads). One transaction per chunk.
+    # Rows without a website are skipped: they would all collapse into one company.
+    # Returns (rows loaded, rows skipped).
+    if what not in IMPORTS:
+        raise ValueError(f"cannot import {what!r}, expected one of {IMPORTS}")
+    loaded = skipped = 0
+    for chunk in _chunks(rows, chunk_size):
+        valid = [r for r in chunk if r.get("website")]
+        skipped += len(chunk) - len(valid)
+        if not valid:
+            continue
+        with db.transaction():
+            company_ids = db.upsert_companies(_company_rows(valid), chunk_size=chunk_size)
+            if what != "companies":
+                with_contact = [(cid, r) for cid, r in zip(company_ids, valid) if r.get("email") or r.get("full_name")]
+                contact_ids = db.add_contacts(
+                    ({"company_id": cid, **{k: r.get(k) for k in CONTACT_FIELDS}} for cid, r in with_contact), chunk_size=chunk_size,
+                )
+                if what == "leads":
+                    by_row = {id(r): contact_id for (_, r), contact_id in zip(with_contact, contact_ids)}
+                    db.upsert_leads(
+                        # a row without a status leaves an existing lead's status alone
+                        ({"company_id": cid, "contact_id": by_row.get(id(r)), "status": r.get("status") or None} for cid, r in zip(company_ids, valid)),
+                        chunk_size=chunk_size,
+                    )
+        METRICS.inc("import_rows_total", len(valid), table=what)
+        loaded += len(valid)
+    return loaded, skipped
+
+
+def parse_mapping(items: Iterable[str]) -> Dict[str, str]:
+    # ["Company Name=name", "E-mail=email"] -> {"Company Name": "name", "E-mail": "email"}
+    mapping = {}
+    for item in items:
+        source, sep, target = item.rpartition("=")
+        if not sep or not source or not target:
+            raise ValueError(f"bad column mapping {item!r}, expected SOURCE=TARGET")
+        mapping[source] = target.strip()
+    return mapping
@@ -0,0 +1,114 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from salesactivator.db.store import DB
+from salesactivator.utils.config import Settings, parse_flag
+
+DEFAULT_ACCOUNT = "default"
+UNLIMITED = 1 << 30
+
+
+@dataclass
+class SenderAccount:
+    # One SMTP identity. Quotas of 0 mean unlimited. Warm-up: from warmup_start the daily cap
+    # follows warmup_schedule (one cap per day) or, without one, grows geometrically from
+    # warmup_initial to daily_quota over warmup_days.
+    id: str
+    username: str = ""
+    password: str = field(default="", repr=False)
+    from_email: str = ""
+    from_name: str = ""
+    host: str = "smtp.gmail.com"
+    port: int = 587
+    starttls: bool = True
+    daily_quota: int = 0
+    hourly_quota: int = 0
+    warmup_start: Optional[date] = None
+    warmup_days: int = 0
+    warmup_initial: int = 20
+    warmup_schedule: Tuple[int, ...] = ()
+
+    def daily_cap(self, today: date) -> int:
+        cap = self.daily_quota or UNLIMITED
+        if self.warmup_start is None:
+            return cap
+        day = (today - self.warmup_start).days
+        if day < 0:
+            return 0  # not started yet
+        if self.warmup_schedule:
+            if day < len(self.warmup_schedule):
+                return min(cap, self.warmup_schedule[day])
+        elif self.daily_quota and day < self.warmup_days:
+            start = min(self.warmup_initial, self.daily_quota)
+            return min(cap, round(start * (self.daily_quota / start) ** (day / self.warmup_days)))
+        return cap
+
+    def budget(self, today: date, sent_24h: int, sent_hour: int, in_flight: int) -> int:
+        # emails this account may still take on now; in-flight claims count as sent
+        daily = self.daily_cap(today) - sent_24h - in_flight
+        hourly = (self.hourly_quota or UNLIMITED) - sent_hour - in_flight
+        return max(0, min(daily, hourly))
+
+
+def _account(raw: Mapping[str, Any], s: Settings) -> SenderAccount:
+    username = raw.get("username") or ""
+    # keep passwords out of the accounts file: "password_env" names the variable holding it
+    password = os.getenv(raw["password_env"], "") if raw.get("password_env") else raw.get("password") or ""
+    start = raw.get("warmup_start")
+    return SenderAccount(
+        id=str(raw.get("id") or username),
+        username=username,
+        password=password,
+        from_email=raw.get("from_email") or username or s.FROM_EMAIL,
+        from_name=raw.get("from_name") or s.FROM_NAME,
+        host=raw.get("host") or s.SMTP_HOST,
+        port=int(raw.get("port") or s.SMTP_PORT),
+        starttls=parse_flag(raw.get("starttls"), s.SMTP_STARTTLS),
+        daily_quota=int(raw.get("daily_quota", s.SMTP_DAILY_QUOTA)),
+        hourly_quota=int(raw.get("hourly_quota", s.SMTP_HOURLY_QUOTA)),
+        warmup_start=date.fromisoformat(start) if start else None,
+        warmup_days=int(raw.get("warmup_days", 0)),
+        warmup_initial=max(1, int(raw.get("warmup_initial", 20))),
+        warmup_schedule=tuple(int(n) for n in raw.get("warmup_schedule", ())),
+    )
+
+
+def load_accounts(s: Settings) -> List[SenderAccount]:
+    # SMTP_ACCOUNTS holds a JSON list of accounts, or the path of a file with one; without it the
+    # single SMTP_USERNAME account is used
+    spec = s.SMTP_ACCOUNTS.strip()
+    if not spec:
+        return [SenderAccount(
+            id=DEFAULT_ACCOUNT, username=s.SMTP_USERNAME, password=s.SMTP_APP_PASSWORD, from_email=s.FROM_EMAIL,
+            from_name=s.FROM_NAME, host=s.SMTP_HOST, port=s.SMTP_PORT, starttls=s.SMTP_STARTTLS,
+            daily_quota=s.SMTP_DAILY_QUOTA, hourly_quota=s.SMTP_HOURLY_QUOTA,
+        )]
+    if not spec.startswith("["):
+        with open(spec, encoding="utf-8") as f:
+            spec = f.read()
+    accounts = [_account(raw, s) for raw in json.loads(spec)]
+    ids = [a.id for a in accounts]
+    if not accounts or "" in ids or len(set(ids)) != len(ids):
+        raise ValueError("SMTP_ACCOUNTS needs at least one account and a unique id (or username) for each")
+    return accounts
+
+
+def account_budgets(db: DB, accounts: List[SenderAccount], now: Optional[datetime] = None) -> Dict[str, int]:
+    # call inside db.transaction() together with the claim, so concurrent senders see each
+    # other's claims
+    today = (now or datetime.now(timezone.utc)).date()  # usage hours are UTC too
+    usage = db.sender_usage()
+    in_flight = db.in_flight_by_account()
+    return {
+        a.id: a.budget(today, *usage.get(a.id, (0, 0)), in_flight.get(a.id, 0))
+        for a in accounts
+    }
+
+
+def next_quota_reset(now: float) -> float:
+    # usage is counted in hourly buckets, so quotas only free up on the hour
+    return (int(now) // 3600 + 1) * 3600
+
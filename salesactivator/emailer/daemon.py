@@ -0,0 +1,202 @@
+import calendar
+import heapq
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from salesactivator.db import queries
+from salesactivator.db.store import DB, _marks
+from salesactivator.emailer.accounts import next_quota_reset
+from salesactivator.emailer.sender import EmailSender
+from salesactivator.utils.metrics import METRICS
+from salesactivator.utils.ratelimit import HostBucket
+
+# scheduled_at is compared with SQLite's CURRENT_TIMESTAMP, i.e. UTC "YYYY-MM-DD HH:MM:SS"
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _to_epoch(ts: Optional[str]) -> float:
+    try:
+        return calendar.timegm(datetime.fromisoformat(ts).timetuple())
+    except (TypeError, ValueError):
+        return 0.0  # unparseable: treat as due now, claim_due_emails decides
+
+
+def _to_ts(epoch: float) -> str:
+    return time.strftime(TS_FORMAT, time.gmtime(epoch))
+
+
+class SendDaemon:
+    # Keeps a min-heap of (due time, queue id) for rows due within `horizon` seconds and sleeps
+    # until the earliest one. The heap is refreshed every `poll` seconds with three cheap indexed
+    # queries: rows inserted since the last refresh, rows entering the horizon, and expired leases.
+    # Heap entries are only wake-up hints: send_due() claims whatever is actually due, so a row
+    # another sender already took just costs an empty claim. SMTP sessions stay open between
+    # batches and are closed after `smtp_idle` seconds without a message, or on shutdown. A step that
+    # raises (database locked by compact or import, a network error) is logged and retried after
+    # `poll` seconds; only SIGTERM/SIGINT end the loop.
+    def __init__(self, db: DB, sender: EmailSender, batch: int = 50, workers: Optional[int] = None, rate_per_min: float = 0.0,
+                 poll: float = 5.0, horizon: float = 3600.0, status_path: Optional[str] = None, dry_run: bool = False,
+                 smtp_idle: float = 60.0):
+        self.db = db
+        self.sender = sender
+        self.batch = max(1, batch)
+        self.workers = workers
+        self.poll = poll
+        self.horizon = horizon
+        self.status_path = status_path
+        self.dry_run = dry_run
+        self.smtp_idle = smtp_idle
+        # spreads sends at rate_per_min, allowing one batch as a burst
+        self.bucket = HostBucket(60.0 / rate_per_min if rate_per_min > 0 else 0.0, capacity=self.batch)
+        self.stop = threading.Event()
+        self._heap: List[Tuple[float, int]] = []
+        self._queued: Set[int] = set()
+        self._max_id = 0
+        self._loaded_until: Optional[float] = None
+        self._refreshed = 0.0
+        self._status_written = 0.0
+        self.started = time.time()
+        self.sent = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def install_signal_handlers(self):
+        # the batch in flight finishes and its results are written before run() returns
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop.set())
+
+    def _push(self, rows: List[Dict[str, Any]], key: str = "scheduled_at"):
+        for r in rows:
+            if r["id"] not in self._queued:
+                self._queued.add(r["id"])
+                heapq.heappush(self._heap, (_to_epoch(r[key]), r["id"]))
+
+    def refresh(self, now: float):
+        until = now + self.horizon
+        # read the high-water mark first so a row inserted mid-refresh is picked up next time
+        max_id = self.db.query(queries.DAEMON_MAX_ID)[0]["n"]
+        if self._loaded_until is None:
+            rows = self.db.query(queries.DAEMON_FIRST_LOAD, (_to_ts(until),))
+        else:
+            rows = self.db.query(queries.DAEMON_NEW_ROWS, (self._max_id, max_id, _to_ts(self._loaded_until)))
+            rows += self.db.query(queries.DAEMON_WINDOW, (_to_ts(self._loaded_until), _to_ts(until)))
+        self._max_id = max_id
+        self._loaded_until = until
+        self._push(rows)
+        # leases of senders that died mid-batch (or of a batch of ours that raised) become claimable
+        # when they expire; outside send_due() this sender holds no leases of its own
+        self._push(self.db.query(queries.DAEMON_LEASES), key="claimed_until")
+        self._refreshed = now
+
+    def _pop_due(self, now: float) -> List[int]:
+        ids: List[int] = []
+        while self._heap and self._heap[0][0] <= now and len(ids) < self.batch:
+            _, qid = heapq.heappop(self._heap)
+            self._queued.discard(qid)
+            ids.append(qid)
+        return ids
+
+    def _rearm(self, ids: List[int], now: float):
+        # due rows the claim left behind: another batch's worth was due first (retry now), or every
+        # account they could use is out of quota (retry when the hour bucket rolls over)
+        if not ids:
+            return
+        retry_at = now if self.sender.last_claimed >= self.batch else next_quota_reset(now)
+        rows = self.db.query(queries.DAEMON_REARM.format(marks=_marks(len(ids))), ids)
+        for r in rows:
+            r["retry_at"] = _to_ts(max(retry_at, _to_epoch(r["scheduled_at"])))
+        self._push(rows, key="retry_at")
+
+    def status(self, now: float) -> Dict[str, Any]:
+        depth = self.db.query(queries.DAEMON_DEPTH)[0]["n"]
+        head = self._heap[0][0] if self._heap else None
+        return {
+            "pid": os.getpid(),
+            "worker_id": self.sender.worker_id,
+            "started_at": _to_ts(self.started),
+            "updated_at": _to_ts(now),
+            "queue_depth": depth,
+            "in_horizon": len(self._heap),
+            "lag_sec": round(max(0.0, now - head), 3) if head is not None else 0.0,
+            "next_due_in_sec": round(max(0.0, head - now), 3) if head is not None else None,
+            "sent": self.sent,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "account_budgets": self.sender.last_budgets,
+            "send_rate_per_min": self.sender.pacing(),
+            "stopping": self.stop.is_set(),
+        }
+
+    def write_status(self, now: float, force: bool = False):
+        # at most once a second while busy; the depth COUNT is not free on a large queue
+        if not self.status_path or (not force and now - self._status_written < 1.0):
+            return
+        self._status_written = now
+        os.makedirs(os.path.dirname(self.status_path) or ".", exist_ok=True)
+        tmp = self.status_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.status(now), f, indent=2)
+        os.replace(tmp, self.status_path)
+
+    def run_once(self) -> float:
+        # one scheduler step; returns how long to sleep before the next one
+        now = time.time()
+        if now - self._refreshed >= self.poll:
+            self.refresh(now)
+        due = self._pop_due(now)
+        if due:
+            sent = self.sender.send_due(self.db, dry_run=self.dry_run, workers=self.workers, limit=self.batch, keep_sessions=True)
+            self.sent += sent
+            self.batches += 1
+            # retries usually land inside the window already loaded, where refresh() would not see them
+            self._push([{"id": qid, "retry_at": _to_ts(now + delay)} for qid, delay in self.sender.last_retries], key="retry_at")
+            self._rearm(due, now)
+            # pay for the batch after sending it; the debt is the pause before the next one
+            wait = 0.0
+            for _ in range(sent):
+                wait = self.bucket.reserve()
+            self.write_status(time.time())
+            return wait
+        self.write_status(now)
+        wait = self._refreshed + self.poll - now
+        if self._heap:
+            wait = min(self._heap[0][0] - now, wait)
+        # wake up to QUIT sessions that went idle rather than leave them to the server's timeout
+        idle = self.sender.close_idle(self.smtp_idle)
+        if idle is not None:
+            wait = min(idle, wait)
+        return max(0.0, wait)
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                try:
+                    wait = self.run_once()
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = f"{_to_ts(time.time())} {type(e).__name__}: {e}"[:300]
+                    METRICS.inc("daemon_errors_total")
+                    print(f"Send daemon error: {type(e).__name__}: {e}", file=sys.stderr)
+                    # rows popped for the failed step are no longer in the heap: reload the window
+                    self._loaded_until = None
+                    self._refreshed = 0.0
+                    self._write_status_safely()
+                    wait = self.poll
+                self.stop.wait(wait)
+        finally:
+            self.sender.close()
+            self._write_status_safely()
+
+    def _write_status_safely(self):
+        try:
+            self.write_status(time.time(), force=True)
+        except Exception as e:  # the status file must not take the daemon down with it
+            print(f"Send daemon status not written: {type(e).__name__}: {e}", file=sys.stderr)
@@ -1,63 +1,345 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.utils import formataddr
-from datetime import datetime
-from typing import Optional
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
 from salesactivator.utils.config import Settings
 from salesactivator.db.store import DB
-from salesactivator.emailer.templates import render_subject, render_body
+from salesactivator.emailer.accounts import SenderAccount, account_budgets, load_accounts
+from salesactivator.emailer.templates import TEMPLATES, schedule_dates, template_for_step
+from salesactivator.utils.metrics import METRICS
+from salesactivator.utils.ratelimit import AimdBucket
+
+# smtplib and email.mime (with ssl under them) are imported where a message is actually sent, so
+# `send --dry-run` and the dashboard do not load them; benchmarks/startup.py checks this
+if TYPE_CHECKING:
+    import smtplib
+
+# a session unused for longer than this is checked with NOOP before the next message
+NOOP_AFTER_IDLE_SEC = 5.0
+# Enhanced status codes (RFC 3463) that mean the sender went too fast or sent too much: Gmail's
+# 4.7.28/5.7.28 rate limits, 5.4.5 daily sending quota, 4.2.1 recipient receiving too fast
+RATE_STATUS = {"4.7.28", "5.7.28", "5.4.5", "4.2.1"}
+ENHANCED_STATUS = re.compile(r"\s*([245]\.\d{1,3}\.\d{1,3})\b")
+# 4xx replies without a rate status code that still ask us to slow down
+THROTTLE_REPLY = re.compile(r"\b(?:rate limit(?:ed|ing)?|too many|try again later|quota exceeded|throttl(?:ed|ing))\b", re.I)
+
+
+def classify_error(e: BaseException) -> Tuple[bool, bool, str]:
+    # (transient, throttled, error text) of a failed send. 4xx replies (or 4.x.x status codes) and
+    # dropped connections are worth retrying, other 5xx replies are final unless their status code
+    # is a rate limit. Reply text is only trusted on 4xx: 5xx texts like "corporate policy" or
+    # "size limit exceeded" are permanent whatever words they contain.
+    import smtplib
+
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        code, reply = next(iter(e.recipients.values()), (550, b""))
+    elif isinstance(e, smtplib.SMTPResponseException):
+        code, reply = e.smtp_code, e.smtp_error
+    elif isinstance(e, OSError):  # smtplib's other errors, timeouts, refused connections
+        return True, False, f"{type(e).__name__}: {e}"[:200]
+    else:
+        return False, False, f"{type(e).__name__}: {e}"[:200]
+    if isinstance(reply, bytes):
+        reply = reply.decode("utf-8", "replace")
+    m = ENHANCED_STATUS.match(reply)
+    status = m.group(1) if m else ""
+    transient = 400 <= code < 500 or status.startswith("4.")
+    throttled = code == 421 or status in RATE_STATUS or (transient and bool(THROTTLE_REPLY.search(reply)))
+    return transient or throttled, throttled, f"{code} {reply}"[:200]
+
+
+def retry_delay(attempts: int, base: float, cap: float) -> float:
+    # exponential backoff with jitter: somewhere in the upper half of base * 2^attempts, so rows
+    # that failed together do not all come back at once
+    delay = min(cap, base * 2 ** attempts)
+    return random.uniform(delay / 2, delay)
+
+
+class SmtpSession:
+    # one authenticated SMTP connection, reused across messages and reopened when dropped
+    def __init__(self, settings: Settings, account: SenderAccount):
+        self.s = settings
+        self.account = account
+        self.server: Optional["smtplib.SMTP"] = None
+        self.sent_on_connection = 0
+        self.last_used = time.monotonic()
+
+    @METRICS.timed("smtp_connect_seconds")
+    def _connect(self):
+        # connection, STARTTLS and AUTH: the handshake every reused session saves
+        import smtplib
+
+        a = self.account
+        server = smtplib.SMTP(a.host, a.port, timeout=self.s.SMTP_TIMEOUT_SEC)
+        try:
+            if a.starttls:
+                server.starttls()
+            if a.username:
+                server.login(a.username, a.password)
+        except BaseException:
+            server.close()  # a failed handshake must not leave the socket open
+            raise
+        self.server = server
+        self.sent_on_connection = 0
+
+    def _alive(self) -> bool:
+        # servers drop idle connections; a NOOP finds out before a message is at stake
+        import smtplib
+
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, from_addr: str, to_addrs: List[str], msg: str):
+        import smtplib
+
+        if self.server is not None and (
+            self.sent_on_connection >= self.s.SMTP_MESSAGES_PER_SESSION
+            or (time.monotonic() - self.last_used > NOOP_AFTER_IDLE_SEC and not self._alive())
+        ):
+            self.close()
+        for attempt in range(2):
+            try:
+                if self.server is None:
+                    self._connect()
+                with METRICS.timer("smtp_send_seconds"):
+                    self.server.sendmail(from_addr, to_addrs, msg)
+                self.sent_on_connection += 1
+                self.last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError):
+                # the connection is unusable but a fresh session may succeed
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        server, self.server = self.server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
 
 
 class EmailSender:
     def __init__(self, settings: Settings):
         self.s = settings
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{os.urandom(4).hex()}"
+        self.accounts = load_accounts(settings)
+        self._accounts = {a.id: a for a in self.accounts}
+        # one unlimited account needs no bookkeeping: the plain claim is enough
+        a = self.accounts[0]
+        self.sharded = len(self.accounts) > 1 or bool(a.daily_quota or a.hourly_quota or a.warmup_start)
+        self.last_claimed = 0
+        self.last_budgets: Optional[Dict[str, int]] = None
+        self.last_retries: List[Tuple[int, float]] = []  # (queue id, seconds until due) rescheduled by the last send_due
+        # per-account send rate, slowed down whenever that account's server pushes back
+        self.pacers = {a.id: AimdBucket(settings.SEND_AIMD_RECOVERY_SEC, settings.SEND_AIMD_MIN_PER_MIN) for a in self.accounts}
+        # accounts whose login was rejected: account id -> (monotonic time to try again, error)
+        self._paused: Dict[str, Tuple[float, str]] = {}
+        self._auth_failures: Dict[str, int] = {}
+        # Sessions not in use, per account. A sender takes one for each message and puts it back,
+        # so pool workers never share a connection and connections outlive the batch's threads.
+        self._idle: Dict[str, List[SmtpSession]] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _acquire(self, account: SenderAccount) -> SmtpSession:
+        with self._sessions_lock:
+            idle = self._idle.get(account.id)
+            if idle:
+                return idle.pop()  # the most recently used one, the likeliest to still be open
+        return SmtpSession(self.s, account)
+
+    def _release(self, session: SmtpSession):
+        if session.server is None:
+            return
+        with self._sessions_lock:
+            self._idle.setdefault(session.account.id, []).append(session)
 
-    def _send(self, to_email: str, subject: str, body: str) -> bool:
+    def close(self):
+        with self._sessions_lock:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle = {}
+        for session in sessions:
+            session.close()
+
+    def close_idle(self, max_idle: float) -> Optional[float]:
+        # QUITs the sessions unused for max_idle seconds; returns the seconds until the next one
+        # is due to go, None when no session is open
+        now = time.monotonic()
+        stale: List[SmtpSession] = []
+        with self._sessions_lock:
+            for account_id, idle in self._idle.items():
+                stale += [session for session in idle if now - session.last_used >= max_idle]
+                self._idle[account_id] = [session for session in idle if now - session.last_used < max_idle]
+            left = [session.last_used + max_idle - now for idle in self._idle.values() for session in idle]
+        for session in stale:
+            session.close()
+        return min(left) if left else None
+
+    def _send(self, to_email: str, subject: str, body: str, account: Optional[SenderAccount] = None):
+        # raises the SMTP error when the message was not accepted
+        from email.mime.text import MIMEText
+        from email.utils import formataddr
+
+        account = account or self.accounts[0]
         msg = MIMEText(body, "plain", "utf-8")
         msg["Subject"] = subject
-        msg["From"] = formataddr((self.s.FROM_NAME, self.s.FROM_EMAIL))
+        msg["From"] = formataddr((account.from_name, account.from_email))
         msg["To"] = to_email
+        session = self._acquire(account)
         try:
-            with smtplib.SMTP(self.s.SMTP_HOST, self.s.SMTP_PORT) as server:
-                server.starttls()
-                server.login(self.s.SMTP_USERNAME, self.s.SMTP_APP_PASSWORD)
-                server.sendmail(self.s.FROM_EMAIL, [to_email], msg.as_string())
-            return True
-        except Exception:
-            return False
+            session.send(account.from_email, [to_email], msg.as_string())
+        finally:
+            self._release(session)
+
+    def _pause_account(self, account: SenderAccount, e: "smtplib.SMTPAuthenticationError") -> Tuple[float, str]:
+        # A rejected login is the account's problem, not the message's: its rows wait uncharged
+        # and no further LOGIN is tried until the pause ends. Pauses grow while the login keeps failing.
+        with self._sessions_lock:
+            now = time.monotonic()
+            paused = self._paused.get(account.id)
+            if paused is None or paused[0] <= now:
+                failures = self._auth_failures.get(account.id, 0)
+                self._auth_failures[account.id] = failures + 1
+                error = classify_error(e)[2]
+                paused = self._paused[account.id] = (now + retry_delay(failures, self.s.SEND_RETRY_BASE_SEC, self.s.SEND_RETRY_MAX_SEC), error)
+                METRICS.inc("smtp_auth_failed_total", account=account.id)
+        return max(0.0, paused[0] - now), paused[1]
+
+    def pacing(self) -> Dict[str, Optional[float]]:
+        # current send rate per account in emails per minute; None until its server first throttled
+        return {account_id: pacer.per_min for account_id, pacer in self.pacers.items()}
+
+    def send_due(self, db: DB, dry_run: bool = False, workers: Optional[int] = None, limit: int = 100,
+                 keep_sessions: bool = False) -> int:
+        # keep_sessions: leave the SMTP sessions open for the next call (close() or close_idle() them)
+        with db.transaction():
+            # budgets and claim in one write transaction: other senders wait, then see these claims
+            self.last_budgets = account_budgets(db, self.accounts) if self.sharded else None
+            rows = db.claim_due_emails(self.worker_id, limit=limit, lease_sec=self.s.SEND_LEASE_SEC, budgets=self.last_budgets)
+        self.last_claimed = len(rows)
+        jobs = [r for r in rows if r["to_email"]]
+
+        now = datetime.now()
+        # a slowed-down account must not hold its rows past the lease; what does not fit is deferred,
+        # spaced out at the account's current rate
+        deadline = time.monotonic() + self.s.SEND_LEASE_SEC / 2
+        deferred = {account_id: itertools.count() for account_id in self.pacers}
+
+        def deliver(r) -> Tuple[str, Any]:
+            # ("sent", None), ("deferred", (seconds to wait, error)) or ("error", classify_error(...))
+            if dry_run:
+                return "sent", None
+            import smtplib
+
+            account = self._accounts.get(r["account_id"]) or self.accounts[0]
+            paused = self._paused.get(account.id)
+            if paused and paused[0] > time.monotonic():
+                return "deferred", (paused[0] - time.monotonic(), paused[1])
+            pacer = self.pacers[account.id]
+            reserved_at = time.monotonic()
+            wait = pacer.reserve()
+            if time.monotonic() + wait > deadline:
+                pacer.refund()
+                return "deferred", (wait + next(deferred[account.id]) * pacer.interval, None)
+            time.sleep(wait)
+            try:
+                with METRICS.timer("email_render_seconds"):
+                    subject, body = self.render(r, now)
+                self._send(r["to_email"], subject, body, account)
+            except smtplib.SMTPAuthenticationError as e:
+                pacer.refund()
+                return "deferred", self._pause_account(account, e)
+            except Exception as e:
+                error = classify_error(e)
+                if error[1]:
+                    pacer.throttled(reserved_at)  # before returning, so the rest of this batch already slows down
+                    METRICS.inc("smtp_throttled_total", account=account.id)
+                return "error", error
+            pacer.succeeded()
+            self._auth_failures.pop(account.id, None)
+            return "sent", None
+
+        workers = workers or self.s.SMTP_WORKERS
+        try:
+            if workers > 1 and len(jobs) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(deliver, jobs))
+            else:
+                results = [deliver(r) for r in jobs]
+        finally:
+            if not keep_sessions:
+                self.close()
+        # rows without a recipient address will never become sendable
+        updates: List[Tuple[int, str, Optional[str]]] = [(r["id"], "skipped", None) for r in rows if not r["to_email"]]
+        retries: List[Tuple[int, float, bool, Optional[str]]] = []
+        sent_by_account: Dict[str, int] = {}
+        for r, (outcome, detail) in zip(jobs, results):
+            if outcome == "sent":
+                updates.append((r["id"], "sent", None))
+                if r["account_id"] and not dry_run:  # a dry run uses no real quota
+                    sent_by_account[r["account_id"]] = sent_by_account.get(r["account_id"], 0) + 1
+            elif outcome == "deferred":
+                retries.append((r["id"], detail[0], False, detail[1]))
+            else:
+                transient, throttled, error = detail
+                # throttling says nothing about the message, so it never uses up its attempts; but
+                # no email keeps retrying for longer than SEND_RETRY_MAX_AGE_SEC after it first failed
+                expired = (r["retrying_sec"] or 0) >= self.s.SEND_RETRY_MAX_AGE_SEC
+                if not expired and (throttled or (transient and r["attempts"] + 1 < self.s.SEND_MAX_ATTEMPTS)):
+                    retries.append((r["id"], retry_delay(r["attempts"], self.s.SEND_RETRY_BASE_SEC, self.s.SEND_RETRY_MAX_SEC), True, error))
+                else:
+                    updates.append((r["id"], "failed", error))
+        self.last_retries = [(qid, delay) for qid, delay, _, _ in retries]
+        with db.transaction():
+            db.finish_emails(self.worker_id, updates)
+            db.retry_emails(self.worker_id, retries)
+            db.record_sends(sent_by_account)
+        for _, status, _ in updates:
+            METRICS.inc("email_results_total", status=status)
+        for _, _, attempted, _ in retries:
+            METRICS.inc("email_results_total", status="retry" if attempted else "deferred")
+        return sum(1 for outcome, _ in results if outcome == "sent")
+
+    def render(self, row: Dict, now: Optional[datetime] = None) -> Tuple[str, str]:
+        # queued rows reference a template; rows queued before that carry their rendered text
+        template = TEMPLATES.get(row.get("template_id") or "")
+        if template is None:
+            if row.get("template_id"):
+                template = template_for_step(row["step"])
+            else:
+                return row["subject"], row["body"]
+        return template.render(json.loads(row.get("params") or "{}"), now)
 
-    def send_due(self, db: DB, dry_run: bool = False) -> int:
-        rows = db.query(
-            "SELECT id, lead_id, step, subject, body FROM email_queue WHERE status='scheduled' AND scheduled_at <= CURRENT_TIMESTAMP ORDER BY scheduled_at ASC LIMIT 100"
+    def create_sequences(self, db: DB, leads: Iterable[Dict], start: datetime):
+        # leads: dicts with lead_id, contact, company; every step of every lead goes in one executemany.
+        # scheduled_at is stored in UTC like CURRENT_TIMESTAMP; a naive start is taken as local time.
+        start = start.astimezone(timezone.utc)
+        dates = {step: when.strftime("%Y-%m-%d %H:%M:%S") for step, when in schedule_dates(start).items()}
+        db.schedule_emails(
+            {
+                "lead_id": lead["lead_id"],
+                "step": step,
+                "template_id": template_for_step(step).id,
+                "template_version": template_for_step(step).version,
+                "params": json.dumps({"contact_name": lead.get("contact") or "", "company_name": lead.get("company") or ""}, ensure_ascii=False),
+                "scheduled_at": when,
+            }
+            for lead in leads
+            for step, when in dates.items()
         )
-        sent = 0
-        for r in rows:
-            lead = db.query("SELECT contact_id FROM leads WHERE id=?", (r["lead_id"],))
-            if not lead:
-                continue
-            contact_id = lead[0]["contact_id"]
-            if not contact_id:
-                continue
-            contact = db.query("SELECT email, full_name FROM contacts WHERE id=?", (contact_id,))
-            if not contact:
-                continue
-            to_email = contact[0]["email"]
-            if not to_email:
-                continue
-            ok = True if dry_run else self._send(to_email, r["subject"], r["body"])
-            db.execute(
-                "UPDATE email_queue SET status=?, last_attempt_at=CURRENT_TIMESTAMP WHERE id=?",
-                ("sent" if ok else "failed", r["id"]),
-            )
-            if ok:
-                sent += 1
-        return sent
 
     def create_sequence(self, db: DB, lead_id: int, contact_name: Optional[str], company_name: str, start: datetime):
-        from salesactivator.emailer.templates import schedule_dates
-        dates = schedule_dates(start)
-        for step, when in dates.items():
-            subj = render_subject(step, company_name)
-            body = render_body(step, contact_name or "", company_name)
-            db.schedule_email(lead_id, step, subj, body, when.strftime("%Y-%m-%d %H:%M:%S"))
+        self.create_sequences(db, [{"lead_id": lead_id, "contact": contact_name, "company": company_name}], start)
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from typing import Dict
+from string import Formatter
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 SEQUENCE_DAYS = {
     1: 0,  # day 0
@@ -7,34 +8,69 @@ SEQUENCE_DAYS = {
     3: 7,  # +7 days
 }
 
+TEMPLATE_FIELDS = {"contact_name", "company_name", "quarter"}
+
+
+class EmailTemplate:
+    # subject/body are str.format templates, checked once at import against the fields render() supplies
+    def __init__(self, template_id: str, version: int, subject: str, body: str):
+        self.id = template_id
+        self.version = version
+        self.subject = subject
+        self.body = body
+        unknown = {f for text in (subject, body) for _, f, _, _ in Formatter().parse(text) if f} - TEMPLATE_FIELDS
+        if unknown:
+            raise ValueError(f"template {template_id} uses unknown fields {sorted(unknown)}")
+
+    def render(self, params: Mapping[str, Any], now: Optional[datetime] = None) -> Tuple[str, str]:
+        now = now or datetime.now()
+        values = {
+            "contact_name": params.get("contact_name") or "equipo",
+            "company_name": params.get("company_name") or "",
+            "quarter": (now.month - 1) // 3 + 1,
+        }
+        return self.subject.format_map(values), self.body.format_map(values)
+
+
+# Bump a template's version when its text changes; queued rows always render the current text.
+TEMPLATES: Dict[str, EmailTemplate] = {t.id: t for t in (
+    EmailTemplate(
+        "mice_step1", 2,
+        "Ideas para tus eventos corporativos – {company_name}",
+        "Hola {contact_name},\n\n"
+        "Ayudo a empresas MICE a diseñar y ejecutar incentivos y eventos que generan pipeline y retención."
+        "\n\nTengo 3 ideas rápidas adaptadas a {company_name}. Si tiene sentido, puedo compartir un deck breve y un calendario."
+        "\n\n¿Te parece si coordinamos una llamada de 15 minutos esta semana?\n\nSaludos,\n",
+    ),
+    EmailTemplate(
+        "mice_step2", 1,
+        "Seguimiento rápido – {company_name}",
+        "Hola {contact_name},\n\n"
+        "Solo para mantener el hilo vivo. Podemos encargarnos de end-to-end (sourcing de venues, logística, agenda, patrocinios)."
+        "\n\n¿Quieres que te envíe 2-3 casos relevantes y presupuesto estimado?\n\nSaludos,\n",
+    ),
+    EmailTemplate(
+        "mice_step3", 1,
+        "Cierro el loop – {company_name}",
+        "Hola {contact_name},\n\n"
+        "Cierro el loop por ahora. Si en Q{quarter} están evaluando proveedores para eventos/incentivos,"
+        " me encantaría aplicar.\n\n¿Te dejo material para cuando lo necesites?\n\nGracias,\n",
+    ),
+)}
+
+SEQUENCE_TEMPLATES = {1: "mice_step1", 2: "mice_step2", 3: "mice_step3"}
+
+
+def template_for_step(step: int) -> EmailTemplate:
+    return TEMPLATES[SEQUENCE_TEMPLATES.get(step, SEQUENCE_TEMPLATES[3])]
+
+
 def render_subject(step: int, company_name: str) -> str:
-    if step == 1:
-        return f"Ideas para tus eventos corporativos – {company_name}"
-    if step == 2:
-        return f"Seguimiento rápido – {company_name}"
-    return f"Cierro el loop – {company_name}"
+    return template_for_step(step).render({"company_name": company_name})[0]
 
 
 def render_body(step: int, contact_name: str, company_name: str) -> str:
-    if step == 1:
-        return (
-            f"Hola {contact_name or 'equipo'},\n\n"
-            "Ayudo a empresas MICE a diseñar y ejecutar incentivos y eventos que generan pipeline y retención."
-            "\n\nTengo 3 ideas rápidas adaptadas a {company_name}. Si tiene sentido, puedo compartir un deck breve y un calendario."
-            "\n\n¿Te parece si coordinamos una llamada de 15 minutos esta semana?\n\nSaludos,\n"
-        )
-    if step == 2:
-        return (
-            f"Hola {contact_name or 'equipo'},\n\n"
-            "Solo para mantener el hilo vivo. Podemos encargarnos de end-to-end (sourcing de venues, logística, agenda, patrocinios)."
-            "\n\n¿Quieres que te envíe 2-3 casos relevantes y presupuesto estimado?\n\nSaludos,\n"
-        )
-    q = (datetime.now().month - 1) // 3 + 1
-    return (
-        f"Hola {contact_name or 'equipo'},\n\n"
-        f"Cierro el loop por ahora. Si en Q{q} están evaluando proveedores para eventos/incentivos,"
-        " me encantaría aplicar.\n\n¿Te dejo material para cuando lo necesites?\n\nGracias,\n"
-    )
+    return template_for_step(step).render({"contact_name": contact_name, "company_name": company_name})[1]
 
 
 def schedule_dates(start_date: datetime) -> Dict[int, datetime]:
@@ -0,0 +1,190 @@
+import hashlib
+import re
+from typing import Dict, Generator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+
+from lxml import etree
+
+from salesactivator.utils.http import HTML_CONTENT_TYPES, XML_CONTENT_TYPES
+from salesactivator.utils.text import is_email_valid
+
+# path segments and anchor words that point at contact details; a word matches a hint it starts
+# with, so "contactus", "kontaktformular" and "teams" count too
+CONTACT_HINTS = {
+    "contact": 10, "contacto": 10, "contactenos": 10, "contactanos": 10, "kontakt": 10, "contatti": 10, "contato": 10,
+    "touch": 8, "impressum": 8, "imprint": 8,
+    "team": 5, "staff": 5, "equipo": 5, "people": 4, "leadership": 4, "about": 4, "nosotros": 4, "quienes": 4,
+    "offices": 3, "office": 3, "locations": 3, "reach": 3, "company": 2,
+}
+NEGATIVE_HINTS = {
+    "blog", "news", "press", "privacy", "terms", "cookie", "cookies", "careers", "jobs", "login", "signin",
+    "register", "cart", "checkout", "shop", "tag", "category", "feed", "search", "wp", "author",
+}
+SKIP_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".doc", ".docx", ".mp4", ".css", ".js", ".xml", ".gz")
+# a link this good is worth fetching without looking at the sitemap
+CONTACT_SCORE = 8
+MAX_SITEMAP_URLS = 5000
+LOC_REGEX = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+WORD_REGEX = re.compile(r"[a-z]+")
+
+
+def _site(host: Optional[str]) -> str:
+    host = (host or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _hint_weight(word: str) -> int:
+    if word in NEGATIVE_HINTS:
+        return -5
+    return max((w for hint, w in CONTACT_HINTS.items() if word.startswith(hint)), default=0)
+
+
+def score_link(url: str, text: str = "") -> float:
+    path = urlparse(url).path.lower()
+    words = WORD_REGEX.findall(path)
+    score = sum(_hint_weight(w) for w in set(words))
+    # anchor text counts for less than the path: "About" menus often hold many links
+    score += 0.5 * max((_hint_weight(w) for w in WORD_REGEX.findall(text.lower())), default=0)
+    # shallow pages first
+    return score - 0.5 * path.strip("/").count("/")
+
+
+def _same_site_url(href: str, base_url: str, sites: Set[str]) -> Optional[str]:
+    url = urldefrag(urljoin(base_url, href.strip()))[0]
+    p = urlparse(url)
+    if p.scheme not in ("http", "https") or _site(p.hostname) not in sites:
+        return None
+    if p.path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+    return url.rstrip("/")
+
+
+def extract_links(html: str, base_url: str, sites: Set[str]) -> Dict[str, str]:
+    # same-site page links -> anchor text
+    try:
+        root = etree.fromstring(html, etree.HTMLParser())
+    except (etree.ParserError, ValueError):
+        return {}
+    if root is None:
+        return {}
+    links: Dict[str, str] = {}
+    for a in root.iter("a"):
+        href = a.get("href")
+        if not href or href.startswith(("mailto:", "tel:", "javascript:")):
+            continue
+        url = _same_site_url(href, base_url, sites)
+        if url:
+            text = " ".join(t.strip() for t in a.itertext() if t.strip())
+            links[url] = (links.get(url, "") + " " + text).strip()
+    return links
+
+
+def sitemap_urls(xml: str, base_url: str, sites: Set[str]) -> List[str]:
+    urls = []
+    for m in LOC_REGEX.finditer(xml):
+        url = _same_site_url(m.group(1), base_url, sites)
+        if url:
+            urls.append(url)
+            if len(urls) >= MAX_SITEMAP_URLS:
+                break
+    return urls
+
+
+def rank_links(links: Dict[str, str], exclude: Set[str]) -> List[Tuple[float, str]]:
+    ranked = [(score_link(url, text), url) for url, text in links.items() if url not in exclude]
+    return sorted((r for r in ranked if r[0] > 0), key=lambda r: (-r[0], len(r[1])))
+
+
+class SiteCrawl:
+    # Crawl plan for one site, written as a generator so the sync, async and pipeline enrichers can
+    # drive it with their own fetch: steps() yields (url, content types) and is sent back the
+    # response or None, after the driver record()s whether the fetch went to the network. Order:
+    # robots.txt (usually served by the response cache), the homepage, sitemap.xml only when the
+    # homepage links nothing contact-like, then the best-ranked links up to max_pages or as many
+    # as Http's per-domain request budget has left. With parse=True pages are parsed as they
+    # arrive and the crawl stops as soon as it holds a valid email and a phone number; with
+    # parse=False raw pages are kept in `bodies` for the caller to parse.
+    def __init__(self, enricher, url: str, max_pages: int = 3, robots: bool = True, parse: bool = True):
+        self.enricher = enricher
+        self.url = url
+        self.max_pages = max_pages
+        self.robots = robots
+        self.parse = parse
+        self.infos: List[Dict] = []
+        self.pages: Dict[str, str] = {}  # page url -> sha1 of its body
+        self.bodies: List[Tuple[str, str, str]] = []  # (page url, html, sha1) when parse=False
+        self.requests = 0  # fetches that went to the network, see record()
+
+    def _fetch(self, url: str, content_types: Sequence[str] = HTML_CONTENT_TYPES):
+        return (url, content_types)
+
+    def record(self, network: bool):
+        # called by the driver for every fetch it sent back; response-cache hits are free
+        self.requests += network
+
+    def _budget_left(self, url: str) -> bool:
+        # Http refuses requests over the host's budget; a fetch it would refuse is not made
+        left = self.enricher.http.remaining(url) if self.enricher.http else None
+        return left is None or left > 0
+
+    def _add_page(self, url: str, resp):
+        digest = hashlib.sha1(resp.content).hexdigest()
+        self.pages[url] = digest
+        if self.parse:
+            self.infos.append(self.enricher.extract_company_info(resp.text))
+        else:
+            self.bodies.append((url, resp.text, digest))
+
+    def has_contact(self) -> bool:
+        emails = any(is_email_valid(e) for info in self.infos for e in info.get("emails", []))
+        return emails and any(info.get("phones") for info in self.infos)
+
+    def steps(self) -> Generator[Tuple[str, Sequence[str]], object, None]:
+        base = self.url
+        rules: Optional[RobotFileParser] = None
+        # robots.txt, the homepage and the sitemap go first, so ranked pages only get what is left
+        if self.robots and self._budget_left(base):
+            resp = yield self._fetch(urljoin(base + "/", "robots.txt"), ("text/plain",))
+            if resp is not None:
+                rules = RobotFileParser()
+                rules.parse(resp.text.splitlines())
+        agent = self.enricher.http.session.headers.get("User-Agent", "*") if self.enricher.http else "*"
+
+        def allowed(url: str) -> bool:
+            return rules is None or rules.can_fetch(agent, url)
+
+        if not allowed(base) or not self._budget_left(base):
+            return
+        home = yield self._fetch(base)
+        if home is None:
+            return
+        self._add_page(base, home)
+        if self.has_contact():
+            return
+        home_url = (getattr(home, "url", None) or base).rstrip("/")
+        sites = {_site(urlparse(base).hostname), _site(urlparse(home_url).hostname)}
+        seen = {base, home_url}
+        links = extract_links(home.text, home_url + "/", sites)
+        ranked = rank_links(links, seen)
+        sitemaps = (rules.site_maps() if rules else None) or [urljoin(base + "/", "sitemap.xml")]
+        if (not ranked or ranked[0][0] < CONTACT_SCORE) and self._budget_left(sitemaps[0]):
+            resp = yield self._fetch(sitemaps[0], XML_CONTENT_TYPES)
+            if resp is not None:
+                links = {**dict.fromkeys(sitemap_urls(resp.text, home_url + "/", sites), ""), **links}
+                ranked = rank_links(links, seen)
+        fetched = 0
+        for _, url in ranked:
+            if fetched >= self.max_pages:
+                return
+            if not allowed(url):
+                continue
+            if not self._budget_left(url):
+                return
+            fetched += 1
+            resp = yield self._fetch(url)
+            if resp is None:
+                continue
+            self._add_page(url, resp)
+            if self.has_contact():
+                return
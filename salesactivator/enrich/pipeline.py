@@ -0,0 +1,144 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from salesactivator.enrich.website import WebsiteEnricher
+from salesactivator.utils.metrics import METRICS
+
+_DONE = object()
+_worker_enricher: Optional[WebsiteEnricher] = None
+# Parser processes start from a clean interpreter: a plain fork() from here would copy locks
+# (metrics, rate limiters, the HTTP cache) that a fetcher thread may be holding at that moment.
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _parse_site(extractor: str, url: str, pages: List[Tuple[str, str, str]], requests: int) -> Dict:
+    # runs in a pool process: pages are (page url, html, sha1 of body)
+    global _worker_enricher
+    if _worker_enricher is None or _worker_enricher.extractor != extractor:
+        _worker_enricher = WebsiteEnricher(None, extractor=extractor)
+    # METRICS in a pool process never reaches the parent, so parse times travel with the result
+    infos, seconds = [], []
+    for _, html, _ in pages:
+        t0 = time.perf_counter()
+        infos.append(_worker_enricher.extract_company_info(html))
+        seconds.append(time.perf_counter() - t0)
+    info = _worker_enricher._merge(url, infos, {p: h for p, _, h in pages}, requests)
+    info["parse_seconds"] = seconds
+    return info
+
+
+class EnrichPipeline:
+    # fetch threads -> parse processes -> one writer thread, joined by bounded queues so a
+    # slow stage holds back the ones before it instead of buffering pages in memory
+    def __init__(self, enricher: WebsiteEnricher, fetchers: int = 16, parsers: int = 4, queue_size: int = 64):
+        self.enricher = enricher
+        self.fetchers = max(1, fetchers)
+        self.parsers = max(1, parsers)
+        self.queue_size = max(1, queue_size)
+
+    def _fetch(self, website: str) -> Tuple[Optional[str], List[Tuple[str, str, str]], int]:
+        # parsing happens in the pool, so the crawl cannot stop early on a found contact
+        url = self.enricher.normalize_website(website)
+        if not url:
+            return None, [], 0
+        crawl = self.enricher.run_crawl(self.enricher.crawl(url, parse=False))
+        return url, crawl.bodies, crawl.requests
+
+    def run(self, websites: Sequence[str], on_result: Callable[[int, Dict], None]):
+        # on_result(index, info) is always called from the single writer thread
+        fetch_q: "queue.Queue" = queue.Queue(self.queue_size)
+        parse_q: "queue.Queue" = queue.Queue(self.queue_size)
+        write_q: "queue.Queue" = queue.Queue(self.queue_size)
+        live_fetchers = [self.fetchers]
+        lock = threading.Lock()
+        errors: List[BaseException] = []
+        # set when the parser pool broke or on_result raised: the stages drain their queues without
+        # doing any work, and run() re-raises the first error
+        failed = threading.Event()
+
+        def fetcher():
+            while True:
+                item = fetch_q.get()
+                if item is _DONE:
+                    break
+                if failed.is_set():
+                    continue
+                i, website = item
+                try:
+                    parse_q.put((i,) + self._fetch(website))
+                except Exception:
+                    parse_q.put((i, None, [], 0))
+            with lock:
+                live_fetchers[0] -= 1
+                if live_fetchers[0] == 0:
+                    parse_q.put(_DONE)
+
+        def writer():
+            while True:
+                item = write_q.get()
+                if item is _DONE:
+                    return
+                i, fut = item
+                if failed.is_set():
+                    continue
+                try:
+                    info = fut.result() if isinstance(fut, Future) else fut
+                except BrokenProcessPool as e:
+                    failed.set()
+                    errors.append(e)
+                    continue
+                except Exception:
+                    info = {}
+                for seconds in info.pop("parse_seconds", ()):
+                    METRICS.observe("parse_seconds", seconds, extractor=self.enricher.extractor)
+                try:
+                    on_result(i, info)
+                except BaseException as e:  # no more results after a failed write; keep draining
+                    failed.set()
+                    errors.append(e)
+
+        threads = [threading.Thread(target=fetcher, daemon=True) for _ in range(self.fetchers)]
+        threads.append(threading.Thread(target=writer, daemon=True))
+        for t in threads:
+            t.start()
+        with ProcessPoolExecutor(max_workers=self.parsers, mp_context=multiprocessing.get_context(_START_METHOD)) as pool:
+            dispatcher = threading.Thread(target=self._dispatch, args=(pool, parse_q, write_q, failed, errors), daemon=True)
+            dispatcher.start()
+            for item in enumerate(websites):
+                fetch_q.put(item)
+            for _ in range(self.fetchers):
+                fetch_q.put(_DONE)
+            for t in threads:
+                t.join()
+            dispatcher.join()
+        if errors:
+            raise errors[0]
+
+    def _dispatch(self, pool: ProcessPoolExecutor, parse_q: "queue.Queue", write_q: "queue.Queue",
+                  failed: threading.Event, errors: List[BaseException]):
+        # always ends with _DONE on write_q and parse_q drained, or run() would wait forever
+        extractor = self.enricher.extractor
+        try:
+            while True:
+                item = parse_q.get()
+                if item is _DONE:
+                    return
+                if failed.is_set():
+                    continue
+                i, url, pages, requests = item
+                if url is None:
+                    write_q.put((i, {}))
+                    continue
+                write_q.put((i, pool.submit(_parse_site, extractor, url, pages, requests)))
+        except BaseException as e:  # BrokenProcessPool once a parser process died
+            failed.set()
+            errors.append(e)
+            while parse_q.get() is not _DONE:
+                pass
+        finally:
+            write_q.put(_DONE)
@@ -1,21 +1,62 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
-from typing import Dict, List, Optional
+from lxml import etree
+from urllib.parse import unquote, urlparse
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from salesactivator.enrich.frontier import SiteCrawl
+from salesactivator.utils.domains import canonical_url
 from salesactivator.utils.http import Http
-from salesactivator.utils.text import extract_emails, extract_phones
+from salesactivator.utils.metrics import METRICS
+from salesactivator.utils.text import extract_contacts
 from salesactivator.utils.text import is_email_valid
 
+# text under these tags is not returned by BeautifulSoup's get_text() (see bs4 string containers)
+HIDDEN_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+EXTRACTORS = ("fast", "soup")
+FEED_CHUNK = 64 * 1024
+
+
+def _link_contacts(hrefs: Iterable[str]) -> Tuple[List[str], List[str]]:
+    # addresses in mailto: and tel: links, which often differ from (or replace) the visible text
+    emails: Dict[str, None] = {}
+    phones: Dict[str, None] = {}
+    for href in hrefs:
+        scheme, _, value = href.strip().partition(":")
+        scheme = scheme.lower()
+        if scheme not in ("mailto", "tel") or not value:
+            continue
+        found_emails, found_phones = extract_contacts(unquote(value.split("?", 1)[0]).replace(",", " "))
+        emails.update(dict.fromkeys(found_emails))
+        phones.update(dict.fromkeys(found_phones))
+    return list(emails), list(phones)
+
+
+def _contacts(text: str, hrefs: List[str]) -> Tuple[List[str], List[str]]:
+    emails, phones = extract_contacts(text)
+    if hrefs:
+        link_emails, link_phones = _link_contacts(hrefs)
+        emails = list(dict.fromkeys(emails + link_emails))
+        phones = list(dict.fromkeys(phones + link_phones))
+    return emails, phones
+
 
 class WebsiteEnricher:
-    def __init__(self, http: Http):
+    def __init__(self, http: Http, extractor: str = "fast", max_pages: int = 3, respect_robots: bool = True):
+        if extractor not in EXTRACTORS:
+            raise ValueError(f"unknown extractor {extractor!r}, expected one of {EXTRACTORS}")
         self.http = http
+        self.extractor = extractor
+        self.max_pages = max_pages  # pages fetched after the homepage
+        self.respect_robots = respect_robots
+        self._domain_locks: Dict[str, asyncio.Lock] = {}
 
     def normalize_website(self, url: str) -> Optional[str]:
         if not url:
             return None
-        if not url.startswith("http"):
-            url = "https://" + url
-        return url.rstrip('/').lower()
+        # lowercasing the whole URL broke case-sensitive paths; only scheme and host are folded
+        return canonical_url(url) or None
 
     def find_root_domain(self, url: str) -> Optional[str]:
         try:
@@ -24,18 +65,88 @@ class WebsiteEnricher:
         except Exception:
             return None
 
-    def fetch_candidate_pages(self, base_url: str) -> List[str]:
-        pages = [base_url]
-        # Try common contact/about pages
-        for path in ("/contact", "/contact-us", "/about", "/team"):
-            pages.append(urljoin(base_url + '/', path.strip('/')))
-        return pages
+    def crawl(self, url: str, parse: bool = True) -> SiteCrawl:
+        return SiteCrawl(self, url, max_pages=self.max_pages, robots=self.respect_robots, parse=parse)
+
+    def run_crawl(self, crawl: SiteCrawl) -> SiteCrawl:
+        # drives crawl.steps() with blocking fetches
+        steps = crawl.steps()
+        try:
+            url, content_types = next(steps)
+            while True:
+                resp, network = self.http.fetch(url, content_types=content_types)
+                crawl.record(network)
+                url, content_types = steps.send(resp)
+        except StopIteration:
+            return crawl
 
     def extract_company_info(self, html: str) -> Dict:
+        if self.extractor == "fast":
+            with METRICS.timer("parse_seconds", extractor="fast"):
+                info = self.extract_company_info_fast(html)
+            if info is not None:
+                return info
+        with METRICS.timer("parse_seconds", extractor="soup"):
+            return self.extract_company_info_soup(html)
+
+    def extract_company_info_fast(self, html: str) -> Optional[Dict]:
+        # Same result as the soup extractor without building a tree: the page is fed to lxml's pull
+        # parser in chunks, each element's text is collected when it ends and its children are
+        # dropped, and feeding stops once </html> closes (lxml and BeautifulSoup both discard
+        # whatever follows). None when lxml rejects the input so callers can fall back.
+        parser = etree.HTMLPullParser(events=("start", "end"))
+        texts: Dict[object, List[str]] = {}  # ended element -> its text, in get_text() order
+        hrefs: List[str] = []
+        title: List[Optional[str]] = [None]
+
+        def read_events() -> bool:
+            # True once the root element has ended
+            for event, el in parser.read_events():
+                if event == "start":
+                    if el.tag == "a" and el.get("href"):
+                        hrefs.append(el.get("href"))
+                    continue
+                out: List[str] = []
+                hidden = el.tag in HIDDEN_TEXT_TAGS
+                if el.text and not hidden:
+                    out.append(el.text)
+                for child in el:  # comments and PIs never end as events, only their tail counts
+                    child_text = texts.pop(child, ())
+                    if not hidden:
+                        out.extend(child_text)
+                        if child.tail:
+                            out.append(child.tail)
+                del el[:]
+                texts[el] = out
+                if el.tag == "title" and title[0] is None:
+                    title[0] = "".join(p.strip() for p in out)
+                if el.getparent() is None:
+                    return True
+            return False
+
+        try:
+            for pos in range(0, len(html), FEED_CHUNK):
+                parser.feed(html[pos:pos + FEED_CHUNK])
+                if read_events():
+                    break
+            root = parser.close()
+            read_events()
+        except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+            return None
+        if root is None:
+            return None
+        text = " ".join(t for t in (s.strip() for s in texts.get(root, ())) if t)
+        emails, phones = _contacts(text, hrefs)
+        return {
+            "emails": emails,
+            "phones": phones,
+            "title": title[0],
+        }
+
+    def extract_company_info_soup(self, html: str) -> Dict:
         soup = BeautifulSoup(html, "lxml")
         text = soup.get_text(" ", strip=True)
-        emails = extract_emails(text)
-        phones = extract_phones(text)
+        emails, phones = _contacts(text, [a["href"] for a in soup.find_all("a", href=True)])
         title = soup.title.get_text(strip=True) if soup.title else None
         return {
             "emails": emails,
@@ -43,21 +154,16 @@ class WebsiteEnricher:
             "title": title,
         }
 
-    def enrich(self, website: str) -> Dict:
-        url = self.normalize_website(website)
-        if not url:
-            return {}
-        pages = self.fetch_candidate_pages(url)
+    def _merge(self, url: str, infos: Iterable[Dict], pages: Dict[str, str], requests: int = 0) -> Dict:
         data = {"emails": set(), "phones": set(), "title": None}
-        for p in pages:
-            resp = self.http.get(p)
-            if not resp:
-                continue
-            info = self.extract_company_info(resp.text)
+        for info in infos:
             data["emails"].update(info.get("emails", []))
             data["phones"].update(info.get("phones", []))
             if not data["title"]:
                 data["title"] = info.get("title")
+        # crawl stats: requests spent and whether the site itself yielded a usable address
+        data["requests"] = requests  # type: ignore
+        data["contact_found"] = any(is_email_valid(e) for e in data["emails"])  # type: ignore
         # fallback generic email if none
         if not data["emails"]:
             domain = self.find_root_domain(url)
@@ -67,4 +173,58 @@ class WebsiteEnricher:
                     data["emails"].add(generic)
         data["emails"] = list(data["emails"])  # type: ignore
         data["phones"] = list(data["phones"])  # type: ignore
+        # page url -> sha1 of its body; content_hash changes when any fetched page does
+        data["pages"] = pages  # type: ignore
+        data["content_hash"] = hashlib.sha1("\n".join(f"{u} {h}" for u, h in sorted(pages.items())).encode()).hexdigest()  # type: ignore
         return data
+
+    def enrich(self, website: str) -> Dict:
+        url = self.normalize_website(website)
+        if not url:
+            return {}
+        crawl = self.run_crawl(self.crawl(url))
+        return self._merge(url, crawl.infos, crawl.pages, crawl.requests)
+
+    async def _fetch_async(self, url: str, slots: asyncio.Semaphore, content_types):
+        # one request at a time per domain keeps Http's delay as the politeness limit
+        lock = self._domain_locks.setdefault(self.find_root_domain(url) or "", asyncio.Lock())
+        async with lock:
+            async with slots:
+                return await asyncio.to_thread(self.http.fetch, url, content_types=content_types)
+
+    async def enrich_async(self, website: str, slots: asyncio.Semaphore) -> Dict:
+        url = self.normalize_website(website)
+        if not url:
+            return {}
+        crawl = self.crawl(url)
+        steps = crawl.steps()
+        try:
+            page, content_types = next(steps)
+            while True:
+                resp, network = await self._fetch_async(page, slots, content_types)
+                crawl.record(network)
+                page, content_types = steps.send(resp)
+        except StopIteration:
+            pass
+        return self._merge(url, crawl.infos, crawl.pages, crawl.requests)
+
+    def enrich_many(self, websites: List[str], concurrency: int = 8, on_result: Optional[Callable[[int, Dict], None]] = None) -> List[Dict]:
+        # results keep the input order; on_result(index, info) runs on the loop thread as each site finishes
+        async def run():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+            self._domain_locks = {}
+            slots = asyncio.Semaphore(concurrency)
+            results: List[Dict] = [{} for _ in websites]
+
+            async def one(i: int, website: str):
+                try:
+                    results[i] = await self.enrich_async(website, slots)
+                except Exception:
+                    results[i] = {}
+                if on_result:
+                    on_result(i, results[i])
+
+            await asyncio.gather(*(one(i, w) for i, w in enumerate(websites)))
+            return results
+
+        return asyncio.run(run())
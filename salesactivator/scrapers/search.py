@@ -1,9 +1,16 @@
 from duckduckgo_search import DDGS
 from duckduckgo_search.exceptions import RatelimitException
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+import json
+import os
+import queue
+import threading
 import time
 import random
 
+from salesactivator.utils.ratelimit import HostBucket
+
 SEARCH_QUERIES = [
     'site:.com "event agency" "United States"',
     'site:.com "event planning" "corporate events"',
@@ -14,35 +21,98 @@ SEARCH_QUERIES = [
 ]
 
 
-def search_mice_companies(limit: int = 50) -> List[Dict]:
-    results: List[Dict] = []
-    with DDGS() as ddgs:
-        per_q = max(2, limit // max(1, len(SEARCH_QUERIES)))
-        for q in SEARCH_QUERIES:
-            attempts = 0
-            while attempts < 3:
-                try:
-                    for r in ddgs.text(q, max_results=per_q, region="wt-wt"):
-                        results.append({
-                            "title": r.get("title"),
-                            "href": r.get("href"),
-                            "body": r.get("body"),
-                            "source": q,
-                        })
-                    # gentle throttle between queries
-                    time.sleep(2 + random.random() * 2)
-                    break
-                except RatelimitException:
-                    attempts += 1
-                    time.sleep(8 * attempts)
-                except Exception:
-                    break
-    # Deduplicate by href
+def build_queries(keywords: str, country: str) -> List[str]:
+    # Settings.INDUSTRY_KEYWORDS is a comma-separated list
+    return [f'site:.com "{k.strip().lower()}" "{country}"' for k in keywords.split(",") if k.strip()]
+
+
+class SearchCheckpoint:
+    # queries whose results were fully handed to the caller; a run that finishes every query or
+    # reaches its limit removes the file, an interrupted or rate-limited one resumes from it
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.done: set = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = set(json.load(f).get("done", []))
+
+    def mark(self, query: str):
+        self.done.add(query)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"done": sorted(self.done)}, f)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        self.done = set()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _run_query(q: str, per_q: int, budget: HostBucket, stop: threading.Event) -> Optional[List[Dict]]:
+    # None means the query gave up (rate limited or failed) and should be retried next run
+    attempts = 0
+    while attempts < 3 and not stop.is_set():
+        # gentle throttle shared by every worker
+        wait = budget.reserve()
+        if wait > 0:
+            time.sleep(wait + random.random() * 2)
+        try:
+            with DDGS() as ddgs:
+                return [
+                    {"title": r.get("title"), "href": r.get("href"), "body": r.get("body"), "source": q}
+                    for r in ddgs.text(q, max_results=per_q, region="wt-wt")
+                ]
+        except RatelimitException:
+            attempts += 1
+            budget.penalize(8 * attempts)
+        except Exception:
+            return None
+    return None
+
+
+def iter_mice_companies(limit: int = 50, queries: Optional[Sequence[str]] = None, workers: int = 2, delay: float = 3.0, checkpoint_path: Optional[str] = None) -> Iterator[Dict]:
+    # yields results deduplicated by href as each query finishes
+    queries = list(queries or SEARCH_QUERIES)
+    checkpoint = SearchCheckpoint(checkpoint_path)
+    todo = [q for q in queries if q not in checkpoint.done]
+    per_q = max(2, limit // max(1, len(queries)))
+    budget = HostBucket(delay)
+    stop = threading.Event()
+    results: "queue.Queue" = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    for q in todo:
+        fut = pool.submit(_run_query, q, per_q, budget, stop)
+        fut.add_done_callback(lambda f, q=q: results.put((q, None if f.cancelled() or f.exception() else f.result())))
     seen = set()
-    deduped = []
-    for r in results:
-        href = r.get("href")
-        if href and href not in seen:
-            deduped.append(r)
-            seen.add(href)
-    return deduped[:limit]
+    yielded = 0
+    complete = 0
+    try:
+        for _ in todo:
+            q, batch = results.get()
+            if batch is None:
+                continue
+            for r in batch:
+                href = r.get("href")
+                if href and href not in seen:
+                    seen.add(href)
+                    yield r
+                    yielded += 1
+                    if yielded >= limit:
+                        # a limited run is complete as asked: leaving the file would make the next
+                        # run skip the queries it marked done
+                        checkpoint.clear()
+                        return
+            checkpoint.mark(q)
+            complete += 1
+        if complete == len(todo):
+            checkpoint.clear()
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def search_mice_companies(limit: int = 50) -> List[Dict]:
+    return list(iter_mice_companies(limit=limit))
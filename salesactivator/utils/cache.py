@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CACHE_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS http_cache (
+    url TEXT PRIMARY KEY,
+    status INTEGER,
+    headers TEXT,
+    body BLOB,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL,
+    accessed_at REAL,
+    size INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache(accessed_at);
+"""
+
+
+class ResponseCache:
+    # SQLite-backed response cache: fresh entries are served directly, stale ones are
+    # revalidated with ETag / Last-Modified, and 404/410 answers are kept for negative_ttl.
+    def __init__(self, path: str, ttl: float = 7 * 86400, negative_ttl: float = 86400, max_bytes: int = 500 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.executescript(CACHE_SCHEMA_SQL)
+        self._total = self._con.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._con.execute(
+                "SELECT status, headers, body, etag, last_modified, stored_at FROM http_cache WHERE url=?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            self._con.execute("UPDATE http_cache SET accessed_at=? WHERE url=?", (time.time(), url))
+        status, headers, body, etag, last_modified, stored_at = row
+        ttl = self.ttl if status == 200 else self.negative_ttl
+        return {
+            "status": status,
+            "headers": json.loads(headers or "{}"),
+            "body": body or b"",
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - stored_at < ttl,
+        }
+
+    def put(self, url: str, status: int, headers: Optional[Dict[str, str]] = None, body: bytes = b""):
+        headers = dict(headers or {})
+        now = time.time()
+        with self._lock:
+            old = self._con.execute("SELECT size FROM http_cache WHERE url=?", (url,)).fetchone()
+            self._con.execute(
+                "INSERT OR REPLACE INTO http_cache(url, status, headers, body, etag, last_modified, stored_at, accessed_at, size) VALUES(?,?,?,?,?,?,?,?,?)",
+                (url, status, json.dumps(headers), body, headers.get("ETag"), headers.get("Last-Modified"), now, now, len(body)),
+            )
+            self._total += len(body) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def touch(self, url: str):
+        # a 304 revalidation restarts the entry's TTL
+        with self._lock:
+            now = time.time()
+            self._con.execute("UPDATE http_cache SET stored_at=?, accessed_at=? WHERE url=?", (now, now, url))
+
+    def _evict(self):
+        # drop least recently used entries until we are back under 90% of the cap
+        target = int(self.max_bytes * 0.9)
+        cur = self._con.execute("SELECT url, size FROM http_cache ORDER BY accessed_at ASC")
+        doomed = []
+        for url, size in cur:
+            if self._total <= target:
+                break
+            doomed.append((url,))
+            self._total -= size or 0
+        cur.close()
+        self._con.executemany("DELETE FROM http_cache WHERE url=?", doomed)
+
+    def close(self):
+        with self._lock:
+            self._con.close()
@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Any
 
 # Load .env if python-dotenv is available; otherwise continue with OS env only
 try:
@@ -8,22 +9,72 @@ try:
 except Exception:
     pass
 
+
+def parse_flag(value: Any, default: bool = False) -> bool:
+    # "1", "true" and "yes" (any case) are true, every other string is false; None means unset.
+    # Booleans and numbers from JSON/TOML keep their truth value.
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
 @dataclass
 class Settings:
     ENV: str = os.getenv("ENV", "dev")
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "")  # write metrics after each command: .json or Prometheus text
     DB_PATH: str = os.getenv("DB_PATH", "./data/salesactivator.db")
+    SEEDS_PATH: str = os.getenv("SEEDS_PATH", "")  # empty: the bundled data/seeds_companies.csv
     USER_AGENT: str = os.getenv("USER_AGENT", "SalesActivatorBot/1.0 (+https://example.com)")
     REQUEST_DELAY_SEC: float = float(os.getenv("REQUEST_DELAY_SEC", "1.0"))
-    MAX_REQUESTS_PER_DOMAIN: int = int(os.getenv("MAX_REQUESTS_PER_DOMAIN", "5"))
+    MAX_REQUESTS_PER_DOMAIN: int = int(os.getenv("MAX_REQUESTS_PER_DOMAIN", "6"))  # robots.txt, homepage, sitemap + CRAWL_MAX_PAGES
+    MAX_PAGE_BYTES: int = int(os.getenv("MAX_PAGE_BYTES", "2000000"))
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "32"))
+    HTTP_CACHE_PATH: str = os.getenv("HTTP_CACHE_PATH", "./data/http_cache.db")  # empty disables the cache
+    HTTP_CACHE_TTL_SEC: float = float(os.getenv("HTTP_CACHE_TTL_SEC", str(7 * 86400)))
+    HTTP_CACHE_NEGATIVE_TTL_SEC: float = float(os.getenv("HTTP_CACHE_NEGATIVE_TTL_SEC", "86400"))
+    HTTP_CACHE_MAX_MB: int = int(os.getenv("HTTP_CACHE_MAX_MB", "500"))
+    ENRICH_TTL_DAYS: float = float(os.getenv("ENRICH_TTL_DAYS", "30"))
+    ENRICH_RETRY_HOURS: float = float(os.getenv("ENRICH_RETRY_HOURS", "6"))  # sites that could not be fetched are retried after this
+    HTML_EXTRACTOR: str = os.getenv("HTML_EXTRACTOR", "fast")  # fast (lxml) or soup (BeautifulSoup)
+    HTTP_OFFLINE: bool = parse_flag(os.getenv("HTTP_OFFLINE"), False)
+    CRAWL_MAX_PAGES: int = int(os.getenv("CRAWL_MAX_PAGES", "3"))  # pages per site after the homepage
+    CRAWL_RESPECT_ROBOTS: bool = parse_flag(os.getenv("CRAWL_RESPECT_ROBOTS"), True)
 
     SMTP_HOST: str = os.getenv("SMTP_HOST", "smtp.gmail.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
     SMTP_APP_PASSWORD: str = os.getenv("SMTP_APP_PASSWORD", "")
+    SMTP_STARTTLS: bool = parse_flag(os.getenv("SMTP_STARTTLS"), True)
+    SMTP_TIMEOUT_SEC: float = float(os.getenv("SMTP_TIMEOUT_SEC", "30"))
+    SMTP_WORKERS: int = int(os.getenv("SMTP_WORKERS", "1"))  # concurrent SMTP sessions
+    SMTP_MESSAGES_PER_SESSION: int = int(os.getenv("SMTP_MESSAGES_PER_SESSION", "100"))
+    SMTP_IDLE_TIMEOUT_SEC: float = float(os.getenv("SMTP_IDLE_TIMEOUT_SEC", "60"))  # the run daemon closes sessions unused this long
+    SMTP_ACCOUNTS: str = os.getenv("SMTP_ACCOUNTS", "")  # JSON list of sender accounts (or a file path); empty: SMTP_USERNAME only
+    SMTP_DAILY_QUOTA: int = int(os.getenv("SMTP_DAILY_QUOTA", "0"))  # default sends per account per rolling 24h, 0 = unlimited
+    SMTP_HOURLY_QUOTA: int = int(os.getenv("SMTP_HOURLY_QUOTA", "0"))  # default sends per account per clock hour, 0 = unlimited
+    SEND_LEASE_SEC: int = int(os.getenv("SEND_LEASE_SEC", "300"))  # claimed rows return to the pool after this
+    SEND_MAX_ATTEMPTS: int = int(os.getenv("SEND_MAX_ATTEMPTS", "5"))  # temporary SMTP failures are retried until this
+    SEND_RETRY_BASE_SEC: float = float(os.getenv("SEND_RETRY_BASE_SEC", "60"))  # first retry delay, doubled per attempt
+    SEND_RETRY_MAX_SEC: float = float(os.getenv("SEND_RETRY_MAX_SEC", "21600"))  # longest retry delay
+    SEND_RETRY_MAX_AGE_SEC: float = float(os.getenv("SEND_RETRY_MAX_AGE_SEC", "259200"))  # emails still failing this long after their first failure fail for good
+    SEND_AIMD_RECOVERY_SEC: float = float(os.getenv("SEND_AIMD_RECOVERY_SEC", "300"))  # sending time to climb back to a throttled rate
+    SEND_AIMD_MIN_PER_MIN: float = float(os.getenv("SEND_AIMD_MIN_PER_MIN", "1"))  # slowest rate throttling can push an account to
+    SEND_BATCH: int = int(os.getenv("SEND_BATCH", "50"))  # rows the run daemon claims per batch
+    SEND_RATE_PER_MIN: float = float(os.getenv("SEND_RATE_PER_MIN", "0"))  # run daemon send rate, 0 = unthrottled
+    DAEMON_POLL_SEC: float = float(os.getenv("DAEMON_POLL_SEC", "5"))  # how often the run daemon looks for new rows
+    DAEMON_HORIZON_SEC: float = float(os.getenv("DAEMON_HORIZON_SEC", "3600"))  # how far ahead it keeps rows in memory
+    DAEMON_STATUS_PATH: str = os.getenv("DAEMON_STATUS_PATH", "./data/daemon_status.json")  # empty disables
+    QUEUE_ARCHIVE_PATH: str = os.getenv("QUEUE_ARCHIVE_PATH", "./data/queue_archive.db")  # where `compact` moves finished emails
+    QUEUE_RETENTION_DAYS: float = float(os.getenv("QUEUE_RETENTION_DAYS", "30"))  # finished emails stay in the queue this long
     FROM_NAME: str = os.getenv("FROM_NAME", "")
     FROM_EMAIL: str = os.getenv("FROM_EMAIL", "")
 
+    SEARCH_DELAY_SEC: float = float(os.getenv("SEARCH_DELAY_SEC", "3.0"))  # average gap between search requests
+    SEARCH_CHECKPOINT_PATH: str = os.getenv("SEARCH_CHECKPOINT_PATH", "./data/search_checkpoint.json")
+
     COUNTRY: str = os.getenv("COUNTRY", "United States")
     INDUSTRY_KEYWORDS: str = os.getenv("INDUSTRY_KEYWORDS", "MICE,Incentives,Meetings,Conference,Exhibition,Event Planning,Event Agency,Corporate Events")
 
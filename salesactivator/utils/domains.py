@@ -0,0 +1,108 @@
+import ipaddress
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import tldextract  # type: ignore
+    # bundled Public Suffix List snapshot only: never fetch it over the network. Its private
+    # section makes every site on a hosting platform (acme.wixsite.com) its own domain.
+    _TLD = tldextract.TLDExtract(suffix_list_urls=(), include_psl_private_domains=True)
+except Exception:
+    _TLD = None  # optional
+
+# Second-level public suffixes used when tldextract is not installed; enough for the markets
+# we scrape. With tldextract the full Public Suffix List applies.
+MULTI_LABEL_SUFFIXES = frozenset({
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk",
+    "com.au", "net.au", "org.au", "co.nz", "org.nz", "co.za", "co.in", "co.jp", "co.kr",
+    "com.mx", "org.mx", "com.br", "com.ar", "com.co", "com.pe", "com.cn", "com.hk", "com.tw", "com.sg",
+    "com.tr", "com.my", "com.ph", "com.es", "com.pt", "co.il", "co.id", "co.th",
+})
+# Hosting platforms whose subdomains are separate sites owned by different companies, so
+# acme.wixsite.com is not folded into wixsite.com. Checked with and without tldextract: most are
+# in the private section of the Public Suffix List, a few site builders are not.
+PRIVATE_SUFFIXES = frozenset({
+    "wixsite.com", "squarespace.com", "business.site", "myshopify.com", "wordpress.com", "blogspot.com",
+    "github.io", "gitlab.io", "netlify.app", "vercel.app", "herokuapp.com", "pages.dev", "webflow.io",
+    "weebly.com", "godaddysites.com", "carrd.co", "jimdosite.com", "firebaseapp.com", "web.app",
+    "azurewebsites.net", "appspot.com",
+})
+TRACKING_PARAMS = frozenset({
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src",
+})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+DOMAIN_KEY_CACHE_SIZE = 100_000
+
+
+def _host(url: str) -> Optional[str]:
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(".").lower()
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+@lru_cache(maxsize=DOMAIN_KEY_CACHE_SIZE)
+def domain_key(url: str) -> str:
+    # "https://WWW.Events.Acme.co.uk:443/contact?utm_source=x" -> "acme.co.uk"; IP hosts stay as
+    # they are. Empty string when there is no host, which callers treat as "no key".
+    host = _host((url or "").strip())
+    if not host:
+        return ""
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split(".")
+    if len(labels) > 2 and ".".join(labels[-2:]) in PRIVATE_SUFFIXES:
+        return ".".join(labels[-3:])
+    if _TLD is not None:
+        ext = _TLD(host)
+        if ext.domain and ext.suffix:
+            return f"{ext.domain}.{ext.suffix}"
+    if len(labels) <= 2:
+        return host[4:] if host.startswith("www.") else host
+    n = 3 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return ".".join(labels[-n:])
+
+
+def canonical_url(url: str) -> str:
+    # scheme and host lowercased (https when missing), default port, fragment, tracking
+    # parameters and trailing slash removed; path and remaining query kept as they are
+    url = (url or "").strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = "https://" + url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url.rstrip("/")
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ])
+    return urlunsplit((scheme, netloc, parts.path, query, "")).rstrip("/")
+
+
+def site_url(url: str) -> str:
+    # the site root of a result URL, e.g. a search hit deep inside the site
+    canon = canonical_url(url)
+    if not canon:
+        return ""
+    parts = urlsplit(canon)
+    return f"{parts.scheme}://{parts.netloc}"
@@ -1,20 +1,135 @@
 import time
 import random
-from typing import Optional
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from salesactivator.utils.cache import ResponseCache
+from salesactivator.utils.ratelimit import HostBucket
+from salesactivator.utils.metrics import METRICS
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+XML_CONTENT_TYPES = ("application/xml", "text/xml", "text/plain")  # sitemaps
+NEGATIVE_STATUSES = (404, 410)
+
 
 class Http:
-    def __init__(self, user_agent: str, delay: float = 1.0):
+    def __init__(self, user_agent: str, delay: float = 1.0, max_requests_per_domain: int = 0, max_bytes: int = 2_000_000, pool_size: int = 32, cache: Optional[ResponseCache] = None, offline: bool = False):
         self.session = requests.Session()
         self.session.headers.update({"User-Agent": user_agent})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.delay = delay
+        self.max_requests_per_domain = max_requests_per_domain
+        self.max_bytes = max_bytes
+        self._buckets: Dict[str, HostBucket] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.cache = cache
+        self.offline = offline
+
+    def _acquire(self, host: str) -> bool:
+        with self._lock:
+            count = self._counts.get(host, 0)
+            if self.max_requests_per_domain and count >= self.max_requests_per_domain:
+                return False
+            self._counts[host] = count + 1
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = HostBucket(self.delay)
+        wait = bucket.reserve()
+        if wait > 0:
+            wait += random.random() * 0.5
+            METRICS.observe("http_wait_seconds", wait, host=host)
+            time.sleep(wait)
+        return True
+
+    def remaining(self, url: str) -> Optional[int]:
+        # requests the host's budget still allows, None when unlimited
+        if not self.max_requests_per_domain:
+            return None
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            return max(0, self.max_requests_per_domain - self._counts.get(host, 0))
+
+    def _read_capped(self, resp: requests.Response, content_types: Sequence[str] = HTML_CONTENT_TYPES) -> bool:
+        ctype = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if ctype and ctype not in content_types:
+            return False
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return False
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                return False
+            chunks.append(chunk)
+        resp._content = b"".join(chunks)
+        return True
+
+    def _from_cache(self, url: str, entry: dict) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = url
+        resp._content = entry["body"]
+        return resp
+
+    def get(self, url: str, timeout: int = 15, content_types: Sequence[str] = HTML_CONTENT_TYPES) -> Optional[requests.Response]:
+        return self.fetch(url, timeout, content_types)[0]
+
+    def fetch(self, url: str, timeout: int = 15, content_types: Sequence[str] = HTML_CONTENT_TYPES) -> Tuple[Optional[requests.Response], bool]:
+        # (response or None, whether a request went out): fresh cache entries, offline misses and
+        # requests over the host's budget never reach the network; a 304 revalidation does
+        entry = self.cache.get(url) if self.cache else None
+        if entry and (entry["fresh"] or self.offline):
+            METRICS.inc("http_requests_total", outcome="cache")
+            return (self._from_cache(url, entry) if entry["status"] == 200 else None), False
+        if self.offline:
+            METRICS.inc("http_requests_total", outcome="offline_miss")
+            return None, False
+        host = (urlparse(url).hostname or "").lower()
+        if not self._acquire(host):
+            METRICS.inc("http_requests_total", outcome="budget")
+            return None, False
+        return self._request(url, host, entry, timeout, content_types), True
 
-    def get(self, url: str, timeout: int = 15) -> Optional[requests.Response]:
+    def _request(self, url: str, host: str, entry: Optional[dict], timeout: int, content_types: Sequence[str]) -> Optional[requests.Response]:
+        headers = {}
+        if entry and entry["status"] == 200:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        outcome = "error"
+        t0 = time.perf_counter()
         try:
-            resp = self.session.get(url, timeout=timeout)
-            time.sleep(self.delay + random.random() * 0.5)
-            if resp.status_code == 200:
-                return resp
+            with self.session.get(url, timeout=timeout, stream=True, headers=headers) as resp:
+                outcome = str(resp.status_code)
+                if resp.status_code == 304 and headers:
+                    self.cache.touch(url)
+                    return self._from_cache(url, entry)
+                if resp.status_code == 200:
+                    if not self._read_capped(resp, content_types):
+                        outcome = "rejected"
+                        return None
+                    if self.cache:
+                        self.cache.put(url, 200, resp.headers, resp.content)
+                    return resp
+                if resp.status_code in NEGATIVE_STATUSES and self.cache:
+                    self.cache.put(url, resp.status_code)
         except requests.RequestException:
             return None
+        finally:
+            # per-host latency includes reading the (capped) body
+            METRICS.observe("http_request_seconds", time.perf_counter() - t0, host=host)
+            METRICS.inc("http_requests_total", outcome=outcome)
         return None
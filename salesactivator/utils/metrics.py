@@ -0,0 +1,197 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# upper bounds in seconds, Prometheus style (the last bucket is +Inf)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROMETHEUS_PREFIX = "salesactivator_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation, capped at the observed max
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    # Process-wide counters and latency histograms, keyed by name and labels. Cheap enough to
+    # leave on: one lock and a bisect per observation.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name: str, **labels: Any) -> Callable:
+        # decorator form of timer()
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def summary(self) -> List[str]:
+        # one line per metric name, summed over labels, grouped by stage (the name's first word);
+        # histograms also list the three label sets with the most total time
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {k: h for k, h in self.histograms.items()}
+        lines = [f"-- metrics ({time.time() - self.started:.1f}s wall) --"]
+        names = sorted({n for n, _ in counters} | {n for n, _ in histograms}, key=lambda n: (n.split("_")[0], n))
+        stage = None
+        for name in names:
+            if name.split("_")[0] != stage:
+                stage = name.split("_")[0]
+                lines.append(f"[{stage}]")
+            series = {labels: h for (n, labels), h in histograms.items() if n == name}
+            if series:
+                total = Histogram()
+                for h in series.values():
+                    total.merge(h)
+                lines.append(
+                    f"  {name:<28} n={total.count:<7} total={total.sum:.3f}s mean={1000 * total.sum / max(1, total.count):.2f}ms "
+                    f"p50={1000 * total.quantile(0.5):.1f}ms p95={1000 * total.quantile(0.95):.1f}ms max={1000 * total.max:.1f}ms"
+                )
+                if len(series) > 1 or any(series):
+                    top = sorted(series.items(), key=lambda kv: -kv[1].sum)[:3]
+                    lines.append("      top: " + ", ".join(f"{_label_text(l) or '-'} {h.sum:.3f}s/{h.count}" for l, h in top))
+                continue
+            values = {labels: v for (n, labels), v in counters.items() if n == name}
+            by_label = ", ".join(f"{_label_text(l)}={_num(v)}" for l, v in sorted(values.items(), key=lambda kv: -kv[1])[:6] if l)
+            lines.append(f"  {name:<28} {_num(sum(values.values()))}" + (f"  ({by_label})" if by_label else ""))
+        return lines
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "wall_seconds": time.time() - self.started,
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())],
+                "histograms": [
+                    {"name": n, "labels": dict(l), "count": h.count, "sum": h.sum, "max": h.max,
+                     "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts))}
+                    for (n, l), h in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        # text exposition format 0.0.4
+        out: List[str] = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                out.append(f"# TYPE {PROMETHEUS_PREFIX}{name} counter")
+                for (n, labels), v in sorted(self.counters.items()):
+                    if n == name:
+                        out.append(f"{PROMETHEUS_PREFIX}{name}{_prom_labels(labels)} {_num(v)}")
+            for name in sorted({n for n, _ in self.histograms}):
+                out.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([str(b) for b in h.buckets] + ["+Inf"], h.counts):
+                        cumulative += count
+                        out.append(f"{PROMETHEUS_PREFIX}{name}_bucket{_prom_labels(labels + (('le', bound),))} {cumulative}")
+                    out.append(f"{PROMETHEUS_PREFIX}{name}_sum{_prom_labels(labels)} {h.sum}")
+                    out.append(f"{PROMETHEUS_PREFIX}{name}_count{_prom_labels(labels)} {h.count}")
+        return "\n".join(out) + "\n"
+
+    def write(self, path: str):
+        # .json writes JSON, anything else Prometheus text (e.g. metrics.prom for node_exporter's textfile collector)
+        text = json.dumps(self.to_json(), indent=2) if path.endswith(".json") else self.to_prometheus()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else f"{v:.3f}"
+
+
+def _label_text(labels: Labels) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def _prom_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+
+METRICS = Metrics()
+
+
+def stmt_label(sql: str, width: int = 60) -> str:
+    # short, stable label for a SQL statement: collapsed whitespace, IN lists folded
+    text = " ".join(sql.split())
+    start = text.find("IN (?")
+    if start != -1:
+        end = text.find(")", start)
+        text = text[:start] + "IN (...)" + text[end + 1:]
+    return text[:width]
+
@@ -0,0 +1,43 @@
+import cProfile
+import os
+import pstats
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, TextIO
+
+PROFILE_MODES = ("cpu", "mem")
+PROFILE_EXTENSIONS = {"cpu": "prof", "mem": "tracemalloc"}
+TRACEMALLOC_FRAMES = 25
+
+
+@contextmanager
+def profiled(mode: str, path: str, report: TextIO = sys.stderr, top: int = 15) -> Iterator[None]:
+    # cpu: cProfile of the calling thread, saved for `python -m pstats` or snakeviz.
+    # mem: tracemalloc snapshot, load it with tracemalloc.Snapshot.load() to compare runs.
+    # A short top-N report goes to `report` either way.
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"unknown profile mode {mode!r}, expected one of {PROFILE_MODES}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if mode == "cpu":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(path)
+            print(f"-- cpu profile saved to {path} (top {top} by cumulative time) --", file=report)
+            pstats.Stats(prof, stream=report).sort_stats("cumulative").print_stats(top)
+        return
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot.dump(path)
+        print(f"-- memory snapshot saved to {path}: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB --", file=report)
+        for stat in snapshot.statistics("lineno")[:top]:
+            print(f"  {stat}", file=report)
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class HostBucket:
+    # token bucket: one request per `delay` seconds on average, bursts up to `capacity`
+    def __init__(self, delay: float, capacity: float = 1.0):
+        self.rate = 1.0 / delay if delay > 0 else 0.0
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # take a token now and return how long the caller must wait before using it
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def penalize(self, seconds: float):
+        # push every later reservation back, e.g. after the remote side signals rate limiting
+        if not self.rate:
+            return
+        with self.lock:
+            self.tokens -= seconds * self.rate
+
+
+class AimdBucket(HostBucket):
+    # HostBucket whose rate adapts the way TCP's congestion window does (AIMD): a throttle signal
+    # cuts it by `decrease`, then it climbs linearly, back to the rate that was throttled after
+    # `recovery_sec` of sending and on past it until the next signal. Unlimited until the first
+    # signal, which starts from the rate that was being attempted.
+    def __init__(self, recovery_sec: float, min_per_min: float, decrease: float = 0.5):
+        super().__init__(0.0)
+        self.recovery = max(1.0, recovery_sec)
+        self.floor = max(min_per_min, 0.01) / 60.0
+        self.decrease = decrease
+        self.step = 0.0  # rate regained per second of sending, set at each cut
+        self._recent: deque = deque()  # monotonic times of the last minute's reservations
+        self._cut_at = 0.0
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            while self._recent[0] < now - 60.0:
+                self._recent.popleft()
+        return super().reserve()
+
+    def succeeded(self):
+        if not self.rate:
+            return
+        with self.lock:
+            # one success per 1/rate seconds, so this adds `step` per second of sending
+            self.rate += self.step / self.rate
+
+    def throttled(self, reserved_at: float):
+        # reserved_at: time.monotonic() when the throttled send reserved its slot
+        with self.lock:
+            now = time.monotonic()
+            # sends reserved before the last cut report the congestion that cut already answered
+            if reserved_at < self._cut_at:
+                return
+            if self.rate:
+                reached = self.rate
+            else:
+                reached = len(self._recent) / max(1e-3, now - self._recent[0]) if self._recent else self.floor
+            self.rate = max(self.floor, reached * self.decrease)
+            self.step = max(0.0, reached - self.rate) / self.recovery
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = now
+            self._cut_at = now
+
+    def refund(self):
+        # give back a reservation that was not used
+        if not self.rate:
+            return
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.rate if self.rate else 0.0
+
+    @property
+    def per_min(self) -> Optional[float]:
+        return round(self.rate * 60.0, 2) if self.rate else None
@@ -1,8 +1,18 @@
 import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import phonenumbers
 from email_validator import validate_email, EmailNotValidError
 
 EMAIL_REGEX = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 PHONE_REGEX = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+# Single scan for both kinds of contact. Every match starts with "@", "+" or a digit, which lets re
+# skip plain text quickly. A lone "@" is expanded into the surrounding email with the two patterns
+# below. Results are the same as EMAIL_REGEX.findall + PHONE_REGEX.findall.
+CONTACT_SCAN_REGEX = re.compile(r"[@+\d](?:(?<=@)|(?<=\+)\d[\d\s().-]{7,}\d|(?<=\d)[\d\s().-]{7,}\d)")
+EMAIL_LOCAL_REGEX = re.compile(r"[A-Za-z0-9._%+-]+\Z")
+EMAIL_DOMAIN_REGEX = re.compile(r"[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+MAX_LOCAL_PART = 64
 
 COMMON_ROLES = [
     "Founder", "Co-Founder", "CEO", "President", "Partner",
@@ -11,17 +21,54 @@ COMMON_ROLES = [
 ]
 
 DOMAINS_STOPLIST = {"gmail.com", "yahoo.com", "outlook.com", "hotmail.com"}
+DEFAULT_PHONE_REGION = "US"
+EMAIL_VALIDATION_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=EMAIL_VALIDATION_CACHE_SIZE)
+def normalize_phone(raw: str, region: str = DEFAULT_PHONE_REGION) -> Optional[str]:
+    # E.164 so "(312) 555-0199" and "+1 312.555.0199" dedupe; None for digit runs that cannot be a phone number
+    try:
+        num = phonenumbers.parse(raw, region)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(num):
+        return None
+    return phonenumbers.format_number(num, phonenumbers.PhoneNumberFormat.E164)
+
+
+def extract_contacts(text: str, region: str = DEFAULT_PHONE_REGION) -> Tuple[List[str], List[str]]:
+    text = text or ""
+    emails = set()
+    phones = set()
+    email_end = 0
+    for m in CONTACT_SCAN_REGEX.finditer(text):
+        token = m.group()
+        if token != "@":
+            phone = normalize_phone(token, region)
+            if phone:
+                phones.add(phone)
+            continue
+        at = m.start()
+        local = EMAIL_LOCAL_REGEX.search(text, max(email_end, at - MAX_LOCAL_PART), at)
+        domain = EMAIL_DOMAIN_REGEX.match(text, at + 1) if local else None
+        if not domain:
+            continue
+        email_end = domain.end()
+        if domain.group().lower() not in DOMAINS_STOPLIST:
+            emails.add(text[local.start():email_end])
+    return list(emails), list(phones)
 
 
 def extract_emails(text: str):
-    emails = set(EMAIL_REGEX.findall(text or ""))
-    return [e for e in emails if not any(e.lower().endswith("@" + d) for d in DOMAINS_STOPLIST)]
+    return extract_contacts(text)[0]
 
 
 def extract_phones(text: str):
-    return list(set(PHONE_REGEX.findall(text or "")))
+    return extract_contacts(text)[1]
 
 
+@lru_cache(maxsize=EMAIL_VALIDATION_CACHE_SIZE)
 def is_email_valid(email: str) -> bool:
     try:
         validate_email(email, check_deliverability=False)
@@ -30,6 +77,11 @@ def is_email_valid(email: str) -> bool:
         return False
 
 
+def validate_many(emails: Iterable[str]) -> Dict[str, bool]:
+    # each distinct address is validated once; repeats across pages and runs hit the LRU cache
+    return {e: is_email_valid(e) for e in dict.fromkeys(emails)}
+
+
 def guess_corporate_email_patterns(domain: str, full_name: str):
     full = full_name.strip().lower()
     parts = re.split(r"\s+", full)
@@ -0,0 +1,126 @@
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+
+from salesactivator.db.store import DB
+from salesactivator.emailer.accounts import UNLIMITED, SenderAccount, account_budgets, load_accounts, next_quota_reset
+from salesactivator.utils.config import Settings, parse_flag
+
+START = date(2024, 3, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    return db
+
+
+def schedule(db, leads_per_email):
+    # one due email per entry, for the lead at that index (leads created on demand), due in order
+    leads = {}
+    for n, i in enumerate(leads_per_email):
+        if i not in leads:
+            company = db.upsert_company(f"C{i}", f"https://c{i}.com")
+            leads[i] = db.add_lead(company, db.add_contact(company, "Ann", email=f"ann@c{i}.com"))
+        db.schedule_email(leads[i], n + 1, "Hi", "Body", f"2000-01-01 00:00:{n:02d}")
+    return leads
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("0", False), ("false", False), ("False", False), ("no", False), ("", False), (" off ", False),
+    ("1", True), ("true", True), ("YES", True), (" yes ", True),
+    (False, False), (True, True), (0, False), (1, True), (None, True),
+])
+def test_parse_flag(value, expected):
+    assert parse_flag(value, default=True) is expected
+
+
+def test_account_starttls_strings():
+    s = Settings()
+    s.SMTP_STARTTLS = True
+    s.SMTP_ACCOUNTS = json.dumps([
+        {"id": "a", "starttls": "0"},
+        {"id": "b", "starttls": "false"},
+        {"id": "c", "starttls": False},
+        {"id": "d", "starttls": "true"},
+        {"id": "e"},
+    ])
+    assert {a.id: a.starttls for a in load_accounts(s)} == {"a": False, "b": False, "c": False, "d": True, "e": True}
+
+
+def test_daily_cap_without_warmup():
+    assert SenderAccount("a").daily_cap(START) == UNLIMITED
+    assert SenderAccount("a", daily_quota=500).daily_cap(START) == 500
+
+
+def test_geometric_warmup():
+    a = SenderAccount("a", daily_quota=500, warmup_start=START, warmup_days=10, warmup_initial=20)
+    caps = [a.daily_cap(date(2024, 3, d)) for d in range(1, 15)]
+    assert a.daily_cap(date(2024, 2, 29)) == 0  # not started yet
+    assert caps[0] == 20 and caps[10:] == [500] * 4
+    assert all(x < y for x, y in zip(caps[:10], caps[1:11]))  # grows every day
+    assert caps[5] == round(20 * 25 ** 0.5)  # halfway: the geometric mean
+
+
+def test_warmup_schedule():
+    a = SenderAccount("a", daily_quota=40, warmup_start=START, warmup_schedule=(10, 25, 60))
+    assert [a.daily_cap(date(2024, 3, d)) for d in range(1, 6)] == [10, 25, 40, 40, 40]
+    # without a daily quota the schedule still applies, then the cap is lifted
+    b = SenderAccount("b", warmup_start=START, warmup_schedule=(10, 25))
+    assert [b.daily_cap(date(2024, 3, d)) for d in range(1, 4)] == [10, 25, UNLIMITED]
+
+
+@pytest.mark.parametrize("daily, hourly, sent_24h, sent_hour, in_flight, expected", [
+    (100, 0, 0, 0, 0, 100),
+    (100, 0, 60, 10, 5, 35),
+    (100, 20, 60, 10, 5, 5),  # the hourly quota is tighter
+    (100, 20, 99, 0, 5, 0),  # never negative
+    (0, 0, 10**6, 10**6, 0, UNLIMITED - 10**6),
+])
+def test_budget(daily, hourly, sent_24h, sent_hour, in_flight, expected):
+    a = SenderAccount("a", daily_quota=daily, hourly_quota=hourly)
+    assert a.budget(START, sent_24h, sent_hour, in_flight) == expected
+
+
+def test_budgets_count_sends_and_claims(db):
+    schedule(db, range(5))
+    accounts = [SenderAccount("a", daily_quota=10, hourly_quota=4), SenderAccount("b", daily_quota=3)]
+    db.record_sends({"a": 2, "b": 1})
+    assert account_budgets(db, accounts) == {"a": 2, "b": 2}
+    with db.transaction():
+        db.claim_due_emails("w", limit=3, budgets=account_budgets(db, accounts))
+    assert db.in_flight_by_account() == {"a": 2, "b": 1}
+    assert account_budgets(db, accounts) == {"a": 0, "b": 1}
+
+
+def test_claim_splits_by_budget_and_sticks_leads(db):
+    leads = schedule(db, [0, 0, 1, 2, 3, 4, 5])
+    rows = db.claim_due_emails("w", limit=100, budgets={"a": 3, "b": 2, "c": 0})
+    # a new lead goes to the account with the most budget left; its later emails follow it
+    assert [(r["lead_id"], r["account_id"]) for r in rows] == [
+        (leads[0], "a"), (leads[0], "a"), (leads[1], "b"), (leads[2], "a"), (leads[3], "b"),
+    ]
+    stuck = {r["id"]: r["sender_account"] for r in db.query("SELECT id, sender_account FROM leads")}
+    assert stuck == {leads[0]: "a", leads[1]: "b", leads[2]: "a", leads[3]: "b", leads[4]: None, leads[5]: None}
+    db.finish_emails("w", [(r["id"], "sent", None) for r in rows])
+
+    # nothing is claimed while every account is spent, and a lead stuck on a spent account waits
+    assert db.claim_due_emails("w", budgets={"a": 0, "b": 0}) == []
+    db.execute("UPDATE leads SET sender_account='c' WHERE id=?", (leads[5],))
+    rows = db.claim_due_emails("w", budgets={"a": 5, "c": 0})
+    assert [(r["lead_id"], r["account_id"]) for r in rows] == [(leads[4], "a")]
+
+
+def test_next_quota_reset():
+    now = datetime(2024, 3, 1, 10, 59, 30, tzinfo=timezone.utc).timestamp()
+    assert next_quota_reset(now) == datetime(2024, 3, 1, 11, tzinfo=timezone.utc).timestamp()
+    assert next_quota_reset(next_quota_reset(now)) == next_quota_reset(now) + 3600
+
+
+def test_account_ids_must_be_unique():
+    s = Settings()
+    s.SMTP_ACCOUNTS = json.dumps([{"username": "x@acme.com"}, {"id": "x@acme.com"}])
+    with pytest.raises(ValueError):
+        load_accounts(s)
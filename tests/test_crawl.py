@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.servers import CompanySites, company_domain, company_host
+from salesactivator.enrich.website import WebsiteEnricher
+from salesactivator.utils.cache import ResponseCache
+from salesactivator.utils.http import Http
+
+
+@pytest.fixture
+def sites():
+    sites = CompanySites(filler_kb=1)
+    port = sites.start()
+    yield sites, port
+    sites.stop()
+
+
+def test_cache_hits_are_not_requests(sites, tmp_path):
+    sites, port = sites
+    url = f"http://{company_host(0)}:{port}"
+    http = Http("test", delay=0, max_requests_per_domain=6, cache=ResponseCache(str(tmp_path / "cache.db")))
+    enricher = WebsiteEnricher(http)
+    first = enricher.enrich(url)
+    assert first["requests"] == sites.requests > 0
+    assert f"sales@{company_domain(0)}" in first["emails"]
+    # the same crawl again is served from the fresh cache: no network, no budget, no requests
+    again = enricher.enrich(url)
+    assert again["requests"] == 0
+    assert sites.requests == first["requests"]
+    assert http.remaining(url) == 6 - first["requests"]
+    assert sorted(again["emails"]) == sorted(first["emails"])
+
+
+def test_async_crawl_counts_the_same(sites, tmp_path):
+    sites, port = sites
+    urls = [f"http://{company_host(i)}:{port}" for i in range(3)]
+    http = Http("test", delay=0, cache=ResponseCache(str(tmp_path / "cache.db")))
+    enricher = WebsiteEnricher(http)
+    first = enricher.enrich_many(urls, concurrency=3)
+    assert sum(r["requests"] for r in first) == sites.requests
+    assert [r["requests"] for r in enricher.enrich_many(urls, concurrency=3)] == [0, 0, 0]
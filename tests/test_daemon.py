@@ -0,0 +1,72 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from salesactivator.db.store import DB
+from salesactivator.emailer.daemon import SendDaemon
+
+
+class FlakySender:
+    # stands in for EmailSender: the first send_due() fails like a database locked by `compact`
+    worker_id = "test"
+    last_claimed = 0
+    last_retries = []
+    last_budgets = None
+
+    def __init__(self, db):
+        self.db = db
+        self.calls = 0
+        self.closed = False
+
+    def send_due(self, db, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise sqlite3.OperationalError("database is locked")
+        rows = db.claim_due_emails(self.worker_id, limit=kwargs["limit"])
+        db.finish_emails(self.worker_id, [(r["id"], "sent", None) for r in rows])
+        self.last_claimed = len(rows)
+        return len(rows)
+
+    def pacing(self):
+        return {}
+
+    def close_idle(self, max_idle):
+        return None
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    company = db.upsert_company("Acme", "https://acme.com")
+    lead = db.add_lead(company, db.add_contact(company, "Ann", email="ann@acme.com"))
+    db.schedule_email(lead, 1, "Hi", "Body", "2000-01-01 00:00:00")
+    return db
+
+
+def test_errors_do_not_stop_the_daemon(db, tmp_path):
+    status_path = str(tmp_path / "status.json")
+    sender = FlakySender(db)
+    daemon = SendDaemon(db, sender, poll=0.05, status_path=status_path)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    try:
+        for _ in range(100):
+            if daemon.sent:
+                break
+            thread.join(0.05)
+        assert thread.is_alive()
+    finally:
+        daemon.stop.set()
+        thread.join(5)
+    assert not thread.is_alive() and sender.closed
+    assert daemon.sent == 1 and daemon.errors == 1
+    with open(status_path, encoding="utf-8") as f:
+        status = json.load(f)
+    assert status["errors"] == 1 and "database is locked" in status["last_error"]
+    assert status["stopping"] is True
@@ -0,0 +1,39 @@
+import pytest
+
+from salesactivator.utils import domains
+from salesactivator.utils.domains import domain_key
+
+CASES = [
+    ("https://WWW.Events.Acme.co.uk:443/contact?utm_source=x", "acme.co.uk"),
+    ("www.acme.com", "acme.com"),
+    ("http://shop.acme.com/contact", "acme.com"),
+    ("https://acme.wixsite.com/events", "acme.wixsite.com"),
+    ("foo.github.io", "foo.github.io"),
+    ("https://x.squarespace.com", "x.squarespace.com"),
+    ("https://x.business.site", "x.business.site"),
+    ("https://acme-events.myshopify.com", "acme-events.myshopify.com"),
+    ("https://acme.wordpress.com/about", "acme.wordpress.com"),
+    ("http://acme.blogspot.com", "acme.blogspot.com"),
+    ("https://wixsite.com", "wixsite.com"),
+    ("http://192.168.0.10:8080/", "192.168.0.10"),
+    ("", ""),
+]
+
+
+@pytest.fixture(params=["default", "builtin"])
+def suffixes(request, monkeypatch):
+    # "builtin" is the fallback used when tldextract is not installed
+    if request.param == "builtin":
+        monkeypatch.setattr(domains, "_TLD", None)
+    domain_key.cache_clear()
+    yield
+    domain_key.cache_clear()
+
+
+@pytest.mark.parametrize("url, key", CASES)
+def test_domain_key(suffixes, url, key):
+    assert domain_key(url) == key
+
+
+def test_platform_sites_stay_apart(suffixes):
+    assert domain_key("https://acme.wixsite.com") != domain_key("https://other.wixsite.com")
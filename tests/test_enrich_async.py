@@ -0,0 +1,75 @@
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+from benchmarks.servers import CompanySites, company_domain, company_host, company_index
+from salesactivator.enrich.website import WebsiteEnricher
+
+
+class SlowHttp:
+    # serves CompanySites pages without a network, taking `latency` per fetch, and records how
+    # many fetches were in flight overall and per host
+    def __init__(self, latency=0.02, broken=()):
+        self.sites = CompanySites(filler_kb=1)
+        self.session = SimpleNamespace(headers={"User-Agent": "test"})
+        self.latency = latency
+        self.broken = set(broken)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.peak_total = 0
+        self.peak_per_host = 0
+
+    def remaining(self, url):
+        return None
+
+    def fetch(self, url, timeout=15, content_types=()):
+        p = urlparse(url)
+        if p.hostname in self.broken:
+            raise RuntimeError("parser crashed")
+        with self.lock:
+            self.in_flight[p.hostname] = self.in_flight.get(p.hostname, 0) + 1
+            self.peak_per_host = max(self.peak_per_host, self.in_flight[p.hostname])
+            self.peak_total = max(self.peak_total, sum(self.in_flight.values()))
+        try:
+            time.sleep(self.latency)
+            page = self.sites.page(company_index(p.hostname), p.path or "/")
+        finally:
+            with self.lock:
+                self.in_flight[p.hostname] -= 1
+        if page is None:
+            return None, True
+        body, _ = page
+        return SimpleNamespace(content=body, text=body.decode()), True
+
+
+def urls(n):
+    return [f"http://{company_host(i)}" for i in range(n)]
+
+
+def comparable(info):
+    return sorted(info["emails"]), sorted(info["phones"]), info["title"], info["requests"], info["content_hash"]
+
+
+@pytest.mark.parametrize("concurrency", [2, 8])
+def test_enrich_many_matches_sequential(concurrency):
+    sequential = WebsiteEnricher(SlowHttp(latency=0))
+    expected = [comparable(sequential.enrich(u)) for u in urls(6)]
+    http = SlowHttp()
+    finished = []
+    results = WebsiteEnricher(http).enrich_many(urls(6), concurrency=concurrency, on_result=lambda i, info: finished.append(i))
+    assert [comparable(r) for r in results] == expected
+    assert f"sales@{company_domain(0)}" in results[0]["emails"]
+    assert sorted(finished) == list(range(6))
+    assert http.peak_per_host == 1  # one request at a time per site
+    assert 1 < http.peak_total <= concurrency
+
+
+def test_failed_site_does_not_stop_the_others():
+    http = SlowHttp(broken={company_host(1)})
+    finished = {}
+    results = WebsiteEnricher(http).enrich_many(urls(3), concurrency=3, on_result=finished.__setitem__)
+    assert results[1] == {} and results[0] and results[2]
+    assert finished == dict(enumerate(results))
@@ -0,0 +1,130 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from salesactivator.utils.metrics import LATENCY_BUCKETS, Histogram, Metrics, stmt_label
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+def test_histogram_quantiles():
+    h = Histogram()
+    for v in [0.002] * 90 + [0.3] * 9 + [42.0]:
+        h.observe(v)
+    assert h.count == 100 and h.max == 42.0
+    assert h.quantile(0.5) == 0.0025
+    assert h.quantile(0.95) == 0.5
+    assert h.quantile(1.0) == 42.0  # past the last bound: the observed max
+    assert h.counts[-1] == 1 and len(h.counts) == len(LATENCY_BUCKETS) + 1
+
+
+def test_labels_are_series(metrics):
+    metrics.inc("http_requests_total", host="a.com")
+    metrics.inc("http_requests_total", 2, host="a.com")
+    metrics.inc("http_requests_total", host="b.com", status=200)
+    assert metrics.counters == {
+        ("http_requests_total", (("host", "a.com"),)): 3,
+        ("http_requests_total", (("host", "b.com"), ("status", "200"))): 1,
+    }
+
+
+def test_timer_and_timed_record_on_error(metrics):
+    @metrics.timed("db_op_seconds", op="claim")
+    def claim(fail):
+        if fail:
+            raise RuntimeError("locked")
+
+    claim(False)
+    with pytest.raises(RuntimeError):
+        claim(True)
+    with metrics.timer("parse_seconds"):
+        pass
+    assert metrics.histograms[("db_op_seconds", (("op", "claim"),))].count == 2
+    assert metrics.histograms[("parse_seconds", ())].count == 1
+
+
+def test_concurrent_increments(metrics):
+    def work():
+        for _ in range(1000):
+            metrics.inc("n")
+            metrics.observe("t", 0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert metrics.counters[("n", ())] == 8000
+    assert metrics.histograms[("t", ())].count == 8000
+
+
+def test_summary_groups_by_stage(metrics):
+    metrics.inc("email_results_total", 3, status="sent")
+    metrics.inc("email_results_total", status="failed")
+    metrics.observe("http_fetch_seconds", 0.2, host="a.com")
+    metrics.observe("http_fetch_seconds", 0.4, host="b.com")
+    lines = metrics.summary()
+    assert lines[0].startswith("-- metrics (")
+    assert lines.index("[email]") < lines.index("[http]")
+    email = next(line for line in lines if "email_results_total" in line)
+    assert email.split()[1] == "4" and "status=sent=3" in email
+    http = lines.index("[http]")
+    assert "n=2" in lines[http + 1] and "total=0.600s" in lines[http + 1]
+    assert lines[http + 2].strip().startswith("top: host=b.com 0.400s/1")
+
+
+def test_prometheus_text(metrics):
+    metrics.inc("emails_total", status='say "hi"\n')
+    metrics.observe("smtp_send_seconds", 0.02)
+    metrics.observe("smtp_send_seconds", 3.0)
+    text = metrics.to_prometheus()
+    assert '# TYPE salesactivator_emails_total counter\nsalesactivator_emails_total{status="say \\"hi\\"\\n"} 1\n' in text
+    assert 'salesactivator_smtp_send_seconds_bucket{le="0.01"} 0\n' in text
+    assert 'salesactivator_smtp_send_seconds_bucket{le="0.025"} 1\n' in text
+    assert 'salesactivator_smtp_send_seconds_bucket{le="+Inf"} 2\n' in text  # cumulative
+    assert "salesactivator_smtp_send_seconds_count 2\n" in text
+
+
+@pytest.mark.parametrize("name", ["metrics.json", "metrics.prom"])
+def test_write(metrics, tmp_path, name):
+    metrics.inc("emails_total")
+    path = str(tmp_path / name)
+    metrics.write(path)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if name.endswith(".json"):
+        assert json.loads(text)["counters"] == [{"name": "emails_total", "labels": {}, "value": 1}]
+    else:
+        assert text == metrics.to_prometheus()
+    assert os.listdir(tmp_path) == [name]
+
+
+def test_stmt_label():
+    sql = """SELECT id FROM contacts
+             WHERE company_id IN (?,?,?) AND x=?"""
+    assert stmt_label(sql) == "SELECT id FROM contacts WHERE company_id IN (...) AND x=?"
+    assert len(stmt_label("SELECT " + "x, " * 100)) == 60
+
+
+@pytest.mark.parametrize("profile, ext", [("cpu", "prof"), ("mem", "tracemalloc")])
+def test_cli_profile_and_metrics_out(tmp_path, profile, ext):
+    env = dict(os.environ, DB_PATH=str(tmp_path / "x.db"), METRICS_PATH="")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH")) if p)
+    out, prof = str(tmp_path / "metrics.json"), str(tmp_path / f"run.{ext}")
+    r = subprocess.run(
+        [sys.executable, "-m", "salesactivator.cli", "--profile", profile, "--profile-out", prof, "--metrics-out", out, "init-db"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    assert os.path.getsize(prof) > 0
+    assert f"saved to {prof}" in r.stderr
+    with open(out, encoding="utf-8") as f:
+        assert "counters" in json.load(f)
@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+from salesactivator.db import migrations
+from salesactivator.db.migrations import MIGRATIONS, SCHEMA_VERSION, migrate, pending, schema_version
+from salesactivator.db.store import DB
+from salesactivator.utils.domains import domain_key
+
+# the schema DB.init() created before migrations were versioned (user_version 0)
+BASELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    website TEXT,
+    city TEXT,
+    state TEXT,
+    country TEXT,
+    source TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_website ON companies(website);
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    full_name TEXT,
+    role TEXT,
+    email TEXT,
+    phone TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id);
+CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts(email);
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE,
+    contact_id INTEGER REFERENCES contacts(id) ON DELETE SET NULL,
+    status TEXT DEFAULT 'new',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_leads_company ON leads(company_id);
+CREATE TABLE IF NOT EXISTS email_queue (
+    id INTEGER PRIMARY KEY,
+    lead_id INTEGER REFERENCES leads(id) ON DELETE CASCADE,
+    step INTEGER,
+    subject TEXT,
+    body TEXT,
+    status TEXT DEFAULT 'scheduled',
+    scheduled_at TIMESTAMP,
+    last_attempt_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_queue_scheduled ON email_queue(status, scheduled_at);
+"""
+
+WEBSITES = ["https://acme.com", "https://www.acme.com", "https://acme.wixsite.com/events", None]
+
+
+def schema(path):
+    # table -> column names, and index names, as sqlite_master describes them
+    con = sqlite3.connect(path)
+    tables = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    columns = {t: sorted(r[1] for r in con.execute(f"PRAGMA table_info({t})")) for t in tables}
+    indexes = sorted(r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"))
+    con.close()
+    return columns, indexes
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = str(tmp_path / "old.db")
+    con = sqlite3.connect(path)
+    con.executescript(BASELINE_SCHEMA)
+    con.executemany("INSERT INTO companies(name, website) VALUES(?, ?)", [(f"C{i}", w) for i, w in enumerate(WEBSITES)])
+    con.execute("INSERT INTO contacts(company_id, full_name, email) VALUES(1, 'Ann', 'ann@acme.com')")
+    con.execute("INSERT INTO leads(company_id, contact_id, status) VALUES(1, 1, 'active')")
+    con.execute("INSERT INTO email_queue(lead_id, step, subject, body, scheduled_at) VALUES(1, 1, 'Hi', 'Body', '2000-01-01')")
+    con.commit()
+    con.close()
+    return path
+
+
+def test_baseline_upgrades_to_latest(baseline, tmp_path):
+    db = DB(baseline)
+    assert schema_version(db.connect()) == 0
+    assert [v for v, _ in db.init()] == [v for v, _, _ in MIGRATIONS]
+    assert schema_version(db.connect()) == SCHEMA_VERSION == 13
+    assert db.init() == [] and pending(db.connect()) == []
+
+    fresh = DB(str(tmp_path / "new.db"))
+    fresh.init()
+    assert schema(baseline) == schema(fresh.path)
+
+    # rows survive, new columns get their defaults and domain keys are backfilled
+    companies = db.query("SELECT website, domain_key FROM companies ORDER BY id")
+    assert [c["website"] for c in companies] == WEBSITES
+    assert [c["domain_key"] for c in companies] == [domain_key(w or "") or None for w in WEBSITES]
+    assert companies[0]["domain_key"] == companies[1]["domain_key"] != companies[2]["domain_key"]
+    lead = db.query("SELECT status, sender_account, archived_emails FROM leads")[0]
+    assert lead == {"status": "active", "sender_account": None, "archived_emails": 0}
+    queued = db.query("SELECT subject, status, attempts, claimed_by, template_id FROM email_queue")[0]
+    assert queued == {"subject": "Hi", "status": "scheduled", "attempts": 0, "claimed_by": None, "template_id": None}
+    assert db.claim_due_emails("w")[0]["to_email"] == "ann@acme.com"
+
+
+def test_partly_migrated_database_resumes(baseline, monkeypatch):
+    con = sqlite3.connect(baseline, isolation_level=None)
+    applied = [(v, name) for v, name, _ in MIGRATIONS]
+    with monkeypatch.context() as m:
+        m.setattr(migrations, "MIGRATIONS", MIGRATIONS[:5])  # a release that stopped at version 5
+        assert migrate(con) == applied[:5]
+    assert pending(con) == applied[5:]
+    assert migrate(con) == applied[5:]
+    assert schema_version(con) == SCHEMA_VERSION
+    con.close()
+
+
+def test_failed_migration_rolls_back(baseline, monkeypatch):
+    def broken(con):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    con = sqlite3.connect(baseline, isolation_level=None)
+    steps = list(MIGRATIONS)
+    version, name, first = steps[1]
+    steps[1] = (version, name, first + (broken,))
+    monkeypatch.setattr(migrations, "MIGRATIONS", steps)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(con)
+    assert schema_version(con) == 1 and not con.in_transaction
+    assert "claimed_by" not in {r[1] for r in con.execute("PRAGMA table_info(email_queue)")}
+    con.close()
+
@@ -0,0 +1,57 @@
+import hashlib
+import threading
+
+import pytest
+
+from salesactivator.enrich.pipeline import EnrichPipeline
+from salesactivator.enrich.website import WebsiteEnricher
+
+
+class OfflinePipeline(EnrichPipeline):
+    # one saved page per site instead of a crawl
+    def _fetch(self, website):
+        html = f"<html><head><title>{website}</title></head><body>sales@{website} +1 312 555 0199</body></html>"
+        return f"https://{website}", [(f"https://{website}", html, hashlib.sha1(html.encode()).hexdigest())], 1
+
+
+SITES = [f"site{i}.com" for i in range(20)]
+
+
+def run_in_thread(pipeline, on_result, timeout=60):
+    errors = []
+
+    def target():
+        try:
+            pipeline.run(SITES, on_result=on_result)
+        except BaseException as e:
+            errors.append(e)
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), "pipeline hung"
+    return errors
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return OfflinePipeline(WebsiteEnricher(None), fetchers=4, parsers=2, queue_size=2)
+
+
+def test_every_site_reaches_the_writer(pipeline):
+    results = {}
+    assert run_in_thread(pipeline, lambda i, info: results.__setitem__(i, info)) == []
+    assert sorted(results) == list(range(len(SITES)))
+    assert all(f"sales@{SITES[i]}" in info["emails"] for i, info in results.items())
+
+
+def test_writer_error_stops_results(pipeline):
+    calls = []
+
+    def on_result(i, info):
+        calls.append(i)
+        raise RuntimeError("database is locked")
+
+    errors = run_in_thread(pipeline, on_result)
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert len(calls) == 1
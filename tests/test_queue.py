@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from salesactivator.db.store import DB
+
+PAST = "2000-01-01 00:00:00"
+FUTURE = "2999-01-01 00:00:00"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    return db
+
+
+def schedule(db, n, when=PAST):
+    ids = []
+    for i in range(n):
+        company = db.upsert_company(f"C{i}", f"https://c{i}-{when[:4]}.com")
+        lead = db.add_lead(company, db.add_contact(company, "Ann", email=f"ann@c{i}.com"))
+        ids.append(db.schedule_email(lead, 1, "Hi", "Body", when))
+    return ids
+
+
+def row(db, qid):
+    return db.query("SELECT status, claimed_by, attempts, last_error FROM email_queue WHERE id=?", (qid,))[0]
+
+
+def expire_leases(db):
+    db.execute("UPDATE email_queue SET claimed_until=? WHERE status='sending'", (PAST,))
+
+
+def test_claims_are_disjoint(db):
+    due = schedule(db, 3)
+    schedule(db, 1, FUTURE)
+    a = db.claim_due_emails("a", limit=2)
+    b = db.claim_due_emails("b", limit=10)
+    assert [r["id"] for r in a] == due[:2] and [r["id"] for r in b] == due[2:]
+    assert a[0]["to_email"] == "ann@c0.com"
+    assert db.claim_due_emails("c") == []  # leases still held, the future row is not due
+
+
+def test_concurrent_claims_never_overlap(tmp_path):
+    path = str(tmp_path / "test.db")
+    db = DB(path)
+    db.init()
+    due = schedule(db, 60)
+    claimed = {}
+
+    def worker(name):
+        own = DB(path)  # a separate connection per sender, like separate processes
+        got = []
+        while True:
+            rows = own.claim_due_emails(name, limit=3)
+            if not rows:
+                break
+            got.extend(r["id"] for r in rows)
+            own.finish_emails(name, [(r["id"], "sent", None) for r in rows])
+        claimed[name] = got
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = [qid for got in claimed.values() for qid in got]
+    assert sorted(ids) == due  # every row claimed exactly once
+    assert db.query("SELECT COUNT(*) AS n FROM email_queue WHERE status='sent' AND attempts=1")[0]["n"] == len(due)
+
+
+def test_expired_lease_is_reclaimed_and_old_worker_cannot_finish(db):
+    (qid,) = schedule(db, 1)
+    assert [r["id"] for r in db.claim_due_emails("a")] == [qid]
+    expire_leases(db)
+    assert [r["id"] for r in db.claim_due_emails("b")] == [qid]
+    db.finish_emails("a", [(qid, "failed", "too late")])
+    db.retry_emails("a", [(qid, 60, True, "too late")])
+    assert row(db, qid) == {"status": "sending", "claimed_by": "b", "attempts": 0, "last_error": None}
+    db.finish_emails("b", [(qid, "sent", None)])
+    assert row(db, qid) == {"status": "sent", "claimed_by": None, "attempts": 1, "last_error": None}
+    expire_leases(db)
+    assert db.claim_due_emails("c") == []
+
+
+def test_retry_reschedules(db):
+    (qid,) = schedule(db, 1)
+    db.claim_due_emails("a")
+    db.retry_emails("a", [(qid, 3600, True, "421 busy")])
+    assert row(db, qid) == {"status": "scheduled", "claimed_by": None, "attempts": 1, "last_error": "421 busy"}
+    assert db.claim_due_emails("a") == []  # not due for another hour
+    db.execute("UPDATE email_queue SET scheduled_at=? WHERE id=?", (PAST, qid))
+    db.claim_due_emails("a")
+    db.retry_emails("a", [(qid, 0, False, None)])  # deferred before an attempt
+    assert row(db, qid) == {"status": "scheduled", "claimed_by": None, "attempts": 1, "last_error": "421 busy"}
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from salesactivator.db import queries
+from salesactivator.db.retention import HISTORY_VIEW, compact_queue
+from salesactivator.db.store import DB
+
+OLD = "2024-01-15 10:00:00"
+OLDER = "2023-12-31 23:00:00"
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    return db
+
+
+def queue(db, rows):
+    # rows: (lead, status, last_attempt_at); returns their queue ids
+    ids = []
+    for lead, status, attempted in rows:
+        qid = db.schedule_email(lead, 1, "Hi", "Body", OLDER)
+        db.execute("UPDATE email_queue SET status=?, last_attempt_at=?, attempts=1 WHERE id=?", (status, attempted, qid))
+        ids.append(qid)
+    return ids
+
+
+def archived(path):
+    con = sqlite3.connect(path)
+    con.row_factory = sqlite3.Row
+    rows = [dict(r) for r in con.execute(f"SELECT id, lead_id, status, subject, attempts FROM {HISTORY_VIEW} ORDER BY id")]
+    tables = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    con.close()
+    return rows, tables
+
+
+def test_compact_round_trip(db, tmp_path):
+    archive = str(tmp_path / "archive" / "queue.db")
+    c = db.upsert_company("Acme", "https://acme.com")
+    a, b = db.add_lead(c), db.add_lead(c)
+    old = queue(db, [(a, "sent", OLD), (a, "failed", OLDER), (b, "skipped", OLD), (b, "sent", OLD)])
+    keep = queue(db, [(a, "scheduled", None), (b, "sent", "2999-01-01 00:00:00")])
+    newest = queue(db, [(a, "sent", OLD)])  # the newest id always stays, ids must keep growing
+
+    before = {r["id"]: r for r in db.query("SELECT id, lead_id, status, subject, attempts FROM email_queue")}
+    summary = compact_queue(db, archive, retention_days=30, batch_size=2)
+    assert summary["archived"] == 4
+    assert summary["by_month"] == {"2023-12": 1, "2024-01": 3}
+
+    assert sorted(r["id"] for r in db.query("SELECT id FROM email_queue")) == keep + newest
+    rows, tables = archived(archive)
+    assert rows == [before[qid] for qid in old]
+    assert tables == ["email_queue_2023_12", "email_queue_2024_01"]
+
+    history = {(r["day"], r["status"]): r["emails"] for r in db.query("SELECT day, status, emails FROM queue_history")}
+    assert history == {("2024-01-15", "sent"): 2, ("2023-12-31", "failed"): 1, ("2024-01-15", "skipped"): 1}
+    assert {r["status"]: r["n"] for r in db.query(queries.ARCHIVED_COUNTS)} == {"sent": 2, "failed": 1, "skipped": 1}
+    assert [r["archived_emails"] for r in db.query("SELECT archived_emails FROM leads ORDER BY id")] == [2, 2]
+
+    # a second pass finds nothing new; rows that finish later join the same archive
+    assert compact_queue(db, archive, retention_days=30)["archived"] == 0
+    later = queue(db, [(b, "failed", OLD)])
+    assert compact_queue(db, archive, retention_days=30)["archived"] == 1
+    assert [r["id"] for r in archived(archive)[0]] == old + newest
+    assert later[0] in [r["id"] for r in db.query("SELECT id FROM email_queue")]
+    assert sum(r["n"] for r in db.query(queries.ARCHIVED_COUNTS)) == 5
+
+
+def test_rerun_after_a_crash_between_copy_and_delete(db, tmp_path):
+    archive = str(tmp_path / "queue.db")
+    c = db.upsert_company("Acme", "https://acme.com")
+    lead = db.add_lead(c)
+    done, copied, _ = queue(db, [(lead, "sent", OLD), (lead, "sent", OLD), (lead, "scheduled", None)])
+    db.execute("UPDATE email_queue SET status='scheduled' WHERE id=?", (copied,))
+    compact_queue(db, archive, retention_days=30)
+    # the copy of `copied` was committed, then the process died before deleting it from the queue
+    db.execute("UPDATE email_queue SET status='sent' WHERE id=?", (copied,))
+    con = sqlite3.connect(archive)
+    con.execute("INSERT INTO email_queue_2024_01 (id, lead_id, status, subject, attempts) VALUES(?, ?, 'sent', 'Hi', 1)", (copied, lead))
+    con.commit()
+    con.close()
+    assert compact_queue(db, archive, retention_days=30)["archived"] == 1
+    assert [r["id"] for r in archived(archive)[0]] == [done, copied]
+    assert db.query("SELECT emails FROM queue_history")[0]["emails"] == 2
+    assert db.query("SELECT archived_emails FROM leads")[0]["archived_emails"] == 2
+
+
+def test_unknown_vacuum_mode(db, tmp_path):
+    with pytest.raises(ValueError):
+        compact_queue(db, str(tmp_path / "queue.db"), retention_days=30, vacuum="sometimes")
+
+
+@pytest.mark.parametrize("mode", ["full", "incremental"])
+def test_vacuum(db, tmp_path, mode):
+    summary = compact_queue(db, str(tmp_path / "queue.db"), retention_days=30, vacuum=mode)
+    assert summary["archived"] == 0
+    assert (summary["vacuum_note"] is None) == (mode == "full")
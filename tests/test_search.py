@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from salesactivator.scrapers import search
+from salesactivator.scrapers.search import SearchCheckpoint, iter_mice_companies
+
+QUERIES = ["q1", "q2", "q3"]
+
+
+@pytest.fixture
+def fake_search(monkeypatch):
+    # every query returns three results of its own; queries in `failing` give up like a rate limit
+    calls = []
+    failing = set()
+
+    def run_query(q, per_q, budget, stop):
+        calls.append(q)
+        if q in failing:
+            return None
+        return [{"title": q, "href": f"https://{q}-{i}.com", "body": "", "source": q} for i in range(3)]
+
+    monkeypatch.setattr(search, "_run_query", run_query)
+    return calls, failing
+
+
+def test_limited_run_removes_checkpoint(tmp_path, fake_search):
+    path = str(tmp_path / "checkpoint.json")
+    results = list(iter_mice_companies(limit=4, queries=QUERIES, workers=1, delay=0, checkpoint_path=path))
+    assert len(results) == 4
+    assert not os.path.exists(path)
+
+
+def test_rate_limited_run_resumes(tmp_path, fake_search):
+    calls, failing = fake_search
+    path = str(tmp_path / "checkpoint.json")
+    failing.add("q2")
+    assert len(list(iter_mice_companies(limit=100, queries=QUERIES, workers=1, delay=0, checkpoint_path=path))) == 6
+    assert SearchCheckpoint(path).done == {"q1", "q3"}
+    failing.clear()
+    calls.clear()
+    assert [r["source"] for r in iter_mice_companies(limit=100, queries=QUERIES, workers=1, delay=0, checkpoint_path=path)] == ["q2"] * 3
+    assert calls == ["q2"]
+    assert not os.path.exists(path)
@@ -0,0 +1,41 @@
+import smtplib
+import socket
+
+import pytest
+
+from salesactivator.emailer.sender import classify_error, retry_delay
+
+
+@pytest.mark.parametrize("error, transient, throttled", [
+    (smtplib.SMTPServerDisconnected("Connection unexpectedly closed"), True, False),
+    (socket.timeout("timed out"), True, False),
+    (ConnectionRefusedError(111, "Connection refused"), True, False),
+    (smtplib.SMTPResponseException(421, b"4.7.0 Try again later, closing connection."), True, True),
+    (smtplib.SMTPResponseException(450, b"4.2.1 The user you are trying to contact is receiving mail too quickly"), True, True),
+    (smtplib.SMTPResponseException(451, b"4.3.0 Mail server temporarily rejected message."), True, False),
+    (smtplib.SMTPResponseException(452, b"Too many recipients, try again later"), True, True),
+    (smtplib.SMTPDataError(550, b"5.7.28 Our system has detected an unusual rate of unsolicited mail"), True, True),
+    (smtplib.SMTPDataError(550, b"5.1.1 The email account that you tried to reach does not exist."), False, False),
+    (smtplib.SMTPDataError(552, b"5.3.4 Message size limit exceeded, try again later"), False, False),
+    (smtplib.SMTPRecipientsRefused({"a@acme.com": (550, b"5.7.1 Rejected by corporate policy")}), False, False),
+    (smtplib.SMTPRecipientsRefused({"a@acme.com": (451, b"4.7.1 Greylisted, please retry")}), True, False),
+    (smtplib.SMTPAuthenticationError(535, b"5.7.8 Username and Password not accepted."), False, False),
+    (ValueError("bad address"), False, False),
+])
+def test_classify_error(error, transient, throttled):
+    got_transient, got_throttled, text = classify_error(error)
+    assert (got_transient, got_throttled) == (transient, throttled)
+    assert text and len(text) <= 200
+
+
+def test_classify_error_text():
+    assert classify_error(smtplib.SMTPDataError(550, b"5.1.1 No such user"))[2] == "550 5.1.1 No such user"
+    assert classify_error(smtplib.SMTPDataError(550, b"x" * 500))[2] == "550 " + "x" * 196
+
+
+@pytest.mark.parametrize("attempts", range(12))
+def test_retry_delay_bounds(attempts):
+    expected = min(3600, 60 * 2 ** attempts)
+    delays = [retry_delay(attempts, 60, 3600) for _ in range(50)]
+    assert all(expected / 2 <= d <= expected for d in delays)
+    assert len(set(delays)) > 1  # jittered
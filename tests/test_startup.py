@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.startup import forbidden_imports, run_once
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# generous for shared CI machines; benchmarks/startup.py reports the actual median
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1500"))
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    path = tmp_path_factory.mktemp("startup")
+    env = dict(os.environ, DB_PATH=str(path / "startup.db"), METRICS_PATH="", DAEMON_STATUS_PATH="")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (ROOT, env.get("PYTHONPATH")) if p)
+    subprocess.run([sys.executable, "-m", "salesactivator.cli", "--no-summary", "init-db"], env=env, check=True, capture_output=True)
+    return env
+
+
+@pytest.mark.parametrize("cmd", ["send --dry-run", "init-db", "db-doctor --no-migrate"])
+def test_cold_start(env, cmd):
+    run_once(cmd, env)  # warm the OS file cache
+    elapsed, modules = min((run_once(cmd, env) for _ in range(3)), key=lambda r: r[0])
+    names = {m for m, _, _ in modules}
+    assert "salesactivator.cli" in names or "salesactivator.db.store" in names  # -X importtime output was parsed
+    assert forbidden_imports(cmd, modules) == []
+    assert not {"requests", "bs4", "lxml", "pandas", "smtplib"} & {m.split(".")[0] for m in names}
+    assert 1000 * elapsed <= BUDGET_MS
+
+
+def test_sender_only_for_sending_commands():
+    modules = [("salesactivator.emailer.sender", 1, 0), ("smtplib", 1, 1)]
+    assert forbidden_imports("send --dry-run", modules) == ["smtplib"]
+    assert forbidden_imports("init-db", modules) == ["salesactivator.emailer.sender", "smtplib"]
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from salesactivator.db.store import DB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    return db
+
+
+def companies(db, n):
+    return db.upsert_companies({"name": f"C{i}", "website": f"https://c{i}.com"} for i in range(n))
+
+
+def test_add_contacts_ids_follow_input_rows(db):
+    c1, c2 = companies(db, 2)
+    existing = db.add_contact(c1, "Ann", email="ann@c0.com")
+    old_nameless = db.add_contact(c2, "Front Desk")
+    rows = [
+        {"company_id": c1, "full_name": "Bob", "email": "bob@c0.com"},
+        {"company_id": c1, "full_name": "Ann again", "email": "ann@c0.com"},
+        {"company_id": c2, "full_name": "Front Desk"},
+        {"company_id": c2, "full_name": "Night Desk"},
+        {"company_id": c1, "full_name": "Night Desk"},
+        {"company_id": c1, "full_name": "Bob", "email": "bob@c0.com"},
+        {"company_id": c2, "full_name": "Night Desk"},
+    ]
+    ids = db.add_contacts(rows, chunk_size=4)
+    assert ids[1] == existing and ids[2] == old_nameless
+    assert ids[0] == ids[5] and ids[3] == ids[6]
+    assert len({ids[0], ids[3], ids[4]}) == 3
+    for r, cid in zip(rows, ids):
+        got = db.query("SELECT company_id, full_name, email FROM contacts WHERE id=?", (cid,))[0]
+        assert (got["company_id"], got["email"]) == (r["company_id"], r.get("email"))
+        if not r.get("email"):
+            assert got["full_name"] == r["full_name"]
+    assert db.query("SELECT COUNT(*) AS n FROM contacts")[0]["n"] == 5
+    assert db.add_contacts(rows) == ids  # a second run inserts nothing
+
+
+def test_add_leads_ids_follow_input_rows(db):
+    ids_c = companies(db, 3)
+    db.add_lead(ids_c[0])
+    rows = [{"company_id": ids_c[i % 3], "status": s} for i, s in enumerate(["new", "enriched", "new", "new", None])]
+    ids = db.add_leads(rows, chunk_size=2)
+    assert len(set(ids)) == len(rows)
+    for r, lead_id in zip(rows, ids):
+        got = db.query("SELECT company_id, status FROM leads WHERE id=?", (lead_id,))[0]
+        assert got == {"company_id": r["company_id"], "status": r["status"] or "new"}
+
+
+def test_upsert_leads_one_per_company(db):
+    c1, c2 = companies(db, 2)
+    first = db.add_lead(c1, status="contacted")
+    ids = db.upsert_leads([{"company_id": c2, "status": "enriched"}, {"company_id": c1, "status": "enriched"}, {"company_id": c2}])
+    assert ids[1] == first and ids[0] == ids[2] != first
+    assert db.query("SELECT status FROM leads WHERE id=?", (first,))[0]["status"] == "contacted"
+    assert db.query("SELECT status FROM leads WHERE id=?", (ids[0],))[0]["status"] == "enriched"
+
+
+@pytest.mark.parametrize("stored_key", [None, "stale-key.example"])
+def test_upsert_companies_website_under_another_key(db, stored_key):
+    # a company keyed under older rules (or without tldextract) still owns its website
+    old = db.upsert_company("Acme", "https://acme.wixsite.com/events")
+    db.execute("UPDATE companies SET domain_key=? WHERE id=?", (stored_key, old))
+    rows = [
+        {"name": "Acme", "website": "https://acme.wixsite.com/events"},
+        {"name": "Acme", "website": "https://acme.wixsite.com/about"},
+        {"name": "Beta", "website": "https://beta.com"},
+        {"name": "No site"},
+    ]
+    ids = db.upsert_companies(rows)
+    assert ids[0] == ids[1] == old
+    assert len(set(ids)) == 3
+    assert db.upsert_companies(rows) == ids
+
+
+def test_failed_commit_rolls_back(db):
+    (company,) = companies(db, 1)
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction() as con:
+            con.execute("PRAGMA defer_foreign_keys=ON")  # the bad row only fails at COMMIT
+            db.add_lead(company)
+            db.add_lead(company + 100)
+    assert not db.connect().in_transaction
+    with db.transaction():
+        lead = db.add_lead(company)
+    assert [r["id"] for r in db.query("SELECT id FROM leads")] == [lead]
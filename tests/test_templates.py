@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from salesactivator.db.store import DB
+from salesactivator.emailer import templates
+from salesactivator.emailer.sender import EmailSender
+from salesactivator.emailer.templates import EmailTemplate, TEMPLATES, template_for_step
+from salesactivator.utils.config import Settings
+
+
+class RecordingSender(EmailSender):
+    # everything but the SMTP conversation
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.sent = []
+
+    def _send(self, to_email, subject, body, account=None):
+        self.sent.append((to_email, subject, body))
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    return db
+
+
+@pytest.fixture
+def lead(db):
+    company = db.upsert_company("Acme Events", "https://acme.com")
+    return db.add_lead(company, db.add_contact(company, "Ann", email="ann@acme.com"))
+
+
+def test_sequence_stores_template_references(db, lead):
+    start = datetime(2024, 3, 1, 9, 30, tzinfo=timezone.utc)
+    RecordingSender(Settings()).create_sequences(db, [{"lead_id": lead, "contact": "Ann", "company": "Acme Events"}], start)
+    rows = db.query("SELECT step, subject, body, template_id, template_version, params, scheduled_at FROM email_queue ORDER BY step")
+    assert [(r["step"], r["scheduled_at"]) for r in rows] == [
+        (1, "2024-03-01 09:30:00"), (2, "2024-03-04 09:30:00"), (3, "2024-03-08 09:30:00"),
+    ]
+    for r in rows:
+        assert r["subject"] is None and r["body"] is None  # rendered at send time
+        assert (r["template_id"], r["template_version"]) == (template_for_step(r["step"]).id, template_for_step(r["step"]).version)
+        assert json.loads(r["params"]) == {"contact_name": "Ann", "company_name": "Acme Events"}
+
+
+def test_send_renders_the_current_template(db, lead, monkeypatch):
+    sender = RecordingSender(Settings())
+    sender.create_sequence(db, lead, "Ann", "Acme Events", datetime(2000, 1, 1, tzinfo=timezone.utc))
+    db.execute("UPDATE email_queue SET scheduled_at='2000-01-01 00:00:00' WHERE step > 1")
+    # the text changed after the rows were queued
+    monkeypatch.setitem(TEMPLATES, "mice_step2", EmailTemplate("mice_step2", 2, "New – {company_name}", "Hi {contact_name}"))
+    assert sender.send_due(db, workers=1) == 3
+    sent = {subject: (to, body) for to, subject, body in sender.sent}
+    assert sent["New – Acme Events"] == ("ann@acme.com", "Hi Ann")
+    assert len(sent) == 3 and all(to == "ann@acme.com" and "Ann" in body for to, body in sent.values())
+    assert {r["status"] for r in db.query("SELECT status FROM email_queue")} == {"sent"}
+
+
+def test_render_rows():
+    sender = RecordingSender(Settings())
+    params = json.dumps({"contact_name": "", "company_name": "Acme"})
+    now = datetime(2024, 8, 1)
+    # rows queued before template references keep their text
+    assert sender.render({"step": 1, "subject": "Old", "body": "Text", "template_id": None}) == ("Old", "Text")
+    subject, body = sender.render({"step": 3, "template_id": "mice_step3", "params": params}, now)
+    assert subject == "Cierro el loop – Acme" and body.startswith("Hola equipo,") and "Q3" in body
+    # a template that was removed falls back to the current one for the step
+    assert sender.render({"step": 3, "template_id": "retired", "params": params}, now) == (subject, body)
+
+
+def test_templates_are_checked_when_defined():
+    with pytest.raises(ValueError, match="first_name"):
+        EmailTemplate("bad", 1, "Hi {first_name}", "")
+    assert templates.render_subject(1, "Acme") == TEMPLATES["mice_step1"].render({"company_name": "Acme"})[0]
@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.text import make_page
+from salesactivator.utils import text
+from salesactivator.utils.text import (
+    DOMAINS_STOPLIST, EMAIL_REGEX, PHONE_REGEX, extract_contacts, is_email_valid, normalize_phone, validate_many,
+)
+
+PAGES = [
+    "Write to sales@acme-events.com or call (312) 555-0199.",
+    "Sales: +1 312.555.0199, events: 312-555-0199, fax +44 20 7946 0958",
+    "Reach Jane at jane.doe+events@mail.acme.co.uk; personal jane@Gmail.com",
+    "order 1234567890123456 ref 2024-01-01 12:00 id@@x.com a@b.c x@host",
+    "info@acme.com,info@acme.com;INFO@acme.com <a href='mailto:team@acme.com'>",
+    "digits in mail: 3125550199@pager.acme.com and 0123@acme.com",
+    "",
+]
+
+
+def per_pattern(page: str):
+    # the two separate scans extract_contacts replaced
+    emails = {e for e in EMAIL_REGEX.findall(page) if not any(e.lower().endswith("@" + d) for d in DOMAINS_STOPLIST)}
+    phones = {normalize_phone(p) for p in PHONE_REGEX.findall(page)} - {None}
+    return emails, phones
+
+
+@pytest.mark.parametrize("page", PAGES + [make_page(i, 600) for i in range(5)])
+def test_single_pass_matches_per_pattern_regexes(page):
+    emails, phones = extract_contacts(page)
+    assert len(emails) == len(set(emails)) and len(phones) == len(set(phones))
+    assert (set(emails), set(phones)) == per_pattern(page)
+
+
+def test_phones_dedupe_as_e164():
+    _, phones = extract_contacts("(312) 555-0199 / +1 312.555.0199 / 312-555-0199 / +44 20 7946 0958")
+    assert sorted(phones) == ["+13125550199", "+442079460958"]
+
+
+def test_digit_runs_that_are_not_phones():
+    assert normalize_phone("2024-01-01") is None
+    assert extract_contacts("order 12345678901234567890")[1] == []
+
+
+def test_email_stoplist():
+    emails, _ = extract_contacts("a@gmail.com b@YAHOO.com c@outlook.com d@hotmail.com e@gmail.company.com f@acme.com")
+    assert sorted(emails) == ["e@gmail.company.com", "f@acme.com"]
+
+
+def test_validate_many_matches_per_item_validation():
+    emails = ["sales@acme.com", "bad@", "x@acme", "first.last@acme.co.uk", "sales@acme.com", "a..b@acme.com"]
+    text.is_email_valid.cache_clear()
+    expected = {e: is_email_valid(e) for e in emails}
+    text.is_email_valid.cache_clear()
+    result = validate_many(emails)
+    assert result == expected
+    assert list(result) == list(dict.fromkeys(emails))
+    assert text.is_email_valid.cache_info().misses == len(result)  # repeats validated once
@@ -0,0 +1,54 @@
+import csv
+
+import pytest
+
+from salesactivator.db import transfer
+from salesactivator.db.store import DB
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DB(str(tmp_path / "test.db"))
+    db.init()
+    acme = db.upsert_company("Acme", "https://acme.com")
+    db.add_lead(acme, db.add_contact(acme, "Front Desk"), status="enriched")
+    beta = db.upsert_company("Beta", "https://beta.com")
+    db.add_lead(beta, db.add_contact(beta, "Ann", email="ann@beta.com"))
+    return db
+
+
+def load(db, path, fmt="csv"):
+    # the way `import` reads a file
+    return transfer.import_rows(db, "leads", transfer.map_columns(transfer.read_rows(path, fmt), {}))
+
+
+def counts(db):
+    return tuple(db.query(f"SELECT COUNT(*) AS n FROM {t}")[0]["n"] for t in ("companies", "contacts", "leads"))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+def test_round_trip_into_existing_rows(db, tmp_path, fmt):
+    path = str(tmp_path / f"leads.{fmt}")
+    before = counts(db)
+    assert transfer.export_rows(db, "leads", path, fmt) == 2
+    assert load(db, path, fmt) == (2, 0)
+    assert counts(db) == before  # the email-less contact is matched by name, not added again
+
+
+def test_rows_without_status_keep_lead_status(db, tmp_path):
+    exported = str(tmp_path / "leads.csv")
+    transfer.export_rows(db, "leads", exported, "csv")
+    with open(exported, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    path = str(tmp_path / "no-status.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, [c for c in rows[0] if c != "status"], extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+        w.writerow({"name": "Gamma", "website": "https://gamma.com", "full_name": "Sales"})
+    before = counts(db)
+    assert load(db, path) == (3, 0)
+    assert counts(db) == tuple(n + 1 for n in before)
+    status = {r["name"]: r["status"] for r in db.query(
+        "SELECT companies.name, leads.status FROM leads JOIN companies ON companies.id = leads.company_id")}
+    assert status == {"Acme": "enriched", "Beta": "new", "Gamma": "new"}
@@ -0,0 +1,65 @@
+import glob
+import os
+
+import pytest
+
+from salesactivator.enrich.website import FEED_CHUNK, WebsiteEnricher
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "pages")
+PAGES = sorted(glob.glob(os.path.join(PAGES_DIR, "*.html")))
+
+
+def read(name):
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def normalized(info):
+    return sorted(info["emails"]), sorted(info["phones"]), info["title"]
+
+
+@pytest.fixture(scope="module")
+def extractors():
+    return WebsiteEnricher(None, extractor="fast"), WebsiteEnricher(None, extractor="soup")
+
+
+@pytest.mark.parametrize("name", [os.path.basename(p) for p in PAGES])
+def test_fast_matches_soup(extractors, name):
+    fast, soup = extractors
+    html = read(name)
+    info = fast.extract_company_info_fast(html)
+    assert info is not None
+    assert normalized(info) == normalized(soup.extract_company_info_soup(html))
+
+
+def test_contact_page(extractors):
+    emails, phones, title = normalized(extractors[0].extract_company_info_fast(read("contact.html")))
+    assert title == "Contact – Northwind Events"
+    # mailto: hrefs count, including the display-name form and a comma list; script, style,
+    # template, comment and post-</html> addresses do not
+    assert emails == sorted([
+        "billing@northwind-events.com", "hello@northwind-events.com", "info@northwind-events.com",
+        "press@northwind-events.com", "venues@northwind-events.com",
+    ])
+    assert phones == ["+13125550199", "+442079460958"]
+
+
+def test_links_only_page(extractors):
+    assert normalized(extractors[0].extract_company_info_fast(read("links_only.html"))) == (
+        ["sales@acme-meetings.co.uk"], ["+13125550142"], "Acme Meetings",
+    )
+
+
+def test_large_page_fed_in_chunks(extractors):
+    fast, soup = extractors
+    filler = "<div><p>Our venues host <b>events</b> of every size.</p></div>" * (3 * FEED_CHUNK // 60)
+    html = f"<html><head><title>Big</title></head><body>{filler}<p>sales@big-events.com</p>{filler}</body></html>"
+    info = fast.extract_company_info_fast(html)
+    assert normalized(info) == normalized(soup.extract_company_info_soup(html))
+    assert info["emails"] == ["sales@big-events.com"]
+
+
+def test_unparseable_input_falls_back(extractors):
+    fast = extractors[0]
+    assert fast.extract_company_info_fast("") is None
+    assert fast.extract_company_info("") == {"emails": [], "phones": [], "title": None}